@@ -15,12 +15,13 @@ from .exports import export_open_slo, export_slo_json
 from .openslo_validator import validate_openslo_payload
 from .slo_store import SLOStore
 from .openslo_yaml import export_open_slo_yaml
-from .trace_stats import TraceStats, compute_trace_stats
+from .trace_stats import TraceStats, TraceStatsAccumulator, compute_trace_stats
 
 __all__ = [
     "SLOCopilot",
     "SLOGenerator",
     "TraceStats",
+    "TraceStatsAccumulator",
     "compute_trace_stats",
     "SLO",
     "SLOTarget",
@@ -1,7 +1,7 @@
 """Integration with Project 2 (T-RAG)."""
 from __future__ import annotations
 
-from typing import List
+from typing import Any, Iterator, List
 
 from .utils import IntegrationStatus, IntegrationUnavailable, ensure_project_path, optional_import
 from ..models import TraceSpan
@@ -13,22 +13,26 @@ class TragTraceAdapter:
         self._trace_loader = optional_import("t_rag.trace_loader")
 
     def load_spans(self, trace_path: str) -> List[TraceSpan]:
-        loader = self._trace_loader.TraceLoader(trace_path)
-        records = loader.load_spans()
-        return [
-            TraceSpan(
-                trace_id=rec.trace_id,
-                span_id=rec.span_id,
-                parent_id=rec.parent_id,
-                service_name=rec.service_name,
-                operation=rec.operation,
-                start_time=rec.start_time,
-                end_time=rec.end_time,
-                attributes=rec.attributes,
-                status=str(rec.status),
-            )
-            for rec in records
-        ]
+        return [span for chunk in self.iter_spans(trace_path) for span in chunk]
+
+    def iter_spans(self, trace_path: str, chunk_size: int = 1024) -> Iterator[List[TraceSpan]]:
+        loader = self._trace_loader.TraceLoader(trace_path, streaming=True)
+        for records in loader.iter_chunks(chunk_size):
+            yield [_to_trace_span(rec) for rec in records]
+
+
+def _to_trace_span(rec: Any) -> TraceSpan:
+    return TraceSpan(
+        trace_id=rec.trace_id,
+        span_id=rec.span_id,
+        parent_id=rec.parent_id,
+        service_name=rec.service_name,
+        operation=rec.operation,
+        start_time=rec.start_time,
+        end_time=rec.end_time,
+        attributes=rec.attributes,
+        status=str(rec.status),
+    )
 
 
 class TragRcaAdapter:
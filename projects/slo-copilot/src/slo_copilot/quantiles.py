@@ -0,0 +1,219 @@
+"""Mergeable quantile sketches for latency percentiles."""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# Summaries keep exact values up to this many samples, then switch to a sketch.
+DEFAULT_EXACT_LIMIT = 10_000
+# Values at or below this are counted in the sketch's zero bucket.
+MIN_INDEXABLE = 1e-9
+
+
+def interpolate(ordered: Sequence[float], pct: float) -> Optional[float]:
+    """Linearly interpolated percentile of an already sorted sequence."""
+    if len(ordered) == 0:
+        return None
+    if len(ordered) == 1:
+        return float(ordered[0])
+    k = (len(ordered) - 1) * pct
+    f = math.floor(k)
+    c = math.ceil(k)
+    if f == c:
+        return float(ordered[int(k)])
+    return float(ordered[f]) * (c - k) + float(ordered[c]) * (k - f)
+
+
+class DDSketch:
+    """Quantile sketch with a relative-error guarantee.
+
+    Non-negative values are counted in logarithmic buckets
+    ``(gamma**(i - 1), gamma**i]`` with ``gamma = (1 + a) / (1 - a)``, so
+    every quantile is within a relative error ``a`` of the exact one
+    while memory grows only with the logarithm of the value range.
+    Sketches with the same accuracy merge exactly by adding counts.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._keys: Optional[List[int]] = None
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("DDSketch only accepts non-negative values")
+        if value <= MIN_INDEXABLE:
+            self.zero_count += count
+        else:
+            key = self.key(value)
+            if key not in self.bins:
+                self._keys = None
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def key(self, value: float) -> int:
+        """Bucket index of a positive ``value``."""
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self._keys = None
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, pct: float) -> Optional[float]:
+        """Percentile ``pct`` (0-1), interpolated between ranks like the exact one."""
+        if not self.count:
+            return None
+        rank = (self.count - 1) * pct
+        f = math.floor(rank)
+        c = math.ceil(rank)
+        if f == c:
+            return self._value_at(f)
+        return self._value_at(f) * (c - rank) + self._value_at(c) * (rank - f)
+
+    def _value_at(self, rank: int) -> float:
+        if rank <= 0:
+            return self.min
+        if rank >= self.count - 1:
+            return self.max
+        cumulative = self.zero_count
+        if rank < cumulative:
+            return self.min
+        if self._keys is None:
+            self._keys = sorted(self.bins)
+        for key in self._keys:
+            cumulative += self.bins[key]
+            if rank < cumulative:
+                value = 2 * self.gamma**key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "bins": {str(key): count for key, count in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "DDSketch":
+        sketch = cls(payload["relative_accuracy"])
+        sketch.bins = {int(key): int(count) for key, count in payload["bins"].items()}
+        sketch.zero_count = int(payload["zero_count"])
+        sketch.count = int(payload["count"])
+        if sketch.count:
+            sketch.min = float(payload["min"])
+            sketch.max = float(payload["max"])
+        return sketch
+
+
+class QuantileSummary:
+    """Exact percentiles for small inputs, a :class:`DDSketch` for large ones.
+
+    Values are kept as-is until there are more than ``exact_limit`` of
+    them; the summary then folds them into a sketch.  ``exact_limit=None``
+    never switches (always exact) and ``0`` always uses the sketch.
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        exact_limit: Optional[int] = DEFAULT_EXACT_LIMIT,
+    ) -> None:
+        if exact_limit is not None and exact_limit < 0:
+            raise ValueError("exact_limit must be non-negative")
+        self.relative_accuracy = relative_accuracy
+        self.exact_limit = exact_limit
+        self.values: Optional[List[float]] = []
+        self.sketch: Optional[DDSketch] = None
+        self._sorted = True
+        if exact_limit == 0:
+            self._to_sketch()
+
+    @property
+    def exact(self) -> bool:
+        return self.sketch is None
+
+    @property
+    def count(self) -> int:
+        return self.sketch.count if self.sketch is not None else len(self.values)
+
+    def add(self, value: float) -> None:
+        if self.sketch is not None:
+            self.sketch.add(value)
+            return
+        self.values.append(value)
+        self._sorted = False
+        if self.exact_limit is not None and len(self.values) > self.exact_limit:
+            self._to_sketch()
+
+    def _to_sketch(self) -> None:
+        sketch = DDSketch(self.relative_accuracy)
+        for value in self.values:
+            sketch.add(value)
+        self.sketch = sketch
+        self.values = None
+
+    def merge(self, other: "QuantileSummary") -> "QuantileSummary":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge summaries with different relative accuracy")
+        if other.sketch is not None:
+            if self.sketch is None:
+                self._to_sketch()
+            self.sketch.merge(other.sketch)
+        else:
+            for value in other.values:
+                self.add(value)
+        return self
+
+    def quantile(self, pct: float) -> Optional[float]:
+        if self.sketch is not None:
+            return self.sketch.quantile(pct)
+        if not self._sorted:
+            self.values.sort()
+            self._sorted = True
+        return interpolate(self.values, pct)
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "relative_accuracy": self.relative_accuracy,
+            "exact_limit": self.exact_limit,
+        }
+        if self.sketch is not None:
+            payload["sketch"] = self.sketch.to_dict()
+        else:
+            payload["values"] = list(self.values)
+        return payload
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "QuantileSummary":
+        summary = cls(payload["relative_accuracy"], payload.get("exact_limit"))
+        if "sketch" in payload:
+            summary.sketch = DDSketch.from_dict(payload["sketch"])
+            summary.values = None
+        else:
+            summary.values = []
+            for value in payload["values"]:
+                summary.add(float(value))
+        return summary
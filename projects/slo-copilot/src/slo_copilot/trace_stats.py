@@ -3,10 +3,30 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Dict, Iterable, List, Optional
-import math
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from .models import TraceSpan
+from .quantiles import (
+    DEFAULT_EXACT_LIMIT,
+    DEFAULT_RELATIVE_ACCURACY,
+    MIN_INDEXABLE,
+    DDSketch,
+    QuantileSummary,
+    interpolate,
+)
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover
+    np = None
+
+# Smallest span list for which compute_trace_stats uses the NumPy path.
+VECTORIZE_MIN_SPANS = 1024
+# Spans per batch whose timestamp encoding is detected together on the scalar path.
+_SCALAR_BATCH_SPANS = 1024
+_ERROR_STATUSES = {"ERROR", "STATUS_CODE_ERROR", "STATUS_CODE_UNKNOWN"}
 
 
 @dataclass
@@ -31,33 +51,56 @@ class TraceStats:
     service_stats: Dict[str, ServiceStats]
 
 
-def _parse_numeric(value: object) -> Optional[float]:
-    if value is None:
-        return None
+def _parse_time(value: object) -> Optional[float]:
     if isinstance(value, (int, float)):
         return float(value)
     if isinstance(value, str):
-        try:
-            return float(value)
-        except ValueError:
-            return None
+        return _parse_time_string(value)
     return None
 
 
-def _parse_time(value: object) -> Optional[float]:
-    numeric = _parse_numeric(value)
-    if numeric is not None:
-        return numeric
-    if isinstance(value, str):
+@lru_cache(maxsize=65536)
+def _parse_time_string(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return _parse_iso(value)
+
+
+@lru_cache(maxsize=65536)
+def _parse_iso(value: str) -> Optional[float]:
+    try:
+        normalized = value.replace("Z", "+00:00") if value.endswith("Z") else value
+        dt = datetime.fromisoformat(normalized)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _looks_iso(value: str) -> bool:
+    # "YYYY-MM-..." can never be a valid float() literal
+    return len(value) >= 10 and value[4] == "-" and value[7] == "-"
+
+
+def _parse_time_column(values: List[object]) -> List[Optional[float]]:
+    """Timestamps parsed as by ``_parse_time``, with the encoding detected once.
+
+    Uniform columns of numbers, numeric strings or ISO-8601 strings each
+    take a specialised converter; mixed columns fall back to ``_parse_time``.
+    """
+    kinds = set(map(type, values))
+    if kinds <= {int, float}:
+        return list(map(float, values))
+    if kinds == {str}:
+        if all(map(_looks_iso, values)):
+            return list(map(_parse_iso, values))
         try:
-            normalized = value.replace("Z", "+00:00") if value.endswith("Z") else value
-            dt = datetime.fromisoformat(normalized)
+            return list(map(float, values))
         except ValueError:
-            return None
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt.timestamp()
-    return None
+            return list(map(_parse_time_string, values))
+    return list(map(_parse_time, values))
 
 
 def _duration_ms(start_time: object, end_time: object) -> Optional[float]:
@@ -65,7 +108,18 @@ def _duration_ms(start_time: object, end_time: object) -> Optional[float]:
     end = _parse_time(end_time)
     if start is None or end is None:
         return None
+    return _scaled_duration_ms(start, end)
+
+
+def _durations_ms(start_times: List[object], end_times: List[object]) -> List[Optional[float]]:
+    """``_duration_ms`` over a batch, detecting each column's encoding once."""
+    return [
+        None if start is None or end is None else _scaled_duration_ms(start, end)
+        for start, end in zip(_parse_time_column(start_times), _parse_time_column(end_times))
+    ]
+
 
+def _scaled_duration_ms(start: float, end: float) -> float:
     # Heuristic scaling for epoch timestamps.
     scale = 1.0
     if start > 1e15 or end > 1e15:
@@ -80,81 +134,323 @@ def _duration_ms(start_time: object, end_time: object) -> Optional[float]:
 
 
 def _percentile(values: List[float], pct: float) -> Optional[float]:
-    if not values:
-        return None
-    ordered = sorted(values)
-    if len(ordered) == 1:
-        return ordered[0]
-    k = (len(ordered) - 1) * pct
-    f = math.floor(k)
-    c = math.ceil(k)
-    if f == c:
-        return ordered[int(k)]
-    return ordered[f] * (c - k) + ordered[c] * (k - f)
+    return interpolate(sorted(values), pct)
 
 
-def _span_is_error(span: TraceSpan) -> bool:
-    status = (span.status or "").upper()
-    if status in {"ERROR", "STATUS_CODE_ERROR", "STATUS_CODE_UNKNOWN"}:
-        return True
-    status_code = span.attributes.get("http.status_code") or span.attributes.get("http.status")
+def _status_is_error(status: Optional[str]) -> bool:
+    return (status or "").upper() in _ERROR_STATUSES
+
+
+def _status_code_is_error(status_code: object) -> bool:
     if isinstance(status_code, str) and status_code.isdigit():
         status_code = int(status_code)
-    if isinstance(status_code, (int, float)) and status_code >= 500:
+    return isinstance(status_code, (int, float)) and status_code >= 500
+
+
+def _attributes_are_error(attributes: Dict[str, Any]) -> bool:
+    if _status_code_is_error(attributes.get("http.status_code") or attributes.get("http.status")):
         return True
-    if "exception.message" in span.attributes or "exception.type" in span.attributes:
+    if "exception.message" in attributes or "exception.type" in attributes:
         return True
     return False
 
 
-def compute_trace_stats(spans: Iterable[TraceSpan]) -> TraceStats:
-    latencies: List[float] = []
-    error_count = 0
-    service_latencies: Dict[str, List[float]] = {}
-    service_errors: Dict[str, int] = {}
-    service_counts: Dict[str, int] = {}
+def _span_is_error(span: TraceSpan) -> bool:
+    return _status_is_error(span.status) or _attributes_are_error(span.attributes)
+
+
+class TraceStatsAccumulator:
+    """Builds :class:`TraceStats` in one streaming pass.
+
+    Latency percentiles are kept in :class:`~slo_copilot.quantiles.QuantileSummary`
+    objects, so accumulators for different files, shards or time windows
+    can be combined with :meth:`merge` (or shipped via :meth:`to_dict`)
+    and yield the same result as a single pass over all spans, within
+    ``relative_accuracy`` once a summary exceeds ``exact_limit`` values.
+    Unlike :func:`compute_trace_stats`, the accumulator switches to the
+    sketch by default so that long-running streams keep bounded memory.
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        exact_limit: Optional[int] = DEFAULT_EXACT_LIMIT,
+    ) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.exact_limit = exact_limit
+        self.span_count = 0
+        self.error_count = 0
+        self.latencies = self._summary()
+        self.service_counts: Dict[str, int] = {}
+        self.service_errors: Dict[str, int] = {}
+        self.service_latencies: Dict[str, QuantileSummary] = {}
 
-    span_list = list(spans)
-    for span in span_list:
-        duration = _duration_ms(span.start_time, span.end_time)
+    def _summary(self) -> QuantileSummary:
+        return QuantileSummary(self.relative_accuracy, self.exact_limit)
+
+    def add(self, span: TraceSpan) -> None:
+        self._add(span, _duration_ms(span.start_time, span.end_time))
+
+    def _add(self, span: TraceSpan, duration: Optional[float]) -> None:
+        service = span.service_name
         if duration is not None:
-            latencies.append(duration)
-            service_latencies.setdefault(span.service_name, []).append(duration)
-        service_counts[span.service_name] = service_counts.get(span.service_name, 0) + 1
+            self.latencies.add(duration)
+            if service not in self.service_latencies:
+                self.service_latencies[service] = self._summary()
+            self.service_latencies[service].add(duration)
+        self.span_count += 1
+        self.service_counts[service] = self.service_counts.get(service, 0) + 1
         if _span_is_error(span):
-            error_count += 1
-            service_errors[span.service_name] = service_errors.get(span.service_name, 0) + 1
+            self.error_count += 1
+            self.service_errors[service] = self.service_errors.get(service, 0) + 1
 
-    span_count = len(span_list)
-    error_rate = (error_count / span_count) if span_count else 0.0
-    availability = 1.0 - error_rate
+    def update(self, spans: Iterable[TraceSpan]) -> "TraceStatsAccumulator":
+        """Add ``spans``, detecting the timestamp encoding once per batch of spans."""
+        iterator = iter(spans)
+        while True:
+            batch = list(islice(iterator, _SCALAR_BATCH_SPANS))
+            if not batch:
+                return self
+            durations = _durations_ms([span.start_time for span in batch], [span.end_time for span in batch])
+            for span, duration in zip(batch, durations):
+                self._add(span, duration)
+
+    def merge(self, other: "TraceStatsAccumulator") -> "TraceStatsAccumulator":
+        self.span_count += other.span_count
+        self.error_count += other.error_count
+        self.latencies.merge(other.latencies)
+        for service, count in other.service_counts.items():
+            self.service_counts[service] = self.service_counts.get(service, 0) + count
+        for service, count in other.service_errors.items():
+            self.service_errors[service] = self.service_errors.get(service, 0) + count
+        for service, summary in other.service_latencies.items():
+            if service not in self.service_latencies:
+                self.service_latencies[service] = self._summary()
+            self.service_latencies[service].merge(summary)
+        return self
+
+    def result(self) -> TraceStats:
+        span_count = self.span_count
+        error_rate = (self.error_count / span_count) if span_count else 0.0
+        service_stats: Dict[str, ServiceStats] = {}
+        for service, count in self.service_counts.items():
+            latencies = self.service_latencies.get(service) or self._summary()
+            service_error_count = self.service_errors.get(service, 0)
+            service_stats[service] = ServiceStats(
+                span_count=count,
+                error_count=service_error_count,
+                error_rate=(service_error_count / count) if count else 0.0,
+                latency_p50_ms=latencies.quantile(0.50),
+                latency_p95_ms=latencies.quantile(0.95),
+                latency_p99_ms=latencies.quantile(0.99),
+            )
+        return TraceStats(
+            span_count=span_count,
+            error_count=self.error_count,
+            error_rate=error_rate,
+            availability=1.0 - error_rate,
+            latency_p50_ms=self.latencies.quantile(0.50),
+            latency_p95_ms=self.latencies.quantile(0.95),
+            latency_p99_ms=self.latencies.quantile(0.99),
+            service_stats=service_stats,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "exact_limit": self.exact_limit,
+            "span_count": self.span_count,
+            "error_count": self.error_count,
+            "latencies": self.latencies.to_dict(),
+            "service_counts": dict(self.service_counts),
+            "service_errors": dict(self.service_errors),
+            "service_latencies": {
+                service: summary.to_dict() for service, summary in self.service_latencies.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "TraceStatsAccumulator":
+        accumulator = cls(payload["relative_accuracy"], payload.get("exact_limit"))
+        accumulator.span_count = int(payload["span_count"])
+        accumulator.error_count = int(payload["error_count"])
+        accumulator.latencies = QuantileSummary.from_dict(payload["latencies"])
+        accumulator.service_counts = dict(payload["service_counts"])
+        accumulator.service_errors = dict(payload["service_errors"])
+        accumulator.service_latencies = {
+            service: QuantileSummary.from_dict(summary)
+            for service, summary in payload["service_latencies"].items()
+        }
+        return accumulator
+
+
+def compute_trace_stats(
+    spans: Iterable[TraceSpan],
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    exact_limit: Optional[int] = None,
+    vectorized: Optional[bool] = None,
+) -> TraceStats:
+    """Compute trace statistics in a single pass over ``spans``.
+
+    Percentiles are exact by default.  Passing ``exact_limit`` keeps them
+    exact only while a summary holds at most that many durations; larger
+    summaries then come from a sketch within ``relative_accuracy`` of the
+    exact value (:class:`TraceStatsAccumulator` does this by default).
+
+    Lists of at least ``VECTORIZE_MIN_SPANS`` spans are processed column
+    by column with NumPy when it is installed; ``vectorized`` forces the
+    choice.  Both paths return identical results.
+    """
+    if vectorized is None:
+        vectorized = np is not None and isinstance(spans, Sequence) and len(spans) >= VECTORIZE_MIN_SPANS
+    if vectorized:
+        if np is None:
+            raise RuntimeError("vectorized trace stats require numpy")
+        return _compute_trace_stats_numpy(list(spans), relative_accuracy, exact_limit)
+    return TraceStatsAccumulator(relative_accuracy, exact_limit).update(spans).result()
+
+
+def _time_column(values: List[object]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Timestamps parsed as by ``_parse_time``, plus a mask of those that parsed.
+
+    The encoding is detected once for the whole column, as on the scalar
+    path (see ``_parse_time_column``).
+    """
+    if set(map(type, values)) <= {int, float}:
+        return np.array(values, dtype=np.float64), np.ones(len(values), dtype=bool)
+    parsed = _parse_time_column(values)
+    valid = np.array([value is not None for value in parsed], dtype=bool)
+    column = np.array([0.0 if value is None else value for value in parsed], dtype=np.float64)
+    return column, valid
+
+
+def _duration_column(start: "np.ndarray", end: "np.ndarray") -> "np.ndarray":
+    """Vectorised ``_duration_ms`` over parsed start and end columns.
 
-    latency_p50 = _percentile(latencies, 0.50)
-    latency_p95 = _percentile(latencies, 0.95)
-    latency_p99 = _percentile(latencies, 0.99)
+    When every span falls in the same epoch unit (ns, us or s) the unit
+    is applied to the whole column; otherwise it is chosen per span.
+    """
+    with np.errstate(invalid="ignore", over="ignore"):
+        diff = end - start
+        # fmax ignores NaN, matching ``start > x or end > x``
+        peak = np.fmax(start, end)
+        if np.all(peak > 1e15):
+            durations = diff / 1e6
+        elif np.all((peak > 1e12) & (peak <= 1e15)):
+            durations = diff / 1e3
+        elif np.all((peak > 1e9) & (peak <= 1e12)):
+            durations = diff * 1000.0
+        else:
+            durations = np.select(
+                [peak > 1e15, peak > 1e12, peak > 1e9],
+                [diff / 1e6, diff / 1e3, diff * 1000.0],
+                diff,
+            )
+        # Same as max(0.0, d), which also maps NaN to 0.0
+        return np.where(durations > 0.0, durations, 0.0)
+
+
+def _codes(values: List[Any]) -> Tuple[List[Any], "np.ndarray"]:
+    """Distinct ``values`` in order of first appearance and the code of each value."""
+    distinct = list(dict.fromkeys(values))
+    codes = {value: code for code, value in enumerate(distinct)}
+    return distinct, np.fromiter(map(codes.__getitem__, values), dtype=np.int64, count=len(values))
+
+
+def _classify(values: List[Any], predicate: Any) -> "np.ndarray":
+    """``predicate`` applied to every value, evaluated once per distinct value."""
+    try:
+        distinct, codes = _codes(values)
+    except TypeError:  # unhashable values
+        return np.array([predicate(value) for value in values], dtype=bool)
+    return np.array([predicate(value) for value in distinct], dtype=bool)[codes]
+
+
+def _sketch_from_sorted(ordered: "np.ndarray", relative_accuracy: float) -> DDSketch:
+    """Build the :class:`DDSketch` that adding ``ordered`` one by one would give."""
+    sketch = DDSketch(relative_accuracy)
+    zero = int(np.searchsorted(ordered, MIN_INDEXABLE, side="right"))
+    positive = ordered[zero:]
+    ratio = np.log(positive) / sketch.log_gamma
+    keys = np.ceil(ratio)
+    # np.log and math.log may differ in the last bit; redo keys near bucket edges the scalar way
+    for i in np.flatnonzero(np.abs(ratio - np.rint(ratio)) < 1e-9):
+        keys[i] = sketch.key(float(positive[i]))
+    bins, counts = np.unique(keys.astype(np.int64), return_counts=True)
+    sketch.bins = dict(zip(bins.tolist(), counts.tolist()))
+    sketch.zero_count = zero
+    sketch.count = int(ordered.shape[0])
+    if sketch.count:
+        sketch.min = float(ordered[0])
+        sketch.max = float(ordered[-1])
+    return sketch
+
+
+def _sorted_quantiles(
+    ordered: "np.ndarray", relative_accuracy: float, exact_limit: Optional[int]
+) -> Tuple[Optional[float], ...]:
+    pcts = (0.50, 0.95, 0.99)
+    if exact_limit is None or ordered.shape[0] <= exact_limit:
+        return tuple(interpolate(ordered, pct) for pct in pcts)
+    sketch = _sketch_from_sorted(ordered, relative_accuracy)
+    return tuple(sketch.quantile(pct) for pct in pcts)
+
+
+def _compute_trace_stats_numpy(
+    spans: List[TraceSpan], relative_accuracy: float, exact_limit: Optional[int]
+) -> TraceStats:
+    span_count = len(spans)
+    start, start_ok = _time_column([span.start_time for span in spans])
+    end, end_ok = _time_column([span.end_time for span in spans])
+    timed = start_ok & end_ok
+    durations = _duration_column(start[timed], end[timed])
+
+    attributes = [span.attributes for span in spans]
+    errors = _classify([span.status for span in spans], _status_is_error)
+    errors |= _classify(
+        [attrs.get("http.status_code") or attrs.get("http.status") for attrs in attributes],
+        _status_code_is_error,
+    )
+    errors |= np.array(
+        ["exception.message" in attrs or "exception.type" in attrs for attrs in attributes], dtype=bool
+    )
+    error_count = int(np.count_nonzero(errors))
+
+    services, service_codes = _codes([span.service_name for span in spans])
+    n_services = len(services)
+    counts = np.bincount(service_codes, minlength=n_services)
+    service_errors = np.bincount(service_codes[errors], minlength=n_services)
+    timed_codes = service_codes[timed]
+    order = np.lexsort((durations, timed_codes))
+    by_service = durations[order]
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(timed_codes, minlength=n_services))))
 
     service_stats: Dict[str, ServiceStats] = {}
-    for service, count in service_counts.items():
-        service_latency = service_latencies.get(service, [])
-        service_error_count = service_errors.get(service, 0)
-        service_error_rate = (service_error_count / count) if count else 0.0
+    for code, service in enumerate(services):
+        count = int(counts[code])
+        service_error_count = int(service_errors[code])
+        p50, p95, p99 = _sorted_quantiles(
+            by_service[bounds[code] : bounds[code + 1]], relative_accuracy, exact_limit
+        )
         service_stats[service] = ServiceStats(
             span_count=count,
             error_count=service_error_count,
-            error_rate=service_error_rate,
-            latency_p50_ms=_percentile(service_latency, 0.50),
-            latency_p95_ms=_percentile(service_latency, 0.95),
-            latency_p99_ms=_percentile(service_latency, 0.99),
+            error_rate=(service_error_count / count) if count else 0.0,
+            latency_p50_ms=p50,
+            latency_p95_ms=p95,
+            latency_p99_ms=p99,
         )
 
+    error_rate = (error_count / span_count) if span_count else 0.0
+    p50, p95, p99 = _sorted_quantiles(np.sort(durations), relative_accuracy, exact_limit)
     return TraceStats(
         span_count=span_count,
         error_count=error_count,
         error_rate=error_rate,
-        availability=availability,
-        latency_p50_ms=latency_p50,
-        latency_p95_ms=latency_p95,
-        latency_p99_ms=latency_p99,
+        availability=1.0 - error_rate,
+        latency_p50_ms=p50,
+        latency_p95_ms=p95,
+        latency_p99_ms=p99,
         service_stats=service_stats,
     )
 
@@ -0,0 +1,192 @@
+import json
+import random
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from slo_copilot import trace_stats
+from slo_copilot.models import TraceSpan
+from slo_copilot.quantiles import DEFAULT_EXACT_LIMIT, DDSketch, QuantileSummary
+from slo_copilot.trace_stats import (
+    VECTORIZE_MIN_SPANS,
+    TraceStatsAccumulator,
+    _duration_ms,
+    _parse_iso,
+    _parse_time,
+    _percentile,
+    _time_column,
+    compute_trace_stats,
+    np,
+)
+
+
+def _spans(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    spans = []
+    for i in range(count):
+        start = 1_700_000_000_000 + i
+        duration = rng.lognormvariate(3, 1) if i % 50 else 0
+        spans.append(
+            TraceSpan(
+                trace_id=f"t{i // 10}",
+                span_id=f"s{i}",
+                parent_id=None,
+                service_name=f"svc-{i % 3}",
+                operation="op",
+                start_time=start,
+                end_time=start + duration,
+                attributes={"http.status_code": 500 if i % 17 == 0 else 200},
+                status="OK",
+            )
+        )
+    return spans
+
+
+class QuantileSketchTests(unittest.TestCase):
+    def test_relative_error_bound(self):
+        rng = random.Random(1)
+        values = [rng.lognormvariate(3, 2) for _ in range(20000)]
+        sketch = DDSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+        for pct in (0.0, 0.1, 0.5, 0.95, 0.99, 1.0):
+            exact = _percentile(values, pct)
+            self.assertLessEqual(abs(sketch.quantile(pct) - exact), 0.01 * exact, pct)
+
+    def test_merge_matches_single_sketch(self):
+        rng = random.Random(2)
+        values = [rng.expovariate(0.1) for _ in range(5000)] + [0.0] * 10
+        whole = DDSketch(0.02)
+        parts = [DDSketch(0.02) for _ in range(4)]
+        for i, value in enumerate(values):
+            whole.add(value)
+            parts[i % 4].add(value)
+        merged = DDSketch.from_dict(json.loads(json.dumps(parts[0].to_dict())))
+        for part in parts[1:]:
+            merged.merge(part)
+        self.assertEqual(merged.bins, whole.bins)
+        self.assertEqual(merged.quantile(0.99), whole.quantile(0.99))
+        with self.assertRaises(ValueError):
+            merged.merge(DDSketch(0.01))
+
+    def test_summary_switches_to_sketch_beyond_limit(self):
+        summary = QuantileSummary(exact_limit=100)
+        for value in range(100):
+            summary.add(float(value))
+        self.assertTrue(summary.exact)
+        self.assertEqual(summary.quantile(0.5), 49.5)
+        summary.merge(QuantileSummary.from_dict(summary.to_dict()))
+        self.assertFalse(summary.exact)
+        self.assertEqual(summary.count, 200)
+        self.assertAlmostEqual(summary.quantile(0.5), 49.5, delta=0.5)
+
+
+class TraceStatsTests(unittest.TestCase):
+    def test_exact_mode_matches_sorted_percentiles(self):
+        spans = _spans(500)
+        stats = compute_trace_stats(iter(spans), exact_limit=None)
+        durations = [_duration_ms(span.start_time, span.end_time) for span in spans]
+        self.assertEqual(stats.span_count, 500)
+        self.assertEqual(stats.error_count, 30)
+        self.assertEqual(stats.latency_p95_ms, _percentile(durations, 0.95))
+        service = [d for i, d in enumerate(durations) if i % 3 == 1]
+        self.assertEqual(stats.service_stats["svc-1"].latency_p99_ms, _percentile(service, 0.99))
+
+    def test_public_default_is_exact_beyond_the_sketch_limit(self):
+        spans = _spans(DEFAULT_EXACT_LIMIT + 500)
+        durations = [_duration_ms(span.start_time, span.end_time) for span in spans]
+        for vectorized in (False, True) if np is not None else (False,):
+            stats = compute_trace_stats(spans, vectorized=vectorized)
+            self.assertEqual(stats.latency_p99_ms, _percentile(durations, 0.99))
+        accumulator = TraceStatsAccumulator().update(spans)
+        self.assertFalse(accumulator.latencies.exact)
+        self.assertTrue(TraceStatsAccumulator(exact_limit=None).update(spans).latencies.exact)
+
+    def test_sharded_accumulators_merge(self):
+        spans = _spans(3000)
+        whole = compute_trace_stats(spans, relative_accuracy=0.01, exact_limit=0)
+        shards = [TraceStatsAccumulator(0.01, exact_limit=0).update(spans[i::3]) for i in range(3)]
+        merged = TraceStatsAccumulator.from_dict(json.loads(json.dumps(shards[0].to_dict())))
+        for shard in shards[1:]:
+            merged.merge(shard)
+        self.assertEqual(merged.result(), whole)
+        exact = compute_trace_stats(spans, exact_limit=None)
+        for field in ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms"):
+            self.assertLessEqual(abs(getattr(whole, field) - getattr(exact, field)), 0.01 * getattr(exact, field))
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_vectorized_path_matches_scalar_path(self):
+        spans = _spans(2000)
+        # Mixed timestamp encodings, unparseable times and error signals
+        for i, span in enumerate(spans[:300]):
+            span.start_time, span.end_time = [
+                (str(span.start_time), str(span.end_time)),
+                ("2024-01-01T00:00:00Z", "2024-01-01T00:00:00.250Z"),
+                (None, span.end_time),
+                ("garbage", "nan"),
+                (1_700_000_000, 1_700_000_001.5),
+            ][i % 5]
+            span.status = ["error", None, "STATUS_CODE_UNKNOWN", "OK"][i % 4]
+            span.attributes = [{"http.status": "503"}, {"exception.type": "E"}, {"http.status_code": [500]}][i % 3]
+        for exact_limit in (None, 0, 100):
+            self.assertEqual(
+                compute_trace_stats(spans, exact_limit=exact_limit, vectorized=True),
+                compute_trace_stats(spans, exact_limit=exact_limit, vectorized=False),
+            )
+
+    def test_mixed_magnitude_batches_below_and_above_threshold(self):
+        for count in (VECTORIZE_MIN_SPANS // 4, VECTORIZE_MIN_SPANS * 2):
+            spans = _spans(count, seed=count)
+            # ns, us, s and ms epochs, numeric strings and ISO-8601 in one batch
+            for i, span in enumerate(spans):
+                base = 1_700_000_000 + i
+                span.start_time, span.end_time = [
+                    (base * 10**9, base * 10**9 + 2_500_000),
+                    (base * 10**6, base * 10**6 + 7_000),
+                    (base, base + 0.125),
+                    (i, i + 40),
+                    (str(base * 10**9), str(base * 10**9 + 1_000_000)),
+                    ("2024-01-01T00:00:00Z", "2024-01-01T00:00:00.300Z"),
+                ][i % 6]
+            durations = sorted(_duration_ms(span.start_time, span.end_time) for span in spans)
+            stats = compute_trace_stats(spans, exact_limit=None)
+            self.assertEqual(stats.latency_p50_ms, _percentile(durations, 0.50))
+            self.assertEqual(stats.latency_p99_ms, _percentile(durations, 0.99))
+            self.assertEqual(TraceStatsAccumulator(exact_limit=None).update(iter(spans)).result(), stats)
+
+    def test_scalar_path_detects_the_encoding_once_per_batch(self):
+        spans = _spans(100)
+        for span in spans:
+            span.start_time, span.end_time = "2024-01-01T00:00:00Z", "2024-01-01T00:00:00.250Z"
+        with mock.patch.object(trace_stats, "_parse_time", wraps=trace_stats._parse_time) as parse_time:
+            stats = compute_trace_stats(spans)
+        parse_time.assert_not_called()
+        self.assertEqual(stats.latency_p99_ms, 250.0)
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_time_columns_match_scalar_parsing(self):
+        columns = [
+            ["2024-01-01T00:00:00Z", "2024-01-01T00:00:00.5+02:00", "2024-01-01T00:00:00Z", "2024-13-01T00:00:00Z"],
+            ["1700000000000000000", "1.5", " 2 ", "1_000"],
+            ["1.5", "2024-01-01T00:00:00", "nan", "bogus"],
+            [1, 2.5, None, True, "3"],
+            [],
+        ]
+        _parse_iso.cache_clear()
+        for values in columns:
+            column, valid = _time_column(values)
+            expected = [_parse_time(value) for value in values]
+            self.assertEqual(valid.tolist(), [value is not None for value in expected])
+            for got, want in zip(column[valid].tolist(), [value for value in expected if value is not None]):
+                self.assertTrue(got == want or (got != got and want != want))
+        self.assertGreater(_parse_iso.cache_info().hits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
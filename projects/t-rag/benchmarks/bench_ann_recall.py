@@ -0,0 +1,86 @@
+"""Recall@k and latency of approximate T-RAG indexes against exact search.
+
+Run from ``projects/t-rag``::
+
+    python benchmarks/bench_ann_recall.py --size 200000 --n-probe 1 4 16
+
+Vectors are drawn from a mixture of Gaussian clusters and normalised,
+which resembles span embeddings better than uniform noise.  Results
+are printed as JSON, one entry per ``n_probe`` setting.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from t_rag.ann_index import IVFIndex, exact_search, recall_at_k  # noqa: E402
+
+
+def clustered_vectors(count: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=count)
+    vectors = (centers[labels] + 0.35 * rng.normal(size=(count, dim))).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    data = clustered_vectors(args.size + args.queries, args.dim, clusters=256, rng=rng)
+    matrix, queries = data[: args.size], data[args.size :]
+
+    started = time.perf_counter()
+    exact_ids, _ = exact_search(matrix, queries, args.k)
+    exact_seconds = time.perf_counter() - started
+
+    index = IVFIndex(n_lists=args.n_lists, seed=args.seed)
+    started = time.perf_counter()
+    index.build(matrix)
+    build_seconds = time.perf_counter() - started
+
+    results = []
+    for n_probe in args.n_probe:
+        index.n_probe = n_probe
+        started = time.perf_counter()
+        approx_ids, _ = index.search(queries, args.k)
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "n_probe": n_probe,
+                "recall_at_k": round(recall_at_k(approx_ids, exact_ids), 4),
+                "query_ms": round(1000 * elapsed / args.queries, 4),
+            }
+        )
+    print(
+        json.dumps(
+            {
+                "size": args.size,
+                "dim": args.dim,
+                "k": args.k,
+                "exact_query_ms": round(1000 * exact_seconds / args.queries, 4),
+                "ivf_build_s": round(build_seconds, 3),
+                "ivf": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Throughput of the embedding backends.
+
+Run from ``projects/t-rag``::
+
+    python benchmarks/bench_embedders.py --messages 20000
+
+Synthetic span summaries in the format produced by the trace loader
+are embedded by the offline ``hashing`` backend (with and without
+random projection) and, if ``sentence-transformers`` is installed and
+``--sentence-transformers`` is given, by the semantic model.  Results
+(messages per second) are printed as JSON.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from t_rag.config import ModelConfig  # noqa: E402
+from t_rag.embedders import Embedder, HashingEmbedder, SentenceTransformerEmbedder  # noqa: E402
+
+SERVICES = ["checkout", "payment-service", "inventory", "orders-db", "frontend", "auth"]
+ERRORS = ["connection refused", "timeout after 30s", "card declined", "deadlock detected", "503 upstream"]
+
+
+def span_messages(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        service = rng.choice(SERVICES)
+        status = "ERROR" if rng.random() < 0.2 else "OK"
+        message = f"service: {service}; operation: GET /api/v1/{service}/{i % 97}; status: {status}"
+        if status == "ERROR":
+            message += f"; error: {rng.choice(ERRORS)}"
+        messages.append(message)
+    return messages
+
+
+def measure(embedder: Embedder, messages: List[str], repeat: int) -> Dict[str, Any]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        embedder.encode(messages)
+        best = min(best, time.perf_counter() - started)
+    return {"name": embedder.name, "dimension": embedder.dimension, "messages_per_sec": round(len(messages) / best)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--features", type=int, default=1 << 14, help="Hash buckets before projection")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sentence-transformers", action="store_true", help="Also time the semantic model")
+    args = parser.parse_args()
+
+    messages = span_messages(args.messages)
+    results = {
+        "hashing": measure(HashingEmbedder(dimension=args.dim), messages, args.repeat),
+        "hashing_projected": measure(
+            HashingEmbedder(dimension=args.dim, n_features=args.features), messages, args.repeat
+        ),
+    }
+    if args.sentence_transformers:
+        embedder = SentenceTransformerEmbedder(ModelConfig().embedding_model_name, batch_size=256)
+        results["sentence_transformers"] = measure(embedder, messages, 1)
+    print(json.dumps({"messages": args.messages, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Throughput of batch RCA through the asynchronous reasoner API.
+
+Run from ``projects/t-rag``::
+
+    python benchmarks/bench_llm_batch.py --incidents 500 --latency 0.2 --concurrency 1 8 32
+
+The stub provider emulates an upstream LLM with a fixed latency, so
+the benchmark runs offline and measures only the fan‑out machinery.
+Results are printed as JSON, one entry per concurrency limit.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from t_rag.config import ModelConfig  # noqa: E402
+from t_rag.llm_reasoner import StubLLMReasoner  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--incidents", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    incidents = [
+        ([{"message": f"service: svc-{i % 50}; operation: op-{i}; status: ERROR"}], [])
+        for i in range(args.incidents)
+    ]
+    results = []
+    for limit in args.concurrency:
+        config = ModelConfig(llm_max_concurrency=limit, llm_cache_size=0, llm_timeout=0)
+        reasoner = StubLLMReasoner(config, latency=args.latency)
+        started = time.perf_counter()
+        outcomes = reasoner.generate_batch(incidents)
+        elapsed = time.perf_counter() - started
+        failures = sum(isinstance(outcome, BaseException) for outcome in outcomes)
+        results.append(
+            {
+                "concurrency": limit,
+                "seconds": round(elapsed, 3),
+                "incidents_per_s": round(args.incidents / elapsed, 1),
+                "peak_in_flight": reasoner.peak_in_flight,
+                "failures": failures,
+            }
+        )
+    print(json.dumps({"incidents": args.incidents, "latency_s": args.latency, "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Throughput of OTLP flattening with resource attribute hoisting.
+
+Run from ``projects/t-rag``::
+
+    python benchmarks/bench_otlp_flatten.py --resources 10 --spans-per-resource 5000
+
+A synthetic OTLP export is written to a temporary file.  As is usual
+for SDK exports, ``service.name`` and the other identifying attributes
+are only present on the ``resource``.  Three loaders parse it:
+
+* ``dropped``: the resource block is discarded, as before hoisting, so
+  every span ends up as ``unknown_service``;
+* ``per_span``: each span carries the raw resource block, which is
+  flattened again for every span;
+* ``hoisted``: the current loader, which flattens each resource once
+  and shares the result between its spans.
+
+Results are printed as JSON.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from t_rag.trace_loader import RESOURCE_ATTRIBUTES_KEY, TraceLoader  # noqa: E402
+
+
+class DroppedResourceLoader(TraceLoader):
+    """Flattening that ignores the ``resource`` block."""
+
+    def _extract_spans_from_otlp(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        spans = super()._extract_spans_from_otlp(data)
+        for span in spans:
+            del span[RESOURCE_ATTRIBUTES_KEY]
+        return spans
+
+
+class PerSpanResourceLoader(TraceLoader):
+    """Flattening that resolves the resource separately for every span."""
+
+    def _extract_spans_from_otlp(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        spans: List[Dict[str, Any]] = []
+        for res in data.get("resourceSpans", []):
+            for scope in res.get("scopeSpans", []):
+                for span in scope.get("spans", []):
+                    span["resource"] = res.get("resource")
+                    spans.append(span)
+        return spans
+
+
+def otlp_document(resources: int, spans_per_resource: int, resource_attrs: int) -> Dict[str, Any]:
+    resource_spans = []
+    for r in range(resources):
+        attributes = [{"key": "service.name", "value": {"stringValue": f"service-{r}"}}]
+        attributes += [
+            {"key": f"deployment.attr.{i}", "value": {"stringValue": f"value-{r}-{i}"}}
+            for i in range(resource_attrs - 1)
+        ]
+        spans = [
+            {
+                "traceId": f"{r:04x}{i // 20:012x}",
+                "spanId": f"{r:04x}{i:012x}",
+                "name": f"GET /api/{i % 50}",
+                "startTimeUnixNano": str(1_700_000_000_000_000_000 + i * 1000),
+                "endTimeUnixNano": str(1_700_000_000_000_400_000 + i * 1000),
+                "attributes": [
+                    {"key": "http.method", "value": {"stringValue": "GET"}},
+                    {"key": "http.url", "value": {"stringValue": f"/api/{i % 50}"}},
+                    {"key": "http.status_code", "value": {"intValue": 200}},
+                ],
+                "status": {"code": "STATUS_CODE_OK"},
+            }
+            for i in range(spans_per_resource)
+        ]
+        resource_spans.append({"resource": {"attributes": attributes}, "scopeSpans": [{"spans": spans}]})
+    return {"resourceSpans": resource_spans}
+
+
+def measure(loader: TraceLoader, repeat: int) -> Dict[str, Any]:
+    best = float("inf")
+    records = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        records = loader.load_spans()
+        best = min(best, time.perf_counter() - started)
+    return {
+        "spans_per_sec": round(len(records) / best),
+        "unknown_service": sum(rec.service_name == "unknown_service" for rec in records),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=10)
+    parser.add_argument("--spans-per-resource", type=int, default=5000)
+    parser.add_argument("--resource-attrs", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    document = otlp_document(args.resources, args.spans_per_resource, args.resource_attrs)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "trace.json"
+        path.write_text(json.dumps(document), encoding="utf-8")
+        results = {
+            "dropped": measure(DroppedResourceLoader(path), args.repeat),
+            "per_span": measure(PerSpanResourceLoader(path), args.repeat),
+            "hoisted": measure(TraceLoader(path), args.repeat),
+            "hoisted_streaming": measure(TraceLoader(path, streaming=True), args.repeat),
+        }
+    print(
+        json.dumps(
+            {
+                "resources": args.resources,
+                "spans_per_resource": args.spans_per_resource,
+                "resource_attrs": args.resource_attrs,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
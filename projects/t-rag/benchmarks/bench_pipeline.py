@@ -0,0 +1,331 @@
+"""End-to-end T-RAG benchmark suite at increasing trace volumes.
+
+Run from ``projects/t-rag``::
+
+    python benchmarks/bench_pipeline.py --scales 1000 10000 100000 1000000 --output pipeline.json
+
+For every scale, a synthetic OTLP export with that many historical
+spans (plus ``--incidents`` incident traces) is written to a temporary
+directory and pushed through the pipeline stage by stage:
+
+* ``parse``: :class:`t_rag.trace_loader.TraceLoader` reads the export;
+* ``embed``: span messages are encoded by the offline
+  :class:`t_rag.embedders.HashingEmbedder`;
+* ``insert``: historical spans are added to the
+  :class:`t_rag.vector_memory.VectorMemoryStore` in chunks;
+* ``query``: the spans of each incident are searched as one batch;
+* ``analyze``: :meth:`t_rag.service.TragEngine.analyze` runs end to end
+  with the stub LLM provider, so the suite needs no network access.
+
+Each stage reports its throughput or p50/p99 latency and the peak
+resident set size observed while it ran, sampled from
+``/proc/self/statm`` (the lifetime peak from ``getrusage`` on systems
+without procfs).  Results are written as JSON to ``--output`` together
+with the git revision and library versions; ``--baseline`` prints the
+ratio of every metric to an earlier results file, so regressions
+between versions are easy to spot.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from t_rag.config import TRAGConfig  # noqa: E402
+from t_rag.service import TragEngine, embed_messages  # noqa: E402
+from t_rag.trace_loader import TraceLoader  # noqa: E402
+
+OPERATIONS = ["GET /api/cart", "POST /api/checkout", "GET /api/user", "db.query", "cache.get", "rpc.charge"]
+ERRORS = ["timeout after 5000 ms", "connection refused", "deadlock detected", "out of memory"]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRss:
+    """Track the peak resident set size while the ``with`` block runs."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self) -> "PeakRss":
+        self.start = self.peak = _rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "peak_rss_mb": round(self.peak / 2**20, 1),
+            "rss_growth_mb": round((self.peak - self.start) / 2**20, 1),
+        }
+
+
+def write_otlp(
+    directory: Path, traces: int, spans_per_trace: int, services: int, spans_per_file: int, seed: int
+) -> None:
+    """Write ``traces`` synthetic traces as OTLP JSON files into ``directory``.
+
+    Every trace is a chain of calls across services; roughly one trace
+    in ten fails, with the error on one of its spans.
+    """
+    rng = np.random.default_rng(seed)
+    traces_per_file = max(1, spans_per_file // spans_per_trace)
+    for first in range(0, traces, traces_per_file):
+        by_service: Dict[int, List[Dict[str, Any]]] = {}
+        for t in range(first, min(first + traces_per_file, traces)):
+            failing = int(rng.integers(0, spans_per_trace)) if rng.random() < 0.1 else -1
+            error = ERRORS[t % len(ERRORS)]
+            start = 1_700_000_000_000_000_000 + t * 1_000_000_000
+            for i in range(spans_per_trace):
+                attributes = [
+                    {"key": "http.status_code", "value": {"intValue": 500 if i == failing else 200}},
+                    {"key": "peer.pod", "value": {"stringValue": f"pod-{int(rng.integers(0, 64))}"}},
+                ]
+                if i == failing:
+                    attributes.append({"key": "error.message", "value": {"stringValue": error}})
+                by_service.setdefault((t + i) % services, []).append(
+                    {
+                        "traceId": f"{t:032x}",
+                        "spanId": f"{t:08x}{i:08x}",
+                        "parentSpanId": f"{t:08x}{i - 1:08x}" if i else "",
+                        "name": OPERATIONS[(t + i) % len(OPERATIONS)],
+                        "startTimeUnixNano": str(start + i * 1_000_000),
+                        "endTimeUnixNano": str(start + i * 1_000_000 + int(rng.integers(1, 900_000))),
+                        "attributes": attributes,
+                        "status": {"code": "STATUS_CODE_ERROR" if i == failing else "STATUS_CODE_OK"},
+                    }
+                )
+        document = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": f"svc-{s}"}}]},
+                    "scopeSpans": [{"spans": spans}],
+                }
+                for s, spans in sorted(by_service.items())
+            ]
+        }
+        path = directory / f"traces-{first // traces_per_file:05d}.json"
+        path.write_text(json.dumps(document), encoding="utf-8")
+
+
+def _latencies(samples: List[float]) -> Dict[str, float]:
+    ms = 1000 * np.asarray(samples)
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def _config(args: argparse.Namespace) -> TRAGConfig:
+    config = TRAGConfig()
+    config.model.embedding_backend = "hashing"
+    config.model.hashing_dimension = args.dim
+    config.model.llm_provider = "stub"
+    config.model.llm_cache_size = 0
+    config.model.embedding_cache_size = 0
+    config.model.embedding_cache_path = None
+    config.store.persist_path = None
+    config.store.storage_dtype = args.storage
+    config.store.trace_candidates = args.trace_candidates
+    config.store.retrieval_mode = "historical"
+    config.store.remember_incidents = False
+    config.store.max_rows = 0
+    config.store.ttl_seconds = 0.0
+    config.store.service_quota = 0
+    config.store.service_quotas = {}
+    config.ingest.chunk_size = args.chunk_size
+    return config
+
+
+def run_scale(spans: int, args: argparse.Namespace) -> Dict[str, Any]:
+    history_traces = -(-spans // args.spans_per_trace)
+    stages: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        write_otlp(
+            Path(tmp),
+            history_traces + args.incidents,
+            args.spans_per_trace,
+            args.services,
+            args.spans_per_file,
+            args.seed,
+        )
+        generate_seconds = time.perf_counter() - started
+        loader = TraceLoader(tmp, streaming=args.streaming)
+        with PeakRss() as rss:
+            started = time.perf_counter()
+            records = loader.load_spans()
+            elapsed = time.perf_counter() - started
+        stages["parse"] = {"seconds": round(elapsed, 3), "spans_per_s": round(len(records) / elapsed), **rss.report()}
+    # Spans are exported grouped by service; order them by trace so the
+    # trailing traces can serve as incidents and the rest as history
+    records.sort(key=lambda rec: int(rec.trace_id, 16))
+
+    engine = TragEngine(_config(args))
+    with PeakRss() as rss:
+        started = time.perf_counter()
+        embeddings = embed_messages(engine.embedder, records)
+        elapsed = time.perf_counter() - started
+    stages["embed"] = {"seconds": round(elapsed, 3), "spans_per_s": round(len(records) / elapsed), **rss.report()}
+
+    # The trailing traces are the incidents; the rest is history
+    n_history = history_traces * args.spans_per_trace
+    incidents = [
+        records[start : start + args.spans_per_trace]
+        for start in range(n_history, len(records), args.spans_per_trace)
+    ]
+    with PeakRss() as rss:
+        samples = []
+        started = time.perf_counter()
+        for start in range(0, n_history, args.chunk_size):
+            stop = min(start + args.chunk_size, n_history)
+            chunk_started = time.perf_counter()
+            engine.store.add_records(embeddings[start:stop], records[start:stop])
+            samples.append(time.perf_counter() - chunk_started)
+        elapsed = time.perf_counter() - started
+    stages["insert"] = {
+        "seconds": round(elapsed, 3),
+        "spans_per_s": round(n_history / elapsed),
+        **_latencies(samples),
+        **rss.report(),
+    }
+
+    with PeakRss() as rss:
+        samples = []
+        for number, incident in enumerate(incidents):
+            start = n_history + number * args.spans_per_trace
+            queries = embeddings[start : start + len(incident)]
+            query_started = time.perf_counter()
+            engine.store.query_batch(queries, k=args.k, exclude_trace_ids={incident[0].trace_id})
+            samples.append(time.perf_counter() - query_started)
+    stages["query"] = {**_latencies(samples), **rss.report()}
+
+    del embeddings, records
+    gc.collect()
+    with PeakRss() as rss:
+        samples = []
+        for incident in incidents:
+            analyze_started = time.perf_counter()
+            engine.analyze(spans=incident)
+            samples.append(time.perf_counter() - analyze_started)
+    stages["analyze"] = {**_latencies(samples), **rss.report()}
+    result = {
+        "spans": len(engine.store),
+        "generate_seconds": round(generate_seconds, 3),
+        "stages": stages,
+    }
+    engine.close()
+    return result
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Return ``current / baseline`` for every numeric stage metric of matching scales."""
+    previous = {entry["spans"]: entry["stages"] for entry in baseline["scales"]}
+    ratios: Dict[str, Any] = {}
+    for entry in results["scales"]:
+        old_stages = previous.get(entry["spans"])
+        if old_stages is None:
+            continue
+        ratios[str(entry["spans"])] = {
+            stage: {
+                metric: round(value / old[metric], 3)
+                for metric, value in metrics.items()
+                if isinstance(value, (int, float)) and old.get(metric)
+            }
+            for stage, metrics in entry["stages"].items()
+            if (old := old_stages.get(stage))
+        }
+    return ratios
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--spans-per-trace", type=int, default=20)
+    parser.add_argument("--services", type=int, default=20)
+    parser.add_argument("--spans-per-file", type=int, default=100_000)
+    parser.add_argument("--incidents", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--storage", choices=["float32", "float16", "int8"], default="float32")
+    parser.add_argument("--trace-candidates", type=int, default=0)
+    parser.add_argument("--streaming", action="store_true", help="parse with the streaming JSON reader")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("bench_pipeline.json"))
+    parser.add_argument("--baseline", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "settings": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+            if key not in {"output", "baseline"}
+        },
+        "scales": [],
+    }
+    for spans in args.scales:
+        results["scales"].append(run_scale(spans, args))
+        gc.collect()
+        # Rewrite after every scale so a long run leaves partial results
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(json.dumps(results["scales"], indent=2))
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        print(json.dumps({"ratio_to_baseline": compare(results, baseline)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
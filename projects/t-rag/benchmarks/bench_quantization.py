@@ -0,0 +1,92 @@
+"""Memory, recall@k and latency of compact T-RAG embedding storage.
+
+Run from ``projects/t-rag``::
+
+    python benchmarks/bench_quantization.py --size 200000 --rescore 0 4
+
+Every storage format in ``--storage`` is combined with every rescoring
+factor in ``--rescore``.  Stores that rescore are snapshotted to a
+temporary directory first, so full-precision vectors are read from the
+memory-mapped snapshot rather than held in memory, as in a deployment
+with ``TRAG_STORE_PATH`` set.  Results are printed as JSON.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from bench_ann_recall import clustered_vectors  # noqa: E402
+from t_rag.ann_index import create_index, exact_search, recall_at_k  # noqa: E402
+from t_rag.vector_memory import VectorMemoryStore  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--storage", nargs="+", default=["float32", "float16", "int8"])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--backend", default="exact", help="'exact' or 'ivf'")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    data = clustered_vectors(args.size + args.queries, args.dim, clusters=256, rng=rng)
+    matrix, queries = data[: args.size], data[args.size :]
+    exact_ids, _ = exact_search(matrix, queries, args.k)
+    metadata = [None] * args.size
+
+    results = []
+    for storage in args.storage:
+        for factor in args.rescore:
+            if storage == "float32" and factor:
+                continue
+            with tempfile.TemporaryDirectory() as tmp:
+                store = VectorMemoryStore(
+                    dimension=args.dim,
+                    ann_index=create_index(args.backend),
+                    storage=storage,
+                    rescore_factor=factor,
+                )
+                started = time.perf_counter()
+                store.add(matrix, metadata)
+                if factor:
+                    store.snapshot(tmp)
+                build_seconds = time.perf_counter() - started
+                # Warm up lazily built indexes before timing
+                store.query_batch(queries[:1], k=args.k)
+                started = time.perf_counter()
+                ids, _ = store.query_batch(queries, k=args.k)
+                elapsed = time.perf_counter() - started
+                results.append(
+                    {
+                        "storage": storage,
+                        "rescore_factor": factor,
+                        "bytes_per_vector": round(store.nbytes / args.size, 1),
+                        "memory_mb": round(store.nbytes / 2**20, 2),
+                        "recall_at_k": round(recall_at_k(ids, exact_ids), 4),
+                        "query_ms": round(1000 * elapsed / args.queries, 4),
+                        "build_s": round(build_seconds, 3),
+                    }
+                )
+                del store
+    print(
+        json.dumps(
+            {"size": args.size, "dim": args.dim, "k": args.k, "backend": args.backend, "results": results},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
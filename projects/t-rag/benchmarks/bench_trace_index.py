@@ -0,0 +1,116 @@
+"""Latency and recall of coarse-to-fine (trace-level) retrieval.
+
+Run from ``projects/t-rag``::
+
+    python benchmarks/bench_trace_index.py --traces 20000 --spans-per-trace 50 --candidates 4 16 64
+
+Synthetic history: every trace follows one of ``--templates`` request
+flows, and each of its spans is the embedding of the flow's operation
+at that position plus noise.  Each query is the full span batch of a
+new incident following a random flow, as :class:`t_rag.service.TragEngine`
+issues it.  Flat span search is compared with coarse-to-fine search at
+several ``trace_candidates`` settings; recall@k is measured against
+flat search.  Results are printed as JSON.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from t_rag.ann_index import recall_at_k  # noqa: E402
+from t_rag.vector_memory import VectorMemoryStore  # noqa: E402
+
+
+def synthetic_traces(
+    traces: int, spans_per_trace: int, templates: int, dim: int, rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return span embeddings, per-span trace ids and the flow templates."""
+    flows = rng.normal(size=(templates, spans_per_trace, dim)).astype(np.float32)
+    labels = rng.integers(0, templates, size=traces)
+    vectors = flows[labels] + 0.5 * rng.normal(size=(traces, spans_per_trace, dim)).astype(np.float32)
+    vectors = vectors.reshape(-1, dim)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    trace_ids = np.repeat(np.arange(traces), spans_per_trace)
+    return vectors, trace_ids, flows
+
+
+def incident(flows: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    flow = flows[rng.integers(0, flows.shape[0])]
+    spans = flow + 0.5 * rng.normal(size=flow.shape).astype(np.float32)
+    return spans / np.linalg.norm(spans, axis=1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--traces", type=int, default=20_000)
+    parser.add_argument("--spans-per-trace", type=int, default=50)
+    parser.add_argument("--templates", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--incidents", type=int, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--pooling", choices=["mean", "attention"], default="mean")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors, trace_ids, flows = synthetic_traces(
+        args.traces, args.spans_per_trace, args.templates, args.dim, rng
+    )
+    incidents = [incident(flows, rng) for _ in range(args.incidents)]
+    store = VectorMemoryStore(dimension=args.dim, trace_pooling=args.pooling)
+    store.add(vectors, ({"trace_id": int(t)} for t in trace_ids))
+    del vectors
+
+    store.trace_candidates = 0
+    started = time.perf_counter()
+    exact = [store.query_batch(spans, k=args.k)[0] for spans in incidents]
+    flat_ms = 1000 * (time.perf_counter() - started) / args.incidents
+
+    # The first coarse-to-fine query indexes and pools every trace; a
+    # long-running store does this incrementally on insert instead.
+    store.trace_candidates = args.candidates[0]
+    started = time.perf_counter()
+    store.query_batch(incidents[0][:1], k=args.k)
+    index_seconds = time.perf_counter() - started
+
+    results = []
+    for candidates in args.candidates:
+        store.trace_candidates = candidates
+        started = time.perf_counter()
+        found = [store.query_batch(spans, k=args.k)[0] for spans in incidents]
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "trace_candidates": candidates,
+                "recall_at_k": round(recall_at_k(np.vstack(found), np.vstack(exact)), 4),
+                "incident_ms": round(1000 * elapsed / args.incidents, 3),
+            }
+        )
+    print(
+        json.dumps(
+            {
+                "spans": len(store),
+                "traces": store.trace_index.n_traces,
+                "dim": args.dim,
+                "k": args.k,
+                "pooling": args.pooling,
+                "trace_index_build_s": round(index_seconds, 3),
+                "flat_incident_ms": round(flat_ms, 3),
+                "coarse_to_fine": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,21 @@ language‑model reasoning and service orchestration components via
 __all__ = [
     "config",
     "trace_loader",
+    "json_stream",
     "vector_memory",
+    "ann_index",
+    "metadata_index",
+    "trace_index",
+    "eviction",
+    "persistence",
+    "quantization",
+    "embedders",
+    "embedding_cache",
+    "corpus_builder",
+    "retrieval",
     "llm_reasoner",
+    "llm_cache",
+    "prompt_compression",
+    "span_table",
     "service",
 ]
\ No newline at end of file
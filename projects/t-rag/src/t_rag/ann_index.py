@@ -0,0 +1,295 @@
+"""
+ann_index.py
+============
+
+Nearest‑neighbour search backends for :class:`t_rag.vector_memory.VectorMemoryStore`.
+
+The default store answers queries exactly by scoring every stored
+embedding, which is linear in the size of the store.  This module
+defines a small backend interface (:class:`NeighborIndex`) that the
+store delegates to when configured, together with a pure‑NumPy
+inverted‑file index (:class:`IVFIndex`) that trades a tunable amount
+of recall for sub‑linear query cost.  All backends assume
+unit‑normalised embeddings and report cosine distances.
+
+Backends are selected by name through :class:`t_rag.config.StoreConfig`
+(see :func:`create_index`), so switching from exact to approximate
+search does not require changes to the service code.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple, Type
+
+import numpy as np
+
+from .quantization import QuantizedMatrix
+
+
+def exact_search(
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    block_size: int = 1024,
+    mask: np.ndarray | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Brute‑force top‑``k`` cosine search over unit‑normalised vectors.
+
+    Args:
+        matrix: Stored embeddings of shape ``(n, dim)``, either a dense
+            array or a :class:`~t_rag.quantization.QuantizedMatrix`.
+        queries: Query embeddings of shape ``(n_queries, dim)``.
+        k: Number of neighbours per query; clamped to the number of
+            eligible rows.
+        block_size: Number of query rows scored per matrix
+            multiplication, bounding the size of the similarity block.
+        mask: Optional boolean array of shape ``(n,)``.  Rows where it
+            is ``False`` are excluded inside the kernel, so ``k``
+            results are returned without over‑fetching.
+
+    Returns:
+        A tuple ``(ids, distances)`` of arrays with shape
+        ``(n_queries, min(k, eligible))``, sorted by ascending distance.
+    """
+    size = matrix.shape[0]
+    eligible = size if mask is None else int(np.count_nonzero(mask))
+    k = min(k, eligible)
+    ids = np.empty((queries.shape[0], k), dtype=np.int64)
+    distances = np.empty((queries.shape[0], k), dtype=np.float32)
+    if k == 0:
+        return ids, distances
+    for start in range(0, queries.shape[0], block_size):
+        block = queries[start : start + block_size]
+        scores = matrix.dot(block) if isinstance(matrix, QuantizedMatrix) else block @ matrix.T
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        if k < size:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(size), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        ids[start : start + len(block)] = np.take_along_axis(top, order, axis=1)
+        distances[start : start + len(block)] = 1.0 - np.take_along_axis(top_scores, order, axis=1)
+    return ids, distances
+
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """Fraction of exact top‑``k`` neighbours found by an approximate search.
+
+    Args:
+        approx_ids: Neighbour ids returned by the approximate index,
+            shape ``(n_queries, k)``.  Padding entries of ``-1`` are
+            ignored.
+        exact_ids: Ground‑truth neighbour ids, shape ``(n_queries, k)``.
+
+    Returns:
+        Mean recall over all queries, between 0 and 1.
+    """
+    if exact_ids.size == 0:
+        return 1.0
+    hits = 0
+    for approx_row, exact_row in zip(approx_ids, exact_ids):
+        hits += len(np.intersect1d(approx_row[approx_row >= 0], exact_row))
+    return hits / exact_ids.size
+
+
+class NeighborIndex:
+    """Interface for nearest‑neighbour backends used by the vector store.
+
+    The store calls :meth:`build` lazily with its full embedding matrix
+    whenever the matrix has changed since the last query, and then
+    :meth:`search` for each block of queries.  Between builds rows are
+    either appended, in which case implementations may reuse state
+    from the previous build for the leading rows, or renumbered (e.g.
+    when the store compacts away evicted rows), in which case the
+    store calls :meth:`reset` first.
+    """
+
+    def build(self, embeddings: np.ndarray) -> None:
+        """(Re)build the index over ``embeddings`` of shape ``(n, dim)``."""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """Drop all state tied to row ids; the next build starts afresh."""
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        mask: np.ndarray | None = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(ids, distances)`` arrays of shape ``(n_queries, k)``.
+
+        Rows where the optional boolean ``mask`` is ``False`` must not
+        be returned.  Rows with fewer than ``k`` candidates are padded
+        with id ``-1`` and distance ``inf``.
+        """
+        raise NotImplementedError
+
+
+class IVFIndex(NeighborIndex):
+    """Inverted‑file index with a spherical k‑means coarse quantiser.
+
+    Stored vectors are partitioned into ``n_lists`` clusters.  A query
+    is compared against the cluster centroids first and then scored
+    exactly against the members of the ``n_probe`` closest clusters
+    only.  Raising ``n_probe`` increases recall at the cost of latency;
+    ``n_probe == n_lists`` degenerates to exact search.
+
+    Centroids are trained on a sample of at most ``max_train_samples``
+    vectors.  When the index is rebuilt after appends, vectors are
+    assigned to the existing centroids and training is only repeated
+    once the store has grown by ``retrain_growth`` since the last
+    training run.
+    """
+
+    def __init__(
+        self,
+        n_lists: int | None = None,
+        n_probe: int = 8,
+        n_iter: int = 10,
+        max_train_samples: int = 50_000,
+        retrain_growth: float = 2.0,
+        seed: int = 0,
+    ) -> None:
+        if n_probe < 1:
+            raise ValueError("n_probe must be positive")
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.max_train_samples = max_train_samples
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+        self._matrix: np.ndarray | None = None
+        self._centroids: np.ndarray | None = None
+        self._assignments = np.empty(0, dtype=np.int64)
+        self._trained_size = 0
+        # Inverted lists as a permutation of row ids grouped by cluster,
+        # with ``_offsets[c]:_offsets[c + 1]`` delimiting cluster ``c``.
+        self._members = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+
+    def build(self, embeddings: np.ndarray) -> None:
+        size = embeddings.shape[0]
+        self._matrix = embeddings
+        if size == 0:
+            self._centroids = None
+            self._assignments = np.empty(0, dtype=np.int64)
+            self._trained_size = 0
+        else:
+            previous = len(self._assignments)
+            if (
+                self._centroids is None
+                or size < previous
+                or size > self._trained_size * self.retrain_growth
+            ):
+                self._train(embeddings)
+                self._assignments = self._assign(embeddings)
+            elif size > previous:
+                self._assignments = np.concatenate(
+                    [self._assignments, self._assign(embeddings[previous:])]
+                )
+        n_lists = 0 if self._centroids is None else self._centroids.shape[0]
+        self._members = np.argsort(self._assignments, kind="stable")
+        counts = np.bincount(self._assignments, minlength=n_lists)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def reset(self) -> None:
+        # Centroids do not depend on row ids and are kept; every row is
+        # reassigned to them on the next build
+        self._matrix = None
+        self._assignments = np.empty(0, dtype=np.int64)
+        self._members = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+
+    def _train(self, embeddings: np.ndarray) -> None:
+        """Fit the coarse quantiser with spherical k‑means."""
+        size = embeddings.shape[0]
+        rng = np.random.default_rng(self.seed)
+        n_lists = self.n_lists or max(1, int(np.sqrt(size)))
+        n_lists = min(n_lists, size)
+        if size > self.max_train_samples:
+            sample = embeddings[rng.choice(size, self.max_train_samples, replace=False)]
+        else:
+            # Slicing densifies quantised matrices and is a view otherwise
+            sample = embeddings[:]
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re‑seed empty clusters with random samples
+            if np.any(empty):
+                sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+                norms[empty] = np.linalg.norm(sums[empty], axis=1, keepdims=True)
+            centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+        self._centroids = centroids
+        self._trained_size = size
+
+    def _assign(self, embeddings: np.ndarray, block_size: int = 4096) -> np.ndarray:
+        labels = np.empty(embeddings.shape[0], dtype=np.int64)
+        for start in range(0, embeddings.shape[0], block_size):
+            block = embeddings[start : start + block_size]
+            labels[start : start + len(block)] = np.argmax(block @ self._centroids.T, axis=1)
+        return labels
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        mask: np.ndarray | None = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        ids = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        distances = np.full((queries.shape[0], k), np.inf, dtype=np.float32)
+        if self._centroids is None or k == 0:
+            return ids, distances
+        n_probe = min(self.n_probe, self._centroids.shape[0])
+        centroid_scores = queries @ self._centroids.T
+        probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+        for row, query in enumerate(queries):
+            candidates = np.concatenate(
+                [self._members[self._offsets[c] : self._offsets[c + 1]] for c in probes[row]]
+            )
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if candidates.size == 0:
+                continue
+            cand_ids, cand_dists = exact_search(self._matrix[candidates], query[None, :], k)
+            found = cand_ids.shape[1]
+            ids[row, :found] = candidates[cand_ids[0]]
+            distances[row, :found] = cand_dists[0]
+        return ids, distances
+
+
+#: Registry of approximate backends selectable by name via
+#: ``StoreConfig.index_backend``.  ``"exact"`` is handled by the store
+#: itself and therefore not listed here.
+INDEX_BACKENDS: Dict[str, Type[NeighborIndex]] = {
+    "ivf": IVFIndex,
+}
+
+
+def create_index(name: str, **params: Any) -> NeighborIndex | None:
+    """Instantiate a backend by name.
+
+    Args:
+        name: Backend name, either ``"exact"`` or a key of
+            :data:`INDEX_BACKENDS`.
+        **params: Keyword arguments forwarded to the backend
+            constructor.  Parameters set to ``None`` are dropped so the
+            backend defaults apply.
+
+    Returns:
+        A :class:`NeighborIndex`, or ``None`` for exact search.
+    """
+    if name == "exact":
+        return None
+    try:
+        backend = INDEX_BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown index backend {name!r}; expected 'exact' or one of {sorted(INDEX_BACKENDS)}"
+        ) from None
+    return backend(**{key: value for key, value in params.items() if value is not None})
@@ -12,6 +12,25 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass, field
+from typing import Dict
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    """Interpret an environment variable as a boolean flag."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_quotas(name: str) -> Dict[str, int]:
+    """Parse an environment variable of the form ``svc=100,other=20``."""
+    quotas: Dict[str, int] = {}
+    for item in (os.getenv(name) or "").split(","):
+        if item.strip():
+            service, _, quota = item.rpartition("=")
+            quotas[service.strip()] = int(quota)
+    return quotas
 
 
 @dataclass
@@ -34,6 +53,54 @@ class ModelConfig:
         openai_temperature: Sampling temperature for the LLM.  Lower
             values yield more deterministic outputs.  Controlled via
             ``TRAG_OPENAI_TEMPERATURE``.
+        llm_provider: Reasoner implementation: ``"openai"`` or the
+            offline ``"stub"`` provider.  Controlled via
+            ``TRAG_LLM_PROVIDER``.
+        llm_cache_size: Maximum number of LLM responses cached by prompt
+            fingerprint.  ``0`` disables the cache.  Controlled via
+            ``TRAG_LLM_CACHE_SIZE``.
+        llm_cache_ttl: Lifetime of a cached LLM response in seconds.
+            Controlled via ``TRAG_LLM_CACHE_TTL``.
+        llm_max_concurrency: Maximum number of simultaneous provider
+            calls made by the asynchronous reasoner API.  Controlled via
+            ``TRAG_LLM_MAX_CONCURRENCY``.
+        llm_timeout: Per‑call timeout in seconds for the asynchronous
+            reasoner API.  ``0`` disables it.  Controlled via
+            ``TRAG_LLM_TIMEOUT``.
+        prompt_token_budget: Estimated token budget for the span and
+            context listings in the LLM prompt.  Larger incidents are
+            compressed to fit (see :mod:`t_rag.prompt_compression`).
+            ``0`` lists every span verbatim.  Controlled via
+            ``TRAG_PROMPT_TOKEN_BUDGET``.
+        prompt_current_share: Fraction of ``prompt_token_budget`` given
+            to the current incident's spans; the rest is used for
+            retrieved contexts.  Controlled via
+            ``TRAG_PROMPT_CURRENT_SHARE``.
+        max_context_traces: Maximum number of historical traces whose
+            spans are passed to the LLM as retrieved context.  Traces
+            are ranked by the total similarity of their neighbour hits.
+            Controlled via ``TRAG_MAX_CONTEXT_TRACES``.
+        max_spans_per_trace: Maximum number of distinct spans included
+            per retrieved trace.  Controlled via
+            ``TRAG_MAX_SPANS_PER_TRACE``.
+        embedding_cache_size: Maximum number of message embeddings kept
+            in the in‑process cache.  ``0`` disables caching.
+            Controlled via ``TRAG_EMBEDDING_CACHE_SIZE``.
+        embedding_cache_path: Optional SQLite file for the on‑disk
+            embedding cache shared across runs.  Controlled via
+            ``TRAG_EMBEDDING_CACHE_PATH``.
+        embedding_backend: Embedding implementation:
+            ``"sentence-transformers"`` (the model named by
+            ``embedding_model_name``) or the offline ``"hashing"``
+            backend (see :mod:`t_rag.embedders`).  Controlled via
+            ``TRAG_EMBEDDING_BACKEND``.
+        hashing_dimension: Vector dimensionality of the ``"hashing"``
+            backend.  Controlled via ``TRAG_HASHING_DIM``.
+        hashing_features: Number of hash buckets the ``"hashing"``
+            backend projects down to ``hashing_dimension`` with a
+            random projection.  ``0`` hashes straight into
+            ``hashing_dimension`` buckets.  Controlled via
+            ``TRAG_HASHING_FEATURES``.
     """
 
     embedding_model_name: str = field(
@@ -46,6 +113,42 @@ class ModelConfig:
         default_factory=lambda: os.getenv("TRAG_OPENAI_MODEL", "gpt-3.5-turbo")
     )
     openai_temperature: float = float(os.getenv("TRAG_OPENAI_TEMPERATURE", 0.2))
+    llm_provider: str = field(default_factory=lambda: os.getenv("TRAG_LLM_PROVIDER", "openai"))
+    llm_cache_size: int = field(default_factory=lambda: int(os.getenv("TRAG_LLM_CACHE_SIZE", 256)))
+    llm_cache_ttl: float = field(
+        default_factory=lambda: float(os.getenv("TRAG_LLM_CACHE_TTL", 3600))
+    )
+    llm_max_concurrency: int = field(
+        default_factory=lambda: int(os.getenv("TRAG_LLM_MAX_CONCURRENCY", 8))
+    )
+    llm_timeout: float = field(default_factory=lambda: float(os.getenv("TRAG_LLM_TIMEOUT", 60)))
+    prompt_token_budget: int = field(
+        default_factory=lambda: int(os.getenv("TRAG_PROMPT_TOKEN_BUDGET", 3000))
+    )
+    prompt_current_share: float = field(
+        default_factory=lambda: float(os.getenv("TRAG_PROMPT_CURRENT_SHARE", 0.7))
+    )
+    max_context_traces: int = field(
+        default_factory=lambda: int(os.getenv("TRAG_MAX_CONTEXT_TRACES", 5))
+    )
+    max_spans_per_trace: int = field(
+        default_factory=lambda: int(os.getenv("TRAG_MAX_SPANS_PER_TRACE", 20))
+    )
+    embedding_cache_size: int = field(
+        default_factory=lambda: int(os.getenv("TRAG_EMBEDDING_CACHE_SIZE", 100_000))
+    )
+    embedding_cache_path: str | None = field(
+        default_factory=lambda: os.getenv("TRAG_EMBEDDING_CACHE_PATH") or None
+    )
+    embedding_backend: str = field(
+        default_factory=lambda: os.getenv("TRAG_EMBEDDING_BACKEND", "sentence-transformers")
+    )
+    hashing_dimension: int = field(
+        default_factory=lambda: int(os.getenv("TRAG_HASHING_DIM", 384))
+    )
+    hashing_features: int = field(
+        default_factory=lambda: int(os.getenv("TRAG_HASHING_FEATURES", 0))
+    )
 
 
 @dataclass
@@ -59,23 +162,147 @@ class StoreConfig:
         n_neighbors: Number of neighbours to return when querying the
             vector store.  Defaults to ``ModelConfig.top_k`` unless
             explicitly provided.
+        index_backend: Nearest‑neighbour search backend.  ``"exact"``
+            scores every stored vector; ``"ivf"`` uses the approximate
+            inverted‑file index from :mod:`t_rag.ann_index`.  Controlled
+            via ``TRAG_INDEX_BACKEND``.
+        ivf_n_lists: Number of clusters of the IVF index.  Defaults to
+            the square root of the store size when unset.  Controlled
+            via ``TRAG_IVF_N_LISTS``.
+        ivf_n_probe: Number of IVF clusters scanned per query.  Higher
+            values improve recall at the cost of latency.  Controlled
+            via ``TRAG_IVF_N_PROBE``.
+        storage_dtype: Format of the embeddings held in memory:
+            ``"float32"``, ``"float16"`` or scalar‑quantised ``"int8"``
+            (see :mod:`t_rag.quantization`).  Controlled via
+            ``TRAG_STORE_DTYPE``.
+        rescore_factor: With ``float16`` or ``int8`` storage, search
+            ``top_k * rescore_factor`` candidates on the compact codes
+            and re‑rank them exactly against full‑precision vectors,
+            which are memory‑mapped from the snapshot at
+            ``persist_path`` once written.  ``0`` (the default) keeps
+            only the codes.  Controlled via ``TRAG_RESCORE_FACTOR``.
+        time_bucket_seconds: Width of the start‑time buckets of the
+            metadata index used by filtered queries (see
+            :mod:`t_rag.metadata_index`).  Controlled via
+            ``TRAG_TIME_BUCKET_SECONDS``.
+        trace_candidates: Number of historical traces selected per
+            query span by the trace‑level index before spans are
+            searched, and only within those traces (see
+            :mod:`t_rag.trace_index`).  ``0`` (the default) searches all
+            spans.  Controlled via ``TRAG_TRACE_CANDIDATES``.
+        trace_pooling: How span embeddings are pooled into trace
+            embeddings: ``"mean"`` or ``"attention"``.  Controlled via
+            ``TRAG_TRACE_POOLING``.
+        persist_path: Directory of a persisted store snapshot (see
+            :mod:`t_rag.persistence`).  When set and the snapshot
+            exists, the store is restored from it rather than starting
+            empty.  Controlled via ``TRAG_STORE_PATH``.
+        retrieval_mode: ``"historical"`` (the default) queries the
+            store before the current incident's spans are inserted and
+            excludes the incident's trace ids inside the search kernel,
+            so every neighbour is a genuinely historical span.
+            ``"inclusive"`` inserts the current spans first and lets
+            them match themselves.  Controlled via
+            ``TRAG_RETRIEVAL_MODE``.
+        remember_incidents: Whether the spans of an analysed incident
+            are kept in the store afterwards, making them available as
+            history to later incidents.  Off by default, since a
+            long‑lived engine would otherwise grow without bound; when
+            enabling it, also bound the store with ``max_rows`` or
+            ``ttl_seconds``.  Controlled via
+            ``TRAG_REMEMBER_INCIDENTS``.
+        max_rows: Maximum number of live spans kept in the store.
+            Beyond it, spans are evicted according to
+            ``eviction_policy``.  ``0`` (the default) leaves the store
+            unbounded.  Controlled via ``TRAG_STORE_MAX_ROWS``.
+        eviction_policy: Which spans are evicted first: ``"oldest"``
+            (earliest span start time) or ``"lru"`` (least recently
+            returned by a query).  Controlled via
+            ``TRAG_EVICTION_POLICY``.
+        ttl_seconds: Spans that started longer ago than this are
+            evicted.  ``0`` disables expiry.  Controlled via
+            ``TRAG_STORE_TTL_SECONDS``.
+        service_quota: Maximum number of live spans per service.
+            ``0`` disables per‑service quotas.  Controlled via
+            ``TRAG_SERVICE_QUOTA``.
+        service_quotas: Per‑service overrides of ``service_quota``,
+            given as ``svc=100,other=20`` in ``TRAG_SERVICE_QUOTAS``.
+        compact_ratio: Fraction of evicted (tombstoned) rows at which
+            the store compacts itself, reclaiming their slots.
+            Controlled via ``TRAG_COMPACT_RATIO``.
     """
 
     dimension: int | None = None
     n_neighbors: int | None = None
+    index_backend: str = field(default_factory=lambda: os.getenv("TRAG_INDEX_BACKEND", "exact"))
+    ivf_n_lists: int | None = field(
+        default_factory=lambda: int(os.environ["TRAG_IVF_N_LISTS"])
+        if os.getenv("TRAG_IVF_N_LISTS")
+        else None
+    )
+    ivf_n_probe: int = field(default_factory=lambda: int(os.getenv("TRAG_IVF_N_PROBE", 8)))
+    storage_dtype: str = field(default_factory=lambda: os.getenv("TRAG_STORE_DTYPE", "float32"))
+    rescore_factor: int = field(default_factory=lambda: int(os.getenv("TRAG_RESCORE_FACTOR", 0)))
+    time_bucket_seconds: float = field(
+        default_factory=lambda: float(os.getenv("TRAG_TIME_BUCKET_SECONDS", 3600))
+    )
+    trace_candidates: int = field(default_factory=lambda: int(os.getenv("TRAG_TRACE_CANDIDATES", 0)))
+    trace_pooling: str = field(default_factory=lambda: os.getenv("TRAG_TRACE_POOLING", "mean"))
+    persist_path: str | None = field(default_factory=lambda: os.getenv("TRAG_STORE_PATH") or None)
+    retrieval_mode: str = field(
+        default_factory=lambda: os.getenv("TRAG_RETRIEVAL_MODE", "historical")
+    )
+    remember_incidents: bool = field(
+        default_factory=lambda: _env_flag("TRAG_REMEMBER_INCIDENTS", default=False)
+    )
+    max_rows: int = field(default_factory=lambda: int(os.getenv("TRAG_STORE_MAX_ROWS", 0)))
+    eviction_policy: str = field(default_factory=lambda: os.getenv("TRAG_EVICTION_POLICY", "oldest"))
+    ttl_seconds: float = field(default_factory=lambda: float(os.getenv("TRAG_STORE_TTL_SECONDS", 0)))
+    service_quota: int = field(default_factory=lambda: int(os.getenv("TRAG_SERVICE_QUOTA", 0)))
+    service_quotas: Dict[str, int] = field(default_factory=lambda: _env_quotas("TRAG_SERVICE_QUOTAS"))
+    compact_ratio: float = field(default_factory=lambda: float(os.getenv("TRAG_COMPACT_RATIO", 0.25)))
+
+
+@dataclass
+class IngestConfig:
+    """Configuration options for trace ingestion.
+
+    Attributes:
+        streaming: Parse trace files incrementally instead of loading
+            each document in one ``json.load`` call.  Recommended for
+            large incident exports.  Controlled via ``TRAG_STREAMING``.
+        chunk_size: Number of span records embedded and inserted into
+            the vector store at a time.  Controlled via
+            ``TRAG_CHUNK_SIZE``.
+        workers: Number of worker processes used to parse a directory
+            of trace files concurrently.  ``1`` disables parallel
+            ingestion and ``0`` uses one worker per CPU.  Controlled via
+            ``TRAG_INGEST_WORKERS``.
+        files_per_task: Number of trace files sent to a worker per
+            task.  Controlled via ``TRAG_INGEST_FILES_PER_TASK``.
+    """
+
+    streaming: bool = field(default_factory=lambda: _env_flag("TRAG_STREAMING"))
+    chunk_size: int = field(default_factory=lambda: int(os.getenv("TRAG_CHUNK_SIZE", 1024)))
+    workers: int = field(default_factory=lambda: int(os.getenv("TRAG_INGEST_WORKERS", 1)))
+    files_per_task: int = field(
+        default_factory=lambda: int(os.getenv("TRAG_INGEST_FILES_PER_TASK", 1))
+    )
 
 
 @dataclass
 class TRAGConfig:
     """Top‑level configuration container for T‑RAG.
 
-    This aggregates the model and store configuration sections into a
+    This aggregates the model, store and ingestion configuration sections into a
     single object.  Additional configuration groups can be added here
     in the future (for example, logging or tracing settings).
     """
 
     model: ModelConfig = field(default_factory=ModelConfig)
     store: StoreConfig = field(default_factory=StoreConfig)
+    ingest: IngestConfig = field(default_factory=IngestConfig)
 
 
 def load_config() -> TRAGConfig:
@@ -0,0 +1,315 @@
+"""
+corpus_builder.py
+=================
+
+Offline, resumable construction of T‑RAG memory from a trace archive.
+
+:func:`t_rag.service.run` analyses one incident at a time, which is the
+wrong tool for seeding the vector store with months of historical
+traces.  :class:`CorpusBuilder` walks an archive (a directory whose
+entries are trace files or per‑incident directories of trace files),
+embeds span summaries in large batches and appends them to sharded
+store snapshots under the output directory::
+
+    output/
+      checkpoint.json
+      shard-00000/   # a VectorMemoryStore snapshot (see persistence.py)
+      shard-00001/
+      ...
+
+Each shard holds at most ``shard_rows`` spans and can be opened with
+:meth:`t_rag.vector_memory.VectorMemoryStore.restore` or used as
+``TRAG_STORE_PATH``.
+
+After every batch the builder commits the shard snapshots and then
+atomically rewrites ``checkpoint.json`` with the archive entries that
+are complete and the number of spans already written from the entry in
+progress.  Re‑running the same command after a crash rolls the shards
+back to the checkpoint and continues from there, so no span is lost or
+written twice.
+
+Run from the command line::
+
+    python -m t_rag.corpus_builder --archive traces/ --output corpus/
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, List, TextIO, Tuple
+
+import numpy as np
+
+from .config import IngestConfig, load_config
+from .embedders import SentenceTransformerEmbedder, create_embedder
+from .embedding_cache import EmbeddingCache
+from .persistence import append_snapshot, read_manifest, rewind_snapshot
+from .trace_loader import SpanRecord, TraceLoader
+from .vector_memory import trace_key
+
+CHECKPOINT_FILE = "checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+
+def archive_entries(archive: str | Path) -> List[Tuple[str, Path]]:
+    """List the units of work of an archive in a deterministic order.
+
+    Args:
+        archive: A trace file, or a directory whose ``*.json`` files and
+            subdirectories are each treated as one unit.
+
+    Returns:
+        ``(name, path)`` pairs sorted by name, where ``name`` is the
+        path relative to ``archive``.
+    """
+    root = Path(archive)
+    if root.is_file():
+        return [(root.name, root)]
+    entries = [
+        (child.name, child)
+        for child in root.iterdir()
+        if child.is_dir() or child.suffix == ".json"
+    ]
+    return sorted(entries)
+
+
+def _directory_bytes(path: Path) -> int:
+    return sum(child.stat().st_size for child in path.iterdir() if child.is_file())
+
+
+class CorpusBuilder:
+    """Builds sharded vector store snapshots from a trace archive."""
+
+    def __init__(
+        self,
+        output: str | Path,
+        encode: Callable[[List[str]], np.ndarray],
+        model_name: str = "",
+        batch_size: int = 4096,
+        shard_rows: int = 1_000_000,
+        ingest: IngestConfig | None = None,
+        cache: EmbeddingCache | None = None,
+        log: TextIO | None = sys.stderr,
+    ) -> None:
+        """Prepare a build into ``output``.
+
+        Args:
+            output: Output directory.  If it holds a checkpoint, the
+                build resumes from it.
+            encode: Function mapping a list of span messages to a
+                ``(n, dim)`` array of unit‑normalised embeddings.
+            model_name: Name of the embedding model, recorded in the
+                checkpoint so that a resumed build cannot mix models.
+            batch_size: Number of spans embedded and written per batch.
+            shard_rows: Maximum number of spans per shard.
+            ingest: Trace parsing options (streaming, worker processes).
+            cache: Optional embedding cache consulted before ``encode``.
+            log: Stream receiving progress lines, or ``None``.
+        """
+        if batch_size < 1 or shard_rows < 1:
+            raise ValueError("batch_size and shard_rows must be positive")
+        self.output = Path(output)
+        self.encode = encode
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.shard_rows = shard_rows
+        self.ingest = ingest or IngestConfig()
+        self.cache = cache
+        self.log = log
+        self.spans_written = 0
+        self._started = 0.0
+        self._checkpoint = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        path = self.output / CHECKPOINT_FILE
+        if not path.exists():
+            return {
+                "version": CHECKPOINT_VERSION,
+                "model": self.model_name,
+                "dimension": None,
+                "completed": [],
+                "current": None,
+                "shards": [],
+                "spans": 0,
+            }
+        checkpoint = json.loads(path.read_text(encoding="utf-8"))
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"unsupported checkpoint version: {checkpoint.get('version')}")
+        if checkpoint["model"] != self.model_name:
+            raise ValueError(
+                f"checkpoint was built with model {checkpoint['model']!r}, not {self.model_name!r}"
+            )
+        return checkpoint
+
+    def _save_checkpoint(self) -> None:
+        self.output.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.output / (CHECKPOINT_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(self._checkpoint, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.output / CHECKPOINT_FILE)
+
+    def _shard_path(self, index: int) -> Path:
+        return self.output / f"shard-{index:05d}"
+
+    def _rollback(self) -> None:
+        """Discard shard rows written after the last checkpoint."""
+        committed = {shard["name"]: shard["rows"] for shard in self._checkpoint["shards"]}
+        if not self.output.exists():
+            return
+        for path in self.output.glob("shard-*"):
+            if read_manifest(path) is not None:
+                rewind_snapshot(path, committed.get(path.name, 0))
+
+    def build(self, archive: str | Path) -> Dict[str, Any]:
+        """Embed and store every span of ``archive`` not yet written.
+
+        Returns:
+            The summary produced by :meth:`summary`.
+        """
+        self._rollback()
+        self._started = time.perf_counter()
+        completed = set(self._checkpoint["completed"])
+        current = self._checkpoint["current"] or {}
+        buffer: List[SpanRecord] = []
+        # Entries whose spans have all been read but may still be buffered
+        finished: List[str] = []
+        for name, path in archive_entries(archive):
+            if name in completed:
+                continue
+            skip = current.get("spans", 0) if current.get("source") == name else 0
+            loader = TraceLoader(
+                path,
+                streaming=self.ingest.streaming,
+                workers=self.ingest.workers,
+                files_per_task=self.ingest.files_per_task,
+            )
+            seen = skip
+            for record in islice(loader.iter_spans(), skip, None):
+                buffer.append(record)
+                seen += 1
+                if len(buffer) >= self.batch_size:
+                    self._flush(buffer, finished, {"source": name, "spans": seen})
+                    buffer, finished = [], []
+            finished.append(name)
+        self._flush(buffer, finished, None)
+        return self.summary()
+
+    def _flush(
+        self,
+        records: List[SpanRecord],
+        finished: List[str],
+        current: Dict[str, Any] | None,
+    ) -> None:
+        """Write a batch to the shards and commit the checkpoint."""
+        checkpoint = self._checkpoint
+        if records:
+            texts = [rec.message for rec in records]
+            if self.cache is not None:
+                embeddings = self.cache.encode(texts, self.encode)
+            else:
+                embeddings = np.asarray(self.encode(texts), dtype=np.float32)
+            dimension = int(embeddings.shape[1])
+            if checkpoint["dimension"] is None:
+                checkpoint["dimension"] = dimension
+            start = 0
+            while start < len(records):
+                shards = checkpoint["shards"]
+                if not shards or shards[-1]["rows"] >= self.shard_rows:
+                    shards.append({"name": self._shard_path(len(shards)).name, "rows": 0})
+                shard = shards[-1]
+                stop = min(len(records), start + self.shard_rows - shard["rows"])
+                piece = records[start:stop]
+                shard["rows"] = append_snapshot(
+                    self.output / shard["name"],
+                    embeddings[start:stop],
+                    (rec.to_metadata() for rec in piece),
+                    dimension,
+                    trace_keys=np.array([trace_key(rec.trace_id) for rec in piece], dtype=np.int64),
+                )
+                start = stop
+            checkpoint["spans"] += len(records)
+            self.spans_written += len(records)
+        checkpoint["completed"].extend(finished)
+        checkpoint["current"] = current
+        self._save_checkpoint()
+        if self.log is not None and records:
+            shard = checkpoint["shards"][-1]
+            print(
+                f"{checkpoint['spans']} spans written ({self.spans_per_second():.0f} spans/s); "
+                f"{shard['name']}: {shard['rows']} rows",
+                file=self.log,
+            )
+
+    def spans_per_second(self) -> float:
+        """Embedding and write throughput of the current run."""
+        elapsed = time.perf_counter() - self._started
+        return self.spans_written / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Describe the build: throughput of this run and shard sizes."""
+        return {
+            "spans_total": self._checkpoint["spans"],
+            "spans_this_run": self.spans_written,
+            "spans_per_sec": round(self.spans_per_second(), 1),
+            "entries_completed": len(self._checkpoint["completed"]),
+            "dimension": self._checkpoint["dimension"],
+            "shards": [
+                {
+                    "path": str(self.output / shard["name"]),
+                    "rows": shard["rows"],
+                    "bytes": _directory_bytes(self.output / shard["name"]),
+                }
+                for shard in self._checkpoint["shards"]
+            ],
+        }
+
+
+def _cli() -> None:
+    """Command‑line interface for building a corpus from an archive."""
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Build T‑RAG memory shards from a trace archive")
+    parser.add_argument("--archive", required=True, help="Trace file or directory of trace files/directories")
+    parser.add_argument("--output", required=True, help="Output directory; an existing checkpoint is resumed")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Spans embedded per batch")
+    parser.add_argument("--shard-rows", type=int, default=1_000_000, help="Maximum spans per shard")
+    parser.add_argument(
+        "--model",
+        default=None,
+        help="SentenceTransformer model name (overrides TRAG_EMBEDDING_BACKEND)",
+    )
+    args = parser.parse_args()
+
+    if args.model is not None:
+        embedder = SentenceTransformerEmbedder(args.model, batch_size=256)
+    else:
+        embedder = create_embedder(cfg.model)
+    cache = None
+    if cfg.model.embedding_cache_size > 0 or cfg.model.embedding_cache_path:
+        cache = EmbeddingCache(
+            embedder.name,
+            max_entries=cfg.model.embedding_cache_size,
+            path=cfg.model.embedding_cache_path,
+        )
+    builder = CorpusBuilder(
+        args.output,
+        embedder.encode,
+        model_name=embedder.name,
+        batch_size=args.batch_size,
+        shard_rows=args.shard_rows,
+        ingest=cfg.ingest,
+        cache=cache,
+    )
+    try:
+        summary = builder.build(args.archive)
+    finally:
+        if cache is not None:
+            cache.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    _cli()
@@ -0,0 +1,223 @@
+"""
+embedders.py
+============
+
+Embedding backends for span summaries.
+
+The pipeline only needs a function from a batch of span messages to
+unit‑normalised vectors.  :class:`Embedder` captures that contract so
+the backend can be chosen per deployment through
+``ModelConfig.embedding_backend`` (see :func:`create_embedder`):
+
+``"sentence-transformers"``
+    :class:`SentenceTransformerEmbedder`, the original semantic model.
+    It requires ``sentence-transformers`` (and torch), downloads the
+    model on first use and costs milliseconds of CPU per message.
+``"hashing"``
+    :class:`HashingEmbedder`, a pure‑NumPy hashed character n‑gram
+    vectoriser with optional random projection.  It needs no model
+    files or network access, is deterministic across processes and
+    embeds a span in microseconds, which suits air‑gapped and
+    latency‑sensitive deployments as well as tests.  Span summaries
+    are templated text, so lexical similarity already separates
+    services, operations and error messages well.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple, Type
+
+import numpy as np
+
+from .config import ModelConfig
+
+
+class Embedder:
+    """Interface for span message embedding backends."""
+
+    #: Identifier of the model.  Part of embedding cache keys and of
+    #: corpus checkpoints, so different models never share vectors.
+    name: str = ""
+    #: Dimensionality of the produced vectors
+    dimension: int = 0
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` into a ``(len(texts), dimension)`` array.
+
+        Rows must be unit‑normalised ``float32`` vectors so that dot
+        products equal cosine similarities.
+        """
+        raise NotImplementedError
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Embedder backed by a ``sentence-transformers`` model."""
+
+    def __init__(self, model_name: str, model: Any | None = None, batch_size: int = 32) -> None:
+        """Load ``model_name`` unless a preloaded ``model`` is given.
+
+        The ``sentence_transformers`` package is imported lazily, so it
+        is only required when this backend is selected.  ``batch_size``
+        is the number of messages per forward pass.
+        """
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name)
+        self.model = model
+        self.name = model_name
+        self.batch_size = batch_size
+        self.dimension = int(model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        # ``convert_to_numpy`` ensures a NumPy array and
+        # ``normalize_embeddings`` scales vectors to unit length.
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+
+
+# Odd 64‑bit constants for the rolling hash and the finaliser
+_MULTIPLIER = np.uint64(0x100000001B3)
+_MIX = np.uint64(0xFF51AFD7ED558CCD)
+_SALT = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+class HashingEmbedder(Embedder):
+    """Hashed character n‑gram embeddings computed with NumPy.
+
+    Every character n‑gram of a message (for each length in
+    ``ngram_range``) is hashed to a bucket and a sign, and the signed
+    counts form the vector.  With ``n_features`` set, n‑grams are first
+    hashed into ``n_features`` buckets and the counts are then mapped
+    to ``dimension`` with a fixed Gaussian random projection, which
+    spreads each n‑gram over all output dimensions.  Without it,
+    n‑grams are hashed directly into ``dimension`` buckets.
+
+    Hashing runs as vectorised rolling hashes over the concatenated
+    UTF‑8 bytes of a whole batch, so there is no per‑n‑gram Python work.
+    """
+
+    #: Number of messages hashed per vectorised step, bounding the size
+    #: of the count matrix.
+    batch_size = 1024
+
+    def __init__(
+        self,
+        dimension: int = 384,
+        ngram_range: Tuple[int, int] = (3, 5),
+        n_features: int | None = None,
+        lowercase: bool = True,
+        seed: int = 0,
+    ) -> None:
+        """Configure the vectoriser.
+
+        Args:
+            dimension: Dimensionality of the produced vectors.
+            ngram_range: Smallest and largest n‑gram length in bytes.
+            n_features: Number of hash buckets before random projection.
+                ``None`` disables the projection.
+            lowercase: Lower‑case messages before hashing.
+            seed: Seed of the hash functions and of the projection.
+        """
+        low, high = ngram_range
+        if dimension < 1 or low < 1 or high < low:
+            raise ValueError("dimension must be positive and ngram_range a valid (min, max) pair")
+        if n_features is not None and n_features < 1:
+            raise ValueError("n_features must be positive")
+        self.dimension = dimension
+        self.ngram_range = (low, high)
+        self.n_features = n_features
+        self.lowercase = lowercase
+        self.seed = seed
+        projected = f"-p{n_features}" if n_features else ""
+        self.name = f"hashing-{dimension}-{low}to{high}{projected}-s{seed}"
+        self._projection: np.ndarray | None = None
+        if n_features:
+            rng = np.random.default_rng(seed)
+            self._projection = (rng.standard_normal((n_features, dimension)) / np.sqrt(dimension)).astype(np.float32)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start : start + self.batch_size]
+            vectors[start : start + len(batch)] = self._encode_batch(batch)
+        return vectors
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        buckets = self.n_features or self.dimension
+        encoded = [(text.lower() if self.lowercase else text).encode("utf-8") for text in texts]
+        lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        # End offset (exclusive) of the message each byte belongs to
+        ends = np.repeat(np.cumsum(lengths), lengths)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        keys: List[np.ndarray] = []
+        signs: List[np.ndarray] = []
+        low, high = self.ngram_range
+        hashes = data.copy()
+        for size in range(1, high + 1):
+            positions = data.shape[0] - size + 1
+            if positions <= 0:
+                break
+            if size > 1:
+                # Extend every (size - 1)-gram hash by one byte
+                hashes = hashes[:positions] * _MULTIPLIER + data[size - 1 :]
+            if size < low:
+                continue
+            valid = np.arange(positions) + size <= ends[:positions]
+            # Salt by seed and n-gram size so that sizes hash independently
+            salt = np.uint64(((self.seed << 8) + size) * _SALT & _MASK64)
+            mixed = hashes[valid] ^ salt
+            mixed ^= mixed >> np.uint64(33)
+            mixed *= _MIX
+            mixed ^= mixed >> np.uint64(33)
+            keys.append(rows[:positions][valid] * buckets + (mixed % np.uint64(buckets)).astype(np.int64))
+            signs.append(np.where(mixed >> np.uint64(63), -1.0, 1.0))
+        key = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+        sign = np.concatenate(signs) if signs else np.empty(0)
+        if self._projection is None:
+            counts = np.bincount(key, weights=sign, minlength=len(texts) * buckets)
+            matrix = counts.reshape(len(texts), buckets).astype(np.float32)
+        else:
+            matrix = self._project(key, sign, buckets, len(texts))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def _project(self, key: np.ndarray, sign: np.ndarray, buckets: int, count: int) -> np.ndarray:
+        """Multiply the signed bucket counts by the projection matrix.
+
+        Only the buckets that occur in the batch take part in the
+        product; span summaries are templated, so a batch touches a
+        small fraction of ``n_features``.
+        """
+        rows, bucket = np.divmod(key, buckets)
+        used, column = np.unique(bucket, return_inverse=True)
+        counts = np.bincount(rows * used.shape[0] + column, weights=sign, minlength=count * used.shape[0])
+        return counts.reshape(count, used.shape[0]).astype(np.float32) @ self._projection[used]
+
+
+#: Registry of embedding backends selectable by name via
+#: ``ModelConfig.embedding_backend``.
+EMBEDDER_BACKENDS: Dict[str, Type[Embedder]] = {
+    "sentence-transformers": SentenceTransformerEmbedder,
+    "hashing": HashingEmbedder,
+}
+
+
+def create_embedder(config: ModelConfig) -> Embedder:
+    """Instantiate the embedding backend named by ``config.embedding_backend``."""
+    backend = config.embedding_backend
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbedder(config.embedding_model_name)
+    if backend == "hashing":
+        return HashingEmbedder(
+            dimension=config.hashing_dimension,
+            n_features=config.hashing_features or None,
+        )
+    raise ValueError(
+        f"unknown embedding backend {backend!r}; expected one of {sorted(EMBEDDER_BACKENDS)}"
+    )
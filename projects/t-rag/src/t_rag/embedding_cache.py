@@ -0,0 +1,171 @@
+"""
+embedding_cache.py
+==================
+
+Content‑addressed cache for span message embeddings.  Span summaries
+built by :meth:`t_rag.trace_loader.TraceLoader._build_message` are
+highly repetitive (the same service, operation and status recur across
+thousands of spans), so most messages in an incident have been
+embedded before.  :class:`EmbeddingCache` keys vectors by
+``(model name, message hash)`` and keeps them in two tiers:
+
+* an in‑process LRU dictionary bounded by ``max_entries``, and
+* an optional on‑disk SQLite database shared across runs and processes.
+
+Only messages missing from both tiers are sent to the embedding model,
+and duplicates within a batch are encoded once.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+class EmbeddingCache:
+    """Two‑tier (memory + optional disk) cache of message embeddings."""
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 100_000,
+        path: str | Path | None = None,
+    ) -> None:
+        """Create a cache for embeddings produced by ``model_name``.
+
+        Args:
+            model_name: Name of the embedding model.  Part of every key,
+                so caches for different models never mix.
+            max_entries: Maximum number of vectors held in memory.
+                ``0`` disables the in‑process tier.
+            path: Optional SQLite database file for the on‑disk tier.
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, digest TEXT NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, digest))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def digest(message: str) -> str:
+        """Return the content hash used to key ``message``."""
+        return hashlib.blake2b(message.encode("utf-8"), digest_size=16).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of messages served without calling the model."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def encode(
+        self,
+        messages: Sequence[str],
+        encode_fn: Callable[[List[str]], np.ndarray],
+    ) -> np.ndarray:
+        """Return embeddings for ``messages``, encoding only unseen ones.
+
+        Args:
+            messages: Messages to embed.
+            encode_fn: Function that embeds a list of messages and
+                returns a 2‑D array, e.g. a wrapper around
+                ``SentenceTransformer.encode``.
+
+        Returns:
+            A 2‑D ``float32`` array with one row per input message.
+        """
+        if not messages:
+            return np.asarray(encode_fn([]), dtype=np.float32)
+        digests = [self.digest(message) for message in messages]
+        # Deduplicate while preserving the first message for each digest
+        unique: Dict[str, str] = {}
+        for digest, message in zip(digests, messages):
+            unique.setdefault(digest, message)
+        found = self._lookup(list(unique))
+        missing = [digest for digest in unique if digest not in found]
+        if missing:
+            encoded = np.asarray(encode_fn([unique[d] for d in missing]), dtype=np.float32)
+            # Copy each row so an evicted entry does not keep the whole
+            # batch alive through the rows still cached
+            new_items = [(digest, row.copy()) for digest, row in zip(missing, encoded)]
+            self._store(new_items)
+            found.update(new_items)
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(messages) - len(missing)
+        return np.stack([found[digest] for digest in digests])
+
+    def _lookup(self, digests: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch cached vectors from memory, then from disk."""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for digest in digests:
+                vector = self._memory.get(digest)
+                if vector is not None:
+                    self._memory.move_to_end(digest)
+                    found[digest] = vector
+        remaining = [digest for digest in digests if digest not in found]
+        if self._db is not None and remaining:
+            from_disk: List[Tuple[str, np.ndarray]] = []
+            with self._lock:
+                for start in range(0, len(remaining), _SQL_BATCH):
+                    batch = remaining[start : start + _SQL_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._db.execute(
+                        "SELECT digest, vector FROM embeddings"
+                        f" WHERE model = ? AND digest IN ({placeholders})",
+                        [self.model_name, *batch],
+                    ).fetchall()
+                    from_disk.extend((digest, np.frombuffer(blob, dtype=np.float32)) for digest, blob in rows)
+            self._remember(from_disk)
+            found.update(from_disk)
+        return found
+
+    def _store(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        """Insert newly encoded vectors into both tiers."""
+        self._remember(items)
+        if self._db is not None:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)",
+                    [(self.model_name, digest, vector.tobytes()) for digest, vector in items],
+                )
+                self._db.commit()
+
+    def _remember(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        """Insert vectors into the in‑process LRU tier, evicting the oldest."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for digest, vector in items:
+                self._memory[digest] = vector
+                self._memory.move_to_end(digest)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def close(self) -> None:
+        """Close the on‑disk tier, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
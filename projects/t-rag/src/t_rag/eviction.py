@@ -0,0 +1,145 @@
+"""
+eviction.py
+===========
+
+Capacity and retention limits for :class:`t_rag.vector_memory.VectorMemoryStore`.
+
+A long‑running T‑RAG process adds the spans of every analysed incident
+to its store, so without limits memory grows until the process is
+killed.  :class:`EvictionPolicy` bounds the store by
+
+* a maximum number of live rows (``max_rows``),
+* a time to live measured from each span's start time
+  (``ttl_seconds``), and
+* per‑service quotas, so one chatty service cannot push every other
+  service out of memory.
+
+When a limit is exceeded, :func:`select_victims` picks the rows to
+evict: those with the earliest start time (``"oldest"``) or those least
+recently returned by a query (``"lru"``).  Rows added by the insert
+that triggered eviction are never chosen, so the newest incident is
+always kept.  The store marks victims with tombstones, which hide them
+from searches immediately, and reclaims their slots by compacting once
+tombstones make up ``compact_ratio`` of the rows.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict
+
+import numpy as np
+
+from .config import StoreConfig
+
+#: Supported values of ``EvictionPolicy.policy``
+EVICTION_POLICIES = ("oldest", "lru")
+
+
+@dataclass
+class EvictionPolicy:
+    """Limits on the rows a vector store keeps.
+
+    Attributes:
+        max_rows: Maximum number of live rows.  ``0`` means unbounded.
+        policy: ``"oldest"`` evicts the rows with the earliest span
+            start time; ``"lru"`` evicts the rows least recently
+            returned by a query.
+        ttl_seconds: Rows whose span started more than this many
+            seconds ago are evicted.  ``0`` disables expiry.
+        service_quota: Maximum number of live rows per service.  ``0``
+            disables quotas for services without an override.
+        service_quotas: Per‑service overrides of ``service_quota``.
+        compact_ratio: Fraction of tombstoned rows at which the store
+            compacts itself.
+    """
+
+    max_rows: int = 0
+    policy: str = "oldest"
+    ttl_seconds: float = 0.0
+    service_quota: int = 0
+    service_quotas: Dict[str, int] = field(default_factory=dict)
+    compact_ratio: float = 0.25
+
+    def __post_init__(self) -> None:
+        if self.policy not in EVICTION_POLICIES:
+            raise ValueError(f"unknown eviction policy {self.policy!r}; expected one of {list(EVICTION_POLICIES)}")
+        if self.max_rows < 0 or self.ttl_seconds < 0 or self.service_quota < 0:
+            raise ValueError("max_rows, ttl_seconds and service_quota must be non-negative")
+        if not 0 < self.compact_ratio <= 1:
+            raise ValueError("compact_ratio must be in (0, 1]")
+
+    @classmethod
+    def from_config(cls, config: StoreConfig) -> "EvictionPolicy":
+        """Build the policy described by a store configuration."""
+        return cls(
+            max_rows=config.max_rows,
+            policy=config.eviction_policy,
+            ttl_seconds=config.ttl_seconds,
+            service_quota=config.service_quota,
+            service_quotas=dict(config.service_quotas),
+            compact_ratio=config.compact_ratio,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is configured."""
+        return bool(self.max_rows or self.ttl_seconds or self.service_quota or self.service_quotas)
+
+    def quota(self, service: str) -> int:
+        """Return the live row quota of ``service`` (``0`` if unlimited)."""
+        return self.service_quotas.get(service, self.service_quota)
+
+
+def _lowest(rows: np.ndarray, priority: np.ndarray, count: int) -> np.ndarray:
+    """Return the ``count`` entries of ``rows`` with the lowest priority."""
+    if count >= rows.shape[0]:
+        return rows
+    return rows[np.argpartition(priority[rows], count - 1)[:count]]
+
+
+def select_victims(
+    policy: EvictionPolicy,
+    alive: np.ndarray,
+    protected_from: int,
+    priority: np.ndarray,
+    start_seconds: np.ndarray,
+    service_rows: Dict[str, np.ndarray],
+    now: float,
+) -> np.ndarray:
+    """Choose the rows to evict so that the store satisfies ``policy``.
+
+    Args:
+        policy: Limits to enforce.
+        alive: Boolean array marking live rows.
+        protected_from: Rows from this id on were just inserted and are
+            never evicted.
+        priority: Eviction priority per row; lower values are evicted
+            first.
+        start_seconds: Span start time per row in epoch seconds, used
+            for expiry.
+        service_rows: Row ids of every service.
+        now: Current time in epoch seconds.
+
+    Returns:
+        Sorted ids of the rows to evict.
+    """
+    evictable = alive.copy()
+    evictable[protected_from:] = False
+    victims = np.zeros(alive.shape[0], dtype=bool)
+    if policy.ttl_seconds:
+        victims |= evictable & (start_seconds < now - policy.ttl_seconds)
+        evictable &= ~victims
+    for service, rows in service_rows.items():
+        quota = policy.quota(service)
+        if quota <= 0:
+            continue
+        excess = int(np.count_nonzero(alive[rows] & ~victims[rows])) - quota
+        if excess > 0:
+            chosen = _lowest(rows[evictable[rows]], priority, excess)
+            victims[chosen] = True
+            evictable[chosen] = False
+    if policy.max_rows:
+        excess = int(np.count_nonzero(alive & ~victims)) - policy.max_rows
+        if excess > 0:
+            victims[_lowest(np.flatnonzero(evictable), priority, excess)] = True
+    return np.flatnonzero(victims)
@@ -0,0 +1,205 @@
+"""
+json_stream.py
+==============
+
+Incremental JSON reading for large trace exports.  ``json.load``
+materialises an entire document before any span can be processed,
+which for multi‑gigabyte incident exports costs several times the file
+size in memory.  This module provides a small event‑style reader that
+walks the container structure of a document (objects and arrays)
+without decoding it, and only decodes the leaf values the caller asks
+for.  Memory use is bounded by the largest single value decoded (for
+trace files, one span) plus the read buffer.
+
+Only the standard library is used: container tokens are scanned by
+hand and complete values are decoded with
+:meth:`json.JSONDecoder.raw_decode` against a sliding buffer.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, List, TextIO, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+class JsonStreamReader:
+    """Pull‑based reader over a JSON text stream.
+
+    The reader exposes three primitives that can be composed to walk an
+    arbitrary document:
+
+    * :meth:`iter_array` yields once per element of the array at the
+      current position; the caller must consume each element (with
+      :meth:`value`, :meth:`iter_array` or :meth:`iter_object`) before
+      advancing the iterator.
+    * :meth:`iter_object` yields the keys of the object at the current
+      position; again the caller consumes the associated value.
+    * :meth:`value` decodes and returns the complete value at the
+      current position.
+    """
+
+    def __init__(self, handle: TextIO, chunk_size: int = 1 << 16) -> None:
+        self._handle = handle
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, grow: bool = False) -> bool:
+        """Read more text into the buffer, discarding consumed input.
+
+        Args:
+            grow: When ``True`` the read size is at least the size of
+                the pending (undecoded) input, so that repeatedly
+                retrying a large value costs amortised linear time.
+
+        Returns:
+            ``False`` if the underlying stream is exhausted.
+        """
+        if self._eof:
+            return False
+        pending = len(self._buffer) - self._pos
+        size = max(self._chunk_size, pending) if grow else self._chunk_size
+        chunk = self._handle.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non‑whitespace character without consuming it.
+
+        Returns:
+            The character, or an empty string at end of input.
+        """
+        while True:
+            buffer = self._buffer
+            pos = self._pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r} but found {found or 'end of input'!r}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode and return the complete JSON value at the current position."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # The value may simply be truncated by the buffer edge.
+                if not self._fill(grow=True):
+                    raise
+                continue
+            # A number ending exactly at the buffer edge may continue in
+            # the next chunk, so only accept it once more input is seen.
+            if end == len(self._buffer) and self._fill(grow=True):
+                continue
+            self._pos = end
+            return obj
+
+    def iter_array(self) -> Iterator[None]:
+        """Iterate over the elements of the array at the current position."""
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield None
+            separator = self.peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"expected ',' or ']' but found {separator or 'end of input'!r}")
+
+    def iter_object(self) -> Iterator[str]:
+        """Iterate over the keys of the object at the current position."""
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ValueError("expected an object key")
+            key = self.value()
+            self._expect(":")
+            yield key
+            separator = self.peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"expected ',' or '}}' but found {separator or 'end of input'!r}")
+
+
+def iter_otlp_spans(
+    handle: TextIO, chunk_size: int = 1 << 16
+) -> Iterator[Tuple[Dict[str, Any] | None, Dict[str, Any]]]:
+    """Yield raw span dictionaries from a trace document one at a time.
+
+    Both layouts accepted by :class:`t_rag.trace_loader.TraceLoader`
+    are supported: a top‑level list of spans, and the nested OTLP
+    ``resourceSpans/scopeSpans/spans`` structure.  Each span is yielded
+    together with the raw ``resource`` object of its ``resourceSpans``
+    entry (``{}`` if the entry has none), which is decoded once and
+    shared by all of the entry's spans; spans of a top‑level list come
+    with ``None``.  Spans that precede their ``resource`` block in the
+    document are held back until the end of the ``resourceSpans``
+    entry.  Other sibling keys are decoded and discarded.
+
+    Args:
+        handle: Text stream positioned at the start of the document.
+        chunk_size: Number of characters read from ``handle`` at once.
+
+    Yields:
+        ``(resource, span)`` pairs in document order.
+    """
+    reader = JsonStreamReader(handle, chunk_size=chunk_size)
+    head = reader.peek()
+    if head == "[":
+        for _ in reader.iter_array():
+            yield None, reader.value()
+        return
+    if head != "{":
+        raise ValueError("trace document must be a JSON array or object")
+    for key in reader.iter_object():
+        if key != "resourceSpans":
+            reader.value()
+            continue
+        for _ in reader.iter_array():
+            resource: Dict[str, Any] | None = None
+            pending: List[Dict[str, Any]] = []
+            for res_key in reader.iter_object():
+                if res_key == "resource":
+                    resource = reader.value() or {}
+                    continue
+                if res_key != "scopeSpans":
+                    reader.value()
+                    continue
+                for _ in reader.iter_array():
+                    for scope_key in reader.iter_object():
+                        if scope_key != "spans":
+                            reader.value()
+                            continue
+                        for _ in reader.iter_array():
+                            span = reader.value()
+                            if resource is None:
+                                pending.append(span)
+                                continue
+                            yield resource, span
+            shared: Dict[str, Any] = resource if resource is not None else {}
+            for span in pending:
+                yield shared, span
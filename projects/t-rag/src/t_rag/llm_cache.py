@@ -0,0 +1,178 @@
+"""
+llm_cache.py
+============
+
+Response cache for :class:`t_rag.llm_reasoner.LLMReasoner`.
+
+The same incident is frequently analysed more than once (CI gates,
+control‑plane retries, orchestrator runs), and each analysis would
+otherwise pay a full chat completion round trip.  :class:`ResponseCache`
+stores completions under a fingerprint of the normalised prompt, the
+model name and the sampling temperature.  Entries expire after a TTL
+and the cache is bounded in size with least‑recently‑used eviction.
+
+Concurrent requests with the same fingerprint are coalesced: the first
+caller performs the upstream call while the others wait for its
+result, so only one request is sent no matter how many threads ask.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def prompt_fingerprint(messages: List[Dict[str, str]], model: str, temperature: float) -> str:
+    """Return a stable hash identifying a chat completion request.
+
+    Message contents are normalised by collapsing runs of whitespace so
+    that cosmetic differences do not defeat the cache.
+    """
+    normalised = [
+        {"role": message.get("role", ""), "content": _WHITESPACE_RE.sub(" ", message.get("content", "")).strip()}
+        for message in messages
+    ]
+    payload = json.dumps(
+        {"model": model, "temperature": round(float(temperature), 6), "messages": normalised},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread‑safe TTL + LRU cache with in‑flight request coalescing."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_entries: Maximum number of cached responses.
+            ttl_seconds: Lifetime of a cached response in seconds.
+            clock: Monotonic time source, replaceable in tests.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._ainflight: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response for ``key`` if present and fresh."""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        """Store ``value`` under ``key``, evicting the least recently used entry."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """Return the cached value for ``key`` or compute it exactly once.
+
+        If another thread is already computing ``key``, this call waits
+        for that result instead of calling ``compute`` again.  Errors
+        raised by ``compute`` propagate to every waiting caller and are
+        not cached.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(exc)
+            raise
+        self.put(key, value)
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    async def aget_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """Asynchronous counterpart of :meth:`get_or_compute`.
+
+        Coroutines on the same event loop that request ``key`` while it
+        is being computed await the pending result instead of calling
+        ``compute`` again.  ``compute`` runs as a task of its own that
+        every caller awaits through :func:`asyncio.shield`, so a caller
+        that is cancelled or times out does not take the result away
+        from the others; the task still completes and fills the cache.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            task = self._ainflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._acompute(key, compute))
+                self._ainflight[key] = task
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _acompute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """Body of the task shared by the callers of :meth:`aget_or_compute`."""
+        try:
+            value = await compute()
+        except BaseException:
+            with self._lock:
+                del self._ainflight[key]
+            raise
+        self.put(key, value)
+        with self._lock:
+            del self._ainflight[key]
+        return value
@@ -15,16 +15,31 @@ model to output a small JSON object with two keys: ``root_cause``
 (a short phrase) and ``reasoning`` (a brief explanation).  If the
 response cannot be parsed as JSON, the raw text is returned under
 ``reasoning``.
+
+Responses are cached by prompt fingerprint (see :mod:`t_rag.llm_cache`)
+so repeated analyses of the same incident, and identical concurrent
+requests, result in a single upstream call.  :class:`StubLLMReasoner`
+is a local, offline provider for tests and benchmarks.
+
+For batch RCA, :meth:`LLMReasoner.agenerate_root_cause` is an asyncio
+variant bounded by ``ModelConfig.llm_max_concurrency`` concurrent
+upstream calls and ``ModelConfig.llm_timeout`` seconds per call, and
+:meth:`LLMReasoner.generate_batch` fans out many incidents at once.
 """
 from __future__ import annotations
 
 import os
 import json
-from typing import List, Dict, Any, Iterable
+import asyncio
+import threading
+import time
+from typing import List, Dict, Any, Iterable, Tuple
 
 from tenacity import retry, wait_random_exponential, stop_after_attempt
 
 from .config import ModelConfig
+from .llm_cache import ResponseCache, prompt_fingerprint
+from .prompt_compression import summarise_spans
 
 # Import the OpenAI client if available.  This module is only loaded
 # when needed to avoid forcing an optional dependency on users who
@@ -40,13 +55,31 @@ except ImportError:
 class LLMReasoner:
     """Reason about the root cause of an incident using a language model."""
 
-    def __init__(self, config: ModelConfig) -> None:
+    #: Whether this provider needs the ``openai`` package.  Subclasses
+    #: that override :meth:`_call_llm` with another provider set this
+    #: to ``False``.
+    requires_openai = True
+
+    def __init__(self, config: ModelConfig, cache: ResponseCache | None = None) -> None:
+        """Create a reasoner.
+
+        Args:
+            config: Model configuration.
+            cache: Optional response cache.  Defaults to a cache sized
+                by ``config.llm_cache_size`` and ``config.llm_cache_ttl``;
+                a size of ``0`` disables caching.
+        """
         self.config = config
-        if openai is None:
+        if self.requires_openai and openai is None:
             raise ImportError(
                 "openai library is not installed. Please install it or modify"
                 " LLMReasoner to use another provider."
             )
+        if cache is None and config.llm_cache_size > 0:
+            cache = ResponseCache(max_entries=config.llm_cache_size, ttl_seconds=config.llm_cache_ttl)
+        self.cache = cache
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
 
     def generate_root_cause(
         self,
@@ -70,7 +103,93 @@ class LLMReasoner:
             ``reasoning`` will contain the unparsed output.
         """
         messages = self._build_prompt(current_spans, retrieved_contexts)
-        response_text = self._call_llm(messages)
+        return self._parse_response(self._complete(messages))
+
+    async def agenerate_root_cause(
+        self,
+        current_spans: Iterable[Dict[str, Any]],
+        retrieved_contexts: Iterable[Dict[str, Any]],
+        timeout: float | None = None,
+    ) -> Dict[str, Any]:
+        """Asynchronous variant of :meth:`generate_root_cause`.
+
+        At most ``config.llm_max_concurrency`` calls per event loop talk
+        to the provider at the same time; further calls wait for a free
+        slot.  The timeout applies to the provider call only, not to
+        the time spent waiting for a slot.
+
+        A call that times out is abandoned rather than cancelled: the
+        default provider runs in a worker thread (with retries) that
+        cannot be interrupted, so the call keeps its slot until it
+        actually returns and the limit holds for upstream traffic, not
+        just for awaiting callers.  Its reply still fills the cache.
+
+        Args:
+            current_spans: Span dictionaries of the current incident.
+            retrieved_contexts: Metadata objects returned from the
+                vector store.
+            timeout: Seconds allowed for the provider call.  Defaults
+                to ``config.llm_timeout``; ``None`` or ``0`` disables it.
+
+        Returns:
+            The same schema as :meth:`generate_root_cause`.
+
+        Raises:
+            asyncio.TimeoutError: If the provider call exceeds the
+                timeout.
+        """
+        messages = self._build_prompt(current_spans, retrieved_contexts)
+        timeout = self.config.llm_timeout if timeout is None else timeout
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        call = asyncio.ensure_future(self._acomplete(messages))
+        call.add_done_callback(lambda _: semaphore.release())
+        call.add_done_callback(_consume_exception)
+        response_text = await asyncio.wait_for(asyncio.shield(call), timeout or None)
+        return self._parse_response(response_text)
+
+    async def agenerate_batch(
+        self,
+        incidents: Iterable[Tuple[Iterable[Dict[str, Any]], Iterable[Dict[str, Any]]]],
+        timeout: float | None = None,
+    ) -> List[Dict[str, Any] | BaseException]:
+        """Analyse many incidents concurrently.
+
+        Args:
+            incidents: Iterable of ``(current_spans, retrieved_contexts)``
+                pairs.
+            timeout: Per‑call timeout, see :meth:`agenerate_root_cause`.
+
+        Returns:
+            One entry per incident, in input order: the analysis result,
+            or the exception raised for that incident (for example
+            :class:`asyncio.TimeoutError`), so one failure does not
+            abort the batch.
+        """
+        tasks = [
+            self.agenerate_root_cause(spans, contexts, timeout=timeout)
+            for spans, contexts in incidents
+        ]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def generate_batch(
+        self,
+        incidents: Iterable[Tuple[Iterable[Dict[str, Any]], Iterable[Dict[str, Any]]]],
+        timeout: float | None = None,
+    ) -> List[Dict[str, Any] | BaseException]:
+        """Blocking wrapper around :meth:`agenerate_batch` for synchronous callers."""
+        return asyncio.run(self.agenerate_batch(incidents, timeout=timeout))
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the concurrency limiter bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(max(1, self.config.llm_max_concurrency))
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _parse_response(self, response_text: str) -> Dict[str, Any]:
+        """Convert the raw model reply into the result dictionary."""
         # Attempt to parse the response as JSON
         try:
             parsed = json.loads(response_text)
@@ -95,19 +214,30 @@ class LLMReasoner:
 
         The prompt includes a system message describing the task and a
         user message containing summaries of the current incident spans
-        and the retrieved similar contexts.
+        and the retrieved similar contexts.  When
+        ``config.prompt_token_budget`` is positive, both sections are
+        compressed with :func:`t_rag.prompt_compression.summarise_spans`
+        (errors first, slow spans verbatim, repeats counted) so
+        the prompt size is bounded regardless of incident size; the
+        current spans get ``config.prompt_current_share`` of the budget.
 
         Returns:
             A list of chat messages conforming to the OpenAI API format.
         """
-        # Summarise the current spans into a numbered list
-        current_summary = "\n".join(
-            f"{i+1}. {span.get('message') or span}" for i, span in enumerate(current_spans)
-        )
-        # Summarise retrieved contexts similarly
-        context_summary = "\n".join(
-            f"{i+1}. {ctx.get('message') or ctx}" for i, ctx in enumerate(retrieved_contexts)
-        )
+        budget = self.config.prompt_token_budget
+        if budget > 0:
+            current_budget = int(budget * self.config.prompt_current_share)
+            current_summary = summarise_spans(current_spans, current_budget)
+            context_summary = summarise_spans(retrieved_contexts, budget - current_budget)
+        else:
+            # Summarise the current spans into a numbered list
+            current_summary = "\n".join(
+                f"{i+1}. {span.get('message') or span}" for i, span in enumerate(current_spans)
+            )
+            # Summarise retrieved contexts similarly
+            context_summary = "\n".join(
+                f"{i+1}. {ctx.get('message') or ctx}" for i, ctx in enumerate(retrieved_contexts)
+            )
         system_prompt = (
             "You are an SRE assistant for cloud applications. You are given a set "
             "of trace span summaries from a current incident and a set of summaries "
@@ -127,6 +257,33 @@ class LLMReasoner:
             {"role": "user", "content": user_message},
         ]
 
+    def _complete(self, messages: List[Dict[str, str]]) -> str:
+        """Return the model reply for ``messages``, consulting the cache first."""
+        if self.cache is None:
+            return self._call_llm(messages)
+        key = prompt_fingerprint(
+            messages, self.config.openai_model_name, self.config.openai_temperature
+        )
+        return self.cache.get_or_compute(key, lambda: self._call_llm(messages))
+
+    async def _acomplete(self, messages: List[Dict[str, str]]) -> str:
+        """Asynchronous counterpart of :meth:`_complete`."""
+        if self.cache is None:
+            return await self._acall_llm(messages)
+        key = prompt_fingerprint(
+            messages, self.config.openai_model_name, self.config.openai_temperature
+        )
+        return await self.cache.aget_or_compute(key, lambda: self._acall_llm(messages))
+
+    async def _acall_llm(self, messages: List[Dict[str, str]]) -> str:
+        """Call the provider without blocking the event loop.
+
+        The default implementation runs the blocking :meth:`_call_llm`
+        (including its retries) in a worker thread.  Providers with a
+        native asynchronous client can override this method.
+        """
+        return await asyncio.to_thread(self._call_llm, messages)
+
     @retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(3))
     def _call_llm(self, messages: List[Dict[str, str]]) -> str:
         """Call the OpenAI ChatCompletion API with retries.
@@ -142,4 +299,98 @@ class LLMReasoner:
             messages=messages,
             temperature=self.config.openai_temperature,
         )
-        return response["choices"][0]["message"]["content"].strip()
\ No newline at end of file
+        return response["choices"][0]["message"]["content"].strip()
+
+
+class StubLLMReasoner(LLMReasoner):
+    """Offline reasoner that answers locally without any network call.
+
+    The stub returns a deterministic JSON reply naming the first span
+    whose status looks like an error (or the first span if none do).
+    An artificial ``latency`` can be configured to emulate a remote
+    provider in throughput benchmarks; the asynchronous path sleeps
+    without blocking the event loop.  The stub counts upstream calls in
+    :attr:`calls` and the highest number of simultaneous calls in
+    :attr:`peak_in_flight`, which makes it useful for testing caching
+    and concurrency limits.  Select it with ``TRAG_LLM_PROVIDER=stub``.
+    """
+
+    requires_openai = False
+
+    def __init__(
+        self,
+        config: ModelConfig,
+        cache: ResponseCache | None = None,
+        latency: float = 0.0,
+    ) -> None:
+        super().__init__(config, cache=cache)
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._calls_lock = threading.Lock()
+
+    def _enter(self) -> None:
+        with self._calls_lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _exit(self) -> None:
+        with self._calls_lock:
+            self.in_flight -= 1
+
+    def _call_llm(self, messages: List[Dict[str, str]]) -> str:
+        self._enter()
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            return self._reply(messages)
+        finally:
+            self._exit()
+
+    async def _acall_llm(self, messages: List[Dict[str, str]]) -> str:
+        self._enter()
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self._reply(messages)
+        finally:
+            self._exit()
+
+    def _reply(self, messages: List[Dict[str, str]]) -> str:
+        user_message = messages[-1]["content"]
+        current = user_message.split("Retrieved similar contexts:")[0].splitlines()[1:]
+        spans = [line.split(". ", 1)[-1] for line in current if line.strip()]
+        suspects = [span for span in spans if "error" in span.lower()] or spans
+        root_cause = suspects[0] if suspects else "no spans supplied"
+        return json.dumps(
+            {
+                "root_cause": root_cause,
+                "reasoning": f"Stub analysis of {len(spans)} current spans.",
+            }
+        )
+
+
+def _consume_exception(task: asyncio.Future) -> None:
+    """Mark the outcome of an abandoned provider call as retrieved."""
+    if not task.cancelled():
+        task.exception()
+
+
+#: Reasoner implementations selectable via ``ModelConfig.llm_provider``.
+REASONER_PROVIDERS = {
+    "openai": LLMReasoner,
+    "stub": StubLLMReasoner,
+}
+
+
+def create_reasoner(config: ModelConfig) -> LLMReasoner:
+    """Instantiate the reasoner named by ``config.llm_provider``."""
+    try:
+        provider = REASONER_PROVIDERS[config.llm_provider]
+    except KeyError:
+        raise ValueError(
+            f"unknown LLM provider {config.llm_provider!r}; expected one of {sorted(REASONER_PROVIDERS)}"
+        ) from None
+    return provider(config)
@@ -0,0 +1,307 @@
+"""
+metadata_index.py
+=================
+
+Inverted indexes over span metadata for filtered vector search.
+
+Operators often want neighbours restricted by metadata, e.g. "similar
+spans from ``payment-service`` in the last seven days with an error
+status".  Over‑fetching neighbours and filtering them afterwards wastes
+work and can return fewer than ``k`` results.  :class:`MetadataIndex`
+instead maintains, at insert time, posting lists of store row ids per
+
+* service name,
+* status string (upper‑cased) plus a combined list of error rows, and
+* start‑time bucket of ``bucket_seconds``.
+
+:meth:`MetadataIndex.candidates` intersects the posting lists selected
+by a :class:`SpanFilter` into a sorted array of row ids.  The vector
+store scores only those rows, so the more selective the filter, the
+cheaper the query.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, Iterable, List, Sequence
+
+import numpy as np
+
+#: Status strings (upper‑cased) that do not indicate an error
+OK_STATUSES = frozenset({"", "OK", "UNSET", "0", "1", "STATUS_CODE_OK", "STATUS_CODE_UNSET"})
+
+
+def is_error_status(status: Any) -> bool:
+    """Return whether a span status string denotes an error."""
+    return str(status or "").upper() not in OK_STATUSES
+
+
+def to_epoch_seconds(value: Any) -> float | None:
+    """Convert a span timestamp to seconds since the epoch.
+
+    Numbers (and digit strings) are interpreted by magnitude as
+    nanoseconds, microseconds, milliseconds or seconds; other strings
+    are parsed as ISO‑8601.  ``datetime`` objects without a timezone are
+    taken to be UTC.  Returns ``None`` for missing or unparseable values.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            try:
+                return to_epoch_seconds(datetime.fromisoformat(value.replace("Z", "+00:00")))
+            except ValueError:
+                return None
+    elif isinstance(value, (int, float, np.integer, np.floating)):
+        number = float(value)
+    else:
+        return None
+    if not math.isfinite(number):
+        return None
+    magnitude = abs(number)
+    if magnitude >= 1e17:
+        return number / 1e9
+    if magnitude >= 1e14:
+        return number / 1e6
+    if magnitude >= 1e11:
+        return number / 1e3
+    return number
+
+
+@dataclass
+class SpanFilter:
+    """Metadata constraints for a filtered vector search.
+
+    All given constraints must hold; ``None`` leaves a field
+    unconstrained.
+
+    Attributes:
+        services: Accepted service names.
+        statuses: Accepted status strings, compared case‑insensitively.
+        errors_only: Only accept spans whose status denotes an error
+            (see :func:`is_error_status`).
+        since: Earliest accepted start time, as epoch seconds or a
+            ``datetime``.
+        until: Latest accepted start time (exclusive), as epoch
+            seconds or a ``datetime``.
+    """
+
+    services: Sequence[str] | None = None
+    statuses: Sequence[str] | None = None
+    errors_only: bool = False
+    since: float | datetime | None = None
+    until: float | datetime | None = None
+
+
+class _Postings:
+    """Growable, sorted array of row ids."""
+
+    __slots__ = ("_ids", "_size")
+
+    def __init__(self) -> None:
+        self._ids = np.empty(16, dtype=np.int64)
+        self._size = 0
+
+    def extend(self, rows: Sequence[int]) -> None:
+        required = self._size + len(rows)
+        if required > self._ids.shape[0]:
+            capacity = self._ids.shape[0]
+            while capacity < required:
+                capacity *= 2
+            ids = np.empty(capacity, dtype=np.int64)
+            ids[: self._size] = self._ids[: self._size]
+            self._ids = ids
+        self._ids[self._size : required] = rows
+        self._size = required
+
+    def view(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    def remap(self, new_rows: np.ndarray) -> None:
+        """Renumber ids through ``new_rows``, dropping ids mapped to ``-1``."""
+        ids = new_rows[self.view()]
+        ids = ids[ids >= 0]
+        self._ids[: ids.shape[0]] = ids
+        self._size = ids.shape[0]
+
+
+def _union(lists: Iterable[np.ndarray]) -> np.ndarray:
+    """Union of disjoint sorted posting lists, sorted."""
+    arrays = [ids for ids in lists if ids.size]
+    if not arrays:
+        return np.empty(0, dtype=np.int64)
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.sort(np.concatenate(arrays), kind="stable")
+
+
+class MetadataIndex:
+    """Inverted indexes over service, status and start‑time buckets."""
+
+    def __init__(self, bucket_seconds: float = 3600.0) -> None:
+        """Create an empty index.
+
+        Args:
+            bucket_seconds: Width of the start‑time buckets.  Time
+                filters read whole buckets from the index and check
+                exact start times only in the two boundary buckets.
+        """
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive")
+        self.bucket_seconds = bucket_seconds
+        self._postings: Dict[Hashable, _Postings] = {}
+        self._errors = _Postings()
+        self._times = np.empty(1024, dtype=np.float64)
+        self._rows = 0
+
+    def __len__(self) -> int:
+        """Number of store rows indexed so far."""
+        return self._rows
+
+    def add(
+        self,
+        services: Sequence[Any],
+        statuses: Sequence[Any],
+        start_times: Sequence[Any],
+    ) -> None:
+        """Index the next ``len(services)`` store rows.
+
+        Args:
+            services: Service name of each row (``None`` if unknown).
+            statuses: Status string of each row.
+            start_times: Start timestamp of each row in any format
+                accepted by :func:`to_epoch_seconds`.
+        """
+        first = self._rows
+        count = len(services)
+        groups: Dict[Hashable, List[int]] = {}
+        errors: List[int] = []
+        times = np.full(count, np.nan)
+        for offset, (service, status, start) in enumerate(zip(services, statuses, start_times)):
+            row = first + offset
+            if service is not None:
+                groups.setdefault(("service", str(service)), []).append(row)
+            status_key = str(status or "").upper()
+            groups.setdefault(("status", status_key), []).append(row)
+            if status_key not in OK_STATUSES:
+                errors.append(row)
+            seconds = to_epoch_seconds(start)
+            if seconds is not None:
+                times[offset] = seconds
+                groups.setdefault(("bucket", math.floor(seconds / self.bucket_seconds)), []).append(row)
+        for key, rows in groups.items():
+            postings = self._postings.get(key)
+            if postings is None:
+                postings = self._postings[key] = _Postings()
+            postings.extend(rows)
+        self._errors.extend(errors)
+        if first + count > self._times.shape[0]:
+            capacity = self._times.shape[0]
+            while capacity < first + count:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=np.float64)
+            grown[:first] = self._times[:first]
+            self._times = grown
+        self._times[first : first + count] = times
+        self._rows = first + count
+
+    def add_metadata(self, metadata: Iterable[Any]) -> None:
+        """Index rows from metadata dictionaries with span record fields."""
+        services: List[Any] = []
+        statuses: List[Any] = []
+        starts: List[Any] = []
+        for meta in metadata:
+            if not isinstance(meta, dict):
+                meta = {}
+            services.append(meta.get("service_name"))
+            statuses.append(meta.get("status"))
+            starts.append(meta.get("start_time"))
+        self.add(services, statuses, starts)
+
+    @property
+    def start_seconds(self) -> np.ndarray:
+        """Start time of every indexed row in epoch seconds (``nan`` if unknown)."""
+        return self._times[: self._rows]
+
+    def service_rows(self) -> Dict[str, np.ndarray]:
+        """Return the sorted row ids of every indexed service."""
+        return {key[1]: postings.view() for key, postings in self._postings.items() if key[0] == "service"}
+
+    def compact(self, rows: np.ndarray) -> None:
+        """Keep only the indexed ``rows`` (ascending), renumbering them from 0.
+
+        Mirrors :meth:`t_rag.vector_memory.VectorMemoryStore.compact`.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        new_rows = np.full(self._rows, -1, dtype=np.int64)
+        new_rows[rows] = np.arange(rows.shape[0])
+        for key in list(self._postings):
+            postings = self._postings[key]
+            postings.remap(new_rows)
+            if not postings.view().size:
+                del self._postings[key]
+        self._errors.remap(new_rows)
+        self._times[: rows.shape[0]] = self._times[rows]
+        self._rows = rows.shape[0]
+
+    def _lookup(self, field: str, values: Iterable[Any]) -> np.ndarray:
+        # Repeated values (e.g. statuses differing only in case) would
+        # break the disjointness that ``_union`` relies on
+        return _union(
+            self._postings[(field, value)].view()
+            for value in dict.fromkeys(values)
+            if (field, value) in self._postings
+        )
+
+    def _time_range(self, since: float | None, until: float | None) -> np.ndarray:
+        lo = -math.inf if since is None else math.floor(since / self.bucket_seconds)
+        hi = math.inf if until is None else math.floor(until / self.bucket_seconds)
+        rows = _union(
+            postings.view()
+            for key, postings in self._postings.items()
+            if key[0] == "bucket" and lo <= key[1] <= hi
+        )
+        if rows.size == 0:
+            return rows
+        times = self._times[rows]
+        keep = np.ones(rows.shape[0], dtype=bool)
+        if since is not None:
+            keep &= times >= since
+        if until is not None:
+            keep &= times < until
+        return rows[keep]
+
+    def candidates(self, where: SpanFilter | None) -> np.ndarray | None:
+        """Return the sorted row ids matching ``where``.
+
+        Returns:
+            An ``int64`` array of row ids, or ``None`` if ``where``
+            places no constraint on the rows.
+        """
+        if where is None:
+            return None
+        selections: List[np.ndarray] = []
+        if where.services is not None:
+            selections.append(self._lookup("service", (str(s) for s in where.services)))
+        if where.statuses is not None:
+            selections.append(self._lookup("status", (str(s).upper() for s in where.statuses)))
+        if where.errors_only:
+            selections.append(self._errors.view())
+        if where.since is not None or where.until is not None:
+            selections.append(self._time_range(to_epoch_seconds(where.since), to_epoch_seconds(where.until)))
+        if not selections:
+            return None
+        selections.sort(key=len)
+        result = selections[0]
+        for ids in selections[1:]:
+            if result.size == 0:
+                break
+            result = np.intersect1d(result, ids, assume_unique=True)
+        return result
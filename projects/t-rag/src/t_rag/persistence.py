@@ -0,0 +1,415 @@
+"""
+persistence.py
+==============
+
+On‑disk snapshot format for :class:`t_rag.vector_memory.VectorMemoryStore`.
+
+A snapshot is a directory containing five files:
+
+``vectors.f32``
+    Row‑major ``float32`` embedding matrix without a header.  It is
+    opened with :class:`numpy.memmap`, so a restored store shares the
+    OS page cache instead of copying the matrix onto the process heap,
+    and any number of processes can map the same file read‑only.
+``trace_keys.i64``
+    ``int64`` hash of each row's trace id (see :func:`trace_key`), used
+    to exclude traces inside the search kernel without decoding
+    metadata.  Snapshots written before this file was introduced are
+    still readable: the keys are then derived from the metadata on
+    open, and written out by the next append.
+``metadata.jsonl``
+    One compact JSON document per row.
+``metadata.offsets``
+    ``int64`` byte offsets into ``metadata.jsonl`` (``rows + 1``
+    entries), which allows metadata to be decoded lazily per row
+    instead of parsing the whole sidecar on open.
+``manifest.json``
+    Format version, dimension and committed row count.
+
+All data files are append‑only.  A snapshot writes new rows past the
+committed end of each file, flushes them and only then atomically
+replaces the manifest, so readers never observe a partially written
+snapshot and a crashed writer leaves at most an uncommitted tail that
+the next writer truncates.
+
+When rows must be renumbered (after compaction), a snapshot is not
+rewritten in place.  :func:`replace_snapshot` writes the new snapshot
+into a sibling ``<name>.new`` directory and swaps it in with two
+directory renames, keeping the old files until the new ones are in
+place.  Processes that still map the old files keep reading them,
+since the files are renamed or unlinked rather than truncated.
+
+Readers never modify a snapshot: while a swap is in progress (or after
+a writer crashed between the renames) they read whichever of
+``<name>.new`` and ``<name>.old`` is complete.  Only writers complete
+an interrupted swap, and they serialise on a sibling ``<name>.lock``
+file so that two writers never rename directories under each other.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+TRACE_KEYS_FILE = "trace_keys.i64"
+METADATA_FILE = "metadata.jsonl"
+OFFSETS_FILE = "metadata.offsets"
+
+
+def trace_key(trace_id: Any) -> int:
+    """Return a stable non‑zero 64‑bit hash of a trace id.
+
+    Trace ids are stored per row as these hashes so that whole traces
+    can be excluded from a search with a vectorised mask.  ``0`` is
+    reserved for rows without a trace id.
+    """
+    digest = hashlib.blake2b(str(trace_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True) or 1
+
+
+def metadata_trace_key(meta: Any) -> int:
+    """Return the :func:`trace_key` of a row's metadata, ``0`` without a trace id."""
+    if isinstance(meta, dict) and meta.get("trace_id") is not None:
+        return trace_key(meta["trace_id"])
+    return 0
+
+
+def _staging_dirs(root: Path) -> Tuple[Path, Path]:
+    """Sibling directories used by :func:`replace_snapshot`."""
+    return root.with_name(root.name + ".new"), root.with_name(root.name + ".old")
+
+
+@contextmanager
+def _writer_lock(root: Path) -> Iterator[None]:
+    """Hold the exclusive writer lock of the snapshot at ``root``."""
+    root.parent.mkdir(parents=True, exist_ok=True)
+    with root.with_name(root.name + ".lock").open("a+b") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def _finish_replace(root: Path) -> None:
+    """Complete a :func:`replace_snapshot` interrupted between its renames.
+
+    Must be called with the writer lock held.
+    """
+    staging, retired = _staging_dirs(root)
+    if not root.exists() and retired.exists():
+        os.replace(staging if (staging / MANIFEST_FILE).exists() else retired, root)
+    if root.exists() and retired.exists():
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+def _snapshot_dir(root: Path) -> Path | None:
+    """Directory holding the committed snapshot at ``root``, if any.
+
+    Normally ``root`` itself.  Between the renames of
+    :func:`replace_snapshot` the old snapshot has been moved to
+    ``<name>.old``; the new one in ``<name>.new`` is then complete and
+    preferred, with the old one as fallback if the writer renamed the
+    new one meanwhile.
+    """
+    if (root / MANIFEST_FILE).exists():
+        return root
+    staging, retired = _staging_dirs(root)
+    if retired.exists():
+        for candidate in (staging, root, retired):
+            if (candidate / MANIFEST_FILE).exists():
+                return candidate
+    return None
+
+
+def read_manifest(path: str | Path) -> Dict[str, Any] | None:
+    """Return the manifest of the snapshot at ``path``, or ``None`` if absent."""
+    directory = _snapshot_dir(Path(path))
+    if directory is None:
+        return None
+    return _load_manifest(directory)
+
+
+def _load_manifest(directory: Path) -> Dict[str, Any]:
+    manifest_path = directory / MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format: {manifest.get('format_version')}")
+    return manifest
+
+
+def _append(file_path: Path, committed_bytes: int, payload: bytes) -> None:
+    """Append ``payload`` after the committed prefix of ``file_path``."""
+    mode = "r+b" if file_path.exists() else "w+b"
+    with file_path.open(mode) as f:
+        f.truncate(committed_bytes)
+        f.seek(committed_bytes)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def append_snapshot(
+    path: str | Path,
+    embeddings: np.ndarray,
+    metadata: Iterable[Any],
+    dimension: int,
+    trace_keys: np.ndarray | None = None,
+) -> int:
+    """Append rows to the snapshot at ``path``, creating it if needed.
+
+    Args:
+        path: Snapshot directory.
+        embeddings: Rows to append, shape ``(n, dimension)``.
+        metadata: JSON‑serialisable metadata for each row.  Values that
+            are not serialisable are stored as strings.
+        dimension: Embedding dimensionality; must match an existing
+            snapshot.
+        trace_keys: Optional ``int64`` trace id hashes for each row.
+            Rows without a key are stored as ``0``.
+
+    Returns:
+        The committed row count after the append.
+    """
+    root = Path(path)
+    with _writer_lock(root):
+        _finish_replace(root)
+        return _append_rows(root, embeddings, metadata, dimension, trace_keys)
+
+
+def _append_rows(
+    root: Path,
+    embeddings: np.ndarray,
+    metadata: Iterable[Any],
+    dimension: int,
+    trace_keys: np.ndarray | None,
+) -> int:
+    """Body of :func:`append_snapshot`; the caller holds the writer lock."""
+    root.mkdir(parents=True, exist_ok=True)
+    if (root / MANIFEST_FILE).exists():
+        manifest = _load_manifest(root)
+    else:
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "dimension": dimension,
+            "rows": 0,
+            "metadata_bytes": 0,
+        }
+    if manifest["dimension"] != dimension:
+        raise ValueError(
+            f"snapshot dimension {manifest['dimension']} does not match store dimension {dimension}"
+        )
+    rows = manifest["rows"]
+    metadata_bytes = manifest["metadata_bytes"]
+
+    vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+    lines = [
+        json.dumps(meta, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+        for meta in metadata
+    ]
+    if len(lines) != vectors.shape[0]:
+        raise ValueError("embeddings and metadata must have the same length")
+    if trace_keys is None:
+        trace_keys = np.zeros(len(lines), dtype=np.int64)
+    keys = np.ascontiguousarray(trace_keys, dtype=np.int64)
+    offsets = metadata_bytes + np.cumsum([0] + [len(line) for line in lines], dtype=np.int64)
+    if rows:
+        # The first offset of this batch is already stored as the end of the previous one
+        offsets = offsets[1:]
+
+    committed_keys = rows * 8
+    if rows and not (root / TRACE_KEYS_FILE).exists():
+        # Backfill the keys of a snapshot written before the keys file
+        legacy = MappedMetadata(root, rows, metadata_bytes)
+        keys = np.concatenate([_derive_trace_keys(legacy), keys])
+        del legacy
+        committed_keys = 0
+
+    _append(root / VECTORS_FILE, rows * dimension * 4, vectors.tobytes())
+    _append(root / TRACE_KEYS_FILE, committed_keys, keys.tobytes())
+    _append(root / METADATA_FILE, metadata_bytes, b"".join(lines))
+    _append(root / OFFSETS_FILE, (rows + 1) * 8 if rows else 0, offsets.tobytes())
+
+    manifest["rows"] = rows + len(lines)
+    manifest["metadata_bytes"] = int(offsets[-1]) if len(offsets) else metadata_bytes
+    tmp_path = root / (MANIFEST_FILE + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_path, root / MANIFEST_FILE)
+    return manifest["rows"]
+
+
+def replace_snapshot(
+    path: str | Path,
+    embeddings: np.ndarray,
+    metadata: Iterable[Any],
+    dimension: int,
+    trace_keys: np.ndarray | None = None,
+) -> int:
+    """Atomically replace the snapshot at ``path`` with the given rows.
+
+    Arguments are those of :func:`append_snapshot`.  The new snapshot is
+    fully written and flushed next to ``path`` before the old one is
+    moved aside, so a crash at any point leaves either the old or the
+    new snapshot readable.
+
+    Returns:
+        The committed row count of the new snapshot.
+    """
+    root = Path(path)
+    staging, retired = _staging_dirs(root)
+    with _writer_lock(root):
+        _finish_replace(root)
+        shutil.rmtree(staging, ignore_errors=True)
+        rows = _append_rows(staging, embeddings, metadata, dimension, trace_keys)
+        if root.exists():
+            os.replace(root, retired)
+        os.replace(staging, root)
+        shutil.rmtree(retired, ignore_errors=True)
+    return rows
+
+
+def rewind_snapshot(path: str | Path, rows: int) -> None:
+    """Roll the committed row count of a snapshot back to ``rows``.
+
+    Only the manifest is rewritten; data past the new end is discarded
+    by the next :func:`append_snapshot`.  Used to drop rows appended
+    after the last checkpoint of an interrupted bulk build.
+    """
+    if rows < 0:
+        raise ValueError("rows must be non-negative")
+    root = Path(path)
+    with _writer_lock(root):
+        _finish_replace(root)
+        if not (root / MANIFEST_FILE).exists():
+            return
+        manifest = _load_manifest(root)
+        if manifest["rows"] <= rows:
+            return
+        offsets = np.memmap(root / OFFSETS_FILE, dtype=np.int64, mode="r", shape=(manifest["rows"] + 1,))
+        manifest["metadata_bytes"] = int(offsets[rows]) if rows else 0
+        manifest["rows"] = rows
+        del offsets
+        tmp_path = root / (MANIFEST_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_path, root / MANIFEST_FILE)
+
+
+class MappedMetadata(Sequence[Any]):
+    """Lazily decoded, memory‑mapped metadata column of a snapshot.
+
+    Entries are decoded from ``metadata.jsonl`` on access.  Additional
+    in‑memory entries can be appended with :meth:`append` and
+    :meth:`extend`, so the object can stand in for the plain list used
+    by an unpersisted store.
+    """
+
+    def __init__(self, path: str | Path, rows: int, metadata_bytes: int) -> None:
+        root = Path(path)
+        self._rows = rows
+        self._offsets = (
+            np.memmap(root / OFFSETS_FILE, dtype=np.int64, mode="r", shape=(rows + 1,))
+            if rows
+            else np.zeros(1, dtype=np.int64)
+        )
+        self._data: mmap.mmap | bytes = b""
+        if metadata_bytes:
+            with (root / METADATA_FILE).open("rb") as f:
+                self._data = mmap.mmap(f.fileno(), metadata_bytes, access=mmap.ACCESS_READ)
+        self._extra: List[Any] = []
+
+    @property
+    def persisted_rows(self) -> int:
+        """Number of entries backed by the snapshot file."""
+        return self._rows
+
+    def __len__(self) -> int:
+        return self._rows + len(self._extra)
+
+    def __getitem__(self, idx: int) -> Any:  # type: ignore[override]
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("metadata index out of range")
+        if idx >= self._rows:
+            return self._extra[idx - self._rows]
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return json.loads(self._data[start:end])
+
+    def __iter__(self) -> Iterator[Any]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def append(self, item: Any) -> None:
+        self._extra.append(item)
+
+    def extend(self, items: Iterable[Any]) -> None:
+        self._extra.extend(items)
+
+
+def open_snapshot(path: str | Path) -> Tuple[np.ndarray, np.ndarray, MappedMetadata, int]:
+    """Memory‑map the snapshot at ``path``.
+
+    Returns:
+        A tuple ``(embeddings, trace_keys, metadata, dimension)`` where
+        ``embeddings`` is a read‑only :class:`numpy.memmap` of shape
+        ``(rows, dimension)`` and ``trace_keys`` one of shape
+        ``(rows,)``.
+
+    Raises:
+        FileNotFoundError: If ``path`` does not contain a snapshot.
+    """
+    for attempt in range(3):
+        directory = _snapshot_dir(Path(path))
+        if directory is None:
+            break
+        try:
+            return _open_files(directory, _load_manifest(directory))
+        except FileNotFoundError:
+            # A writer swapped the directories while they were being opened
+            if attempt == 2:
+                raise
+    raise FileNotFoundError(f"no vector store snapshot at {path}")
+
+
+def _derive_trace_keys(metadata: Iterable[Any]) -> np.ndarray:
+    return np.fromiter((metadata_trace_key(meta) for meta in metadata), dtype=np.int64)
+
+
+def _open_files(
+    directory: Path, manifest: Dict[str, Any]
+) -> Tuple[np.ndarray, np.ndarray, MappedMetadata, int]:
+    rows = manifest["rows"]
+    dimension = manifest["dimension"]
+    metadata = MappedMetadata(directory, rows, manifest["metadata_bytes"])
+    if rows:
+        embeddings = np.memmap(
+            directory / VECTORS_FILE, dtype=np.float32, mode="r", shape=(rows, dimension)
+        )
+        if (directory / TRACE_KEYS_FILE).exists():
+            trace_keys = np.memmap(directory / TRACE_KEYS_FILE, dtype=np.int64, mode="r", shape=(rows,))
+        else:
+            trace_keys = _derive_trace_keys(metadata)
+    else:
+        embeddings = np.empty((0, dimension), dtype=np.float32)
+        trace_keys = np.empty(0, dtype=np.int64)
+    return embeddings, trace_keys, metadata, dimension
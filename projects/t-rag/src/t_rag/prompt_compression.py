@@ -0,0 +1,156 @@
+"""
+prompt_compression.py
+=====================
+
+Token‑budgeted summarisation of spans for the LLM prompt.
+
+Listing every span of a large incident verbatim produces prompts that
+are slow to send and can exceed the model's context window.  Most of
+those lines are repetitions of the same few messages, differing only
+in ids or numbers.  :func:`compress_spans` therefore
+
+* keeps the slowest spans verbatim,
+* folds error spans, and then the remaining spans, into groups of
+  near‑identical messages (digits and hex ids masked), each emitted
+  once as a verbatim example with a count, and
+* stops adding lines once a token budget is reached, appending a note
+  with the number of spans left out that is counted against the budget.
+
+Token counts are estimated locally with :func:`estimate_tokens`, which
+needs no tokenizer download and is cheap enough to run per line.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .metadata_index import is_error_status
+
+# Roughly four characters per token for English text and identifiers
+_CHARS_PER_TOKEN = 4
+_VARIABLE_RE = re.compile(r"\b[0-9a-fA-F]{8,}\b|\d+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in ``text``.
+
+    Uses the common four‑characters‑per‑token approximation, which is
+    within a small factor of BPE tokenizers for log‑like text and costs
+    nothing compared with a real tokenizer.
+    """
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def _message(span: Any) -> str:
+    if isinstance(span, dict):
+        return str(span.get("message") or span)
+    return str(span)
+
+
+def _is_error(span: Any) -> bool:
+    if not isinstance(span, dict):
+        return False
+    return is_error_status(span.get("status"))
+
+
+def _duration(span: Any) -> float | None:
+    if not isinstance(span, dict):
+        return None
+    try:
+        return float(span.get("end_time")) - float(span.get("start_time"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _group_key(message: str) -> str:
+    """Mask ids and numbers so near‑identical messages share a key."""
+    return _VARIABLE_RE.sub("#", message)
+
+
+def _omitted_note(omitted: int) -> str:
+    return f"... {omitted} more spans omitted to fit the prompt budget"
+
+
+def _group(messages: Iterable[str]) -> List[List[Any]]:
+    """Group messages by masked key as ``[first message, count]`` in first‑seen order."""
+    groups: Dict[str, List[Any]] = {}
+    for message in messages:
+        group = groups.setdefault(_group_key(message), [message, 0])
+        group[1] += 1
+    return list(groups.values())
+
+
+def _entry(message: str, count: int) -> Tuple[str, int]:
+    return (message if count == 1 else f"[x{count}] {message}", count)
+
+
+def compress_spans(
+    spans: Iterable[Any],
+    token_budget: int,
+    slow_fraction: float = 0.05,
+) -> Tuple[List[str], int]:
+    """Summarise spans into prompt lines that fit a token budget.
+
+    Args:
+        spans: Span dictionaries (with ``message``, ``status`` and
+            optionally numeric ``start_time``/``end_time``) or any
+            objects convertible to strings.
+        token_budget: Maximum estimated tokens for the returned lines
+            plus the note :func:`summarise_spans` appends when spans
+            are omitted.
+        slow_fraction: Fraction of spans with a known duration that are
+            treated as slow and kept verbatim.
+
+    Returns:
+        A tuple ``(lines, omitted)`` where ``lines`` are numbered prompt
+        lines and ``omitted`` is the number of spans not represented.
+    """
+    span_list = list(spans)
+    errors: List[int] = [i for i, span in enumerate(span_list) if _is_error(span)]
+    error_set = set(errors)
+    slow: List[int] = []
+    durations = [(d, i) for i, span in enumerate(span_list) if (d := _duration(span)) is not None]
+    if durations and slow_fraction > 0:
+        slow_count = max(1, int(len(durations) * slow_fraction))
+        slow = [i for _, i in sorted(durations, reverse=True)[:slow_count] if i not in error_set]
+    slow_set = set(slow)
+
+    # Repeated errors are as redundant as repeated successes: group both
+    entries: List[Tuple[str, int]] = [
+        _entry(message, count) for message, count in _group(_message(span_list[i]) for i in errors)
+    ]
+    entries.extend((_message(span_list[i]), 1) for i in slow)
+    entries.extend(
+        _entry(message, count)
+        for message, count in sorted(
+            _group(
+                _message(span)
+                for i, span in enumerate(span_list)
+                if i not in error_set and i not in slow_set
+            ),
+            key=lambda item: -item[1],
+        )
+    )
+
+    costs = [estimate_tokens(f"{i + 1}. {text}") + 1 for i, (text, _) in enumerate(entries)]
+    if sum(costs) > token_budget:
+        # Leave room for the note on omitted spans
+        token_budget -= estimate_tokens(_omitted_note(len(span_list))) + 1
+    lines: List[str] = []
+    used = 0
+    covered = 0
+    for (text, count), cost in zip(entries, costs):
+        if used + cost > token_budget:
+            break
+        lines.append(f"{len(lines) + 1}. {text}")
+        used += cost
+        covered += count
+    return lines, len(span_list) - covered
+
+
+def summarise_spans(spans: Iterable[Any], token_budget: int) -> str:
+    """Render :func:`compress_spans` output as a prompt section."""
+    lines, omitted = compress_spans(spans, token_budget)
+    if omitted:
+        lines.append(_omitted_note(omitted))
+    return "\n".join(lines)
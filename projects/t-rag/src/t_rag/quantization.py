@@ -0,0 +1,149 @@
+"""
+quantization.py
+===============
+
+Compact storage of embeddings for :class:`t_rag.vector_memory.VectorMemoryStore`.
+
+A 384‑dimensional ``float32`` embedding occupies 1.5 KB, which limits
+how much history a store can keep in memory.  This module provides two
+lossy storage formats:
+
+``float16``
+    Half precision, 2 bytes per dimension.  Cosine scores change by
+    roughly 1e‑3, which rarely alters a top‑``k`` ranking.
+``int8``
+    Symmetric scalar quantisation with one ``float32`` scale per row,
+    1 byte per dimension.  Every row is divided by ``max(|x|) / 127``
+    and rounded, so the dot product with a query is the integer‑code
+    dot product times the row scale.
+
+:class:`QuantizedMatrix` wraps the codes behind the small part of the
+array interface that the search kernels need (``shape``, row indexing
+returning ``float32`` rows and :meth:`QuantizedMatrix.dot`), so
+:func:`t_rag.ann_index.exact_search` and the IVF backend run directly
+on the compact codes.  :func:`rescore` re‑ranks a candidate list
+against full‑precision vectors, recovering exact top‑``k`` results
+from an over‑fetched approximate candidate set.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Tuple
+
+import numpy as np
+
+#: Supported values of ``StoreConfig.storage_dtype``
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize(vectors: np.ndarray, storage: str) -> Tuple[np.ndarray, np.ndarray | None]:
+    """Encode ``float32`` rows in the given storage format.
+
+    Args:
+        vectors: Array of shape ``(n, dim)``.
+        storage: One of :data:`STORAGE_DTYPES`.
+
+    Returns:
+        A tuple ``(codes, scales)``.  ``scales`` holds one ``float32``
+        factor per row for ``int8`` storage and is ``None`` otherwise.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if storage == "float32":
+        return vectors, None
+    if storage == "float16":
+        return vectors.astype(np.float16), None
+    if storage == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0 if vectors.size else np.empty(0, dtype=np.float32)
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"unknown storage dtype {storage!r}; expected one of {list(STORAGE_DTYPES)}")
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray | None = None) -> np.ndarray:
+    """Decode rows produced by :func:`quantize` back to ``float32``."""
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[..., None]
+    return vectors
+
+
+class QuantizedMatrix:
+    """Read‑only matrix view over quantised rows.
+
+    Indexing returns dequantised ``float32`` rows, and :meth:`dot`
+    scores queries against all rows while dequantising only
+    :attr:`block_rows` rows at a time, so the full ``float32`` matrix
+    is never materialised.
+    """
+
+    #: Number of stored rows converted to ``float32`` per block in :meth:`dot`
+    block_rows = 65_536
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray | None = None) -> None:
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes occupied by the codes and scales."""
+        return self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        scales = None if self.scales is None else self.scales[key]
+        return dequantize(self.codes[key], scales)
+
+    def dot(self, queries: np.ndarray) -> np.ndarray:
+        """Return ``queries @ matrix.T`` as ``float32`` scores."""
+        size = self.codes.shape[0]
+        scores = np.empty((queries.shape[0], size), dtype=np.float32)
+        for start in range(0, size, self.block_rows):
+            stop = min(start + self.block_rows, size)
+            block = queries @ self.codes[start:stop].astype(np.float32).T
+            if self.scales is not None:
+                block *= self.scales[start:stop]
+            scores[:, start:stop] = block
+        return scores
+
+
+def rescore(
+    queries: np.ndarray,
+    candidate_ids: np.ndarray,
+    full_rows: Callable[[np.ndarray], np.ndarray],
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Re‑rank candidates by their exact cosine distance.
+
+    Args:
+        queries: Query embeddings of shape ``(n_queries, dim)``.
+        candidate_ids: Candidate row ids of shape ``(n_queries, m)``;
+            entries of ``-1`` are padding.
+        full_rows: Function returning the full‑precision vectors of an
+            array of row ids.
+        k: Number of results to keep per query.
+
+    Returns:
+        A tuple ``(ids, distances)`` of shape ``(n_queries, min(k, m))``
+        sorted by ascending exact distance, padded with id ``-1`` and
+        distance ``inf`` where fewer candidates exist.
+    """
+    valid = candidate_ids >= 0
+    similarities = np.full(candidate_ids.shape, -np.inf, dtype=np.float32)
+    if np.any(valid):
+        # Fetch each distinct row once; candidates overlap across queries
+        unique_ids, inverse = np.unique(candidate_ids[valid], return_inverse=True)
+        vectors = np.asarray(full_rows(unique_ids), dtype=np.float32)
+        query_rows = np.nonzero(valid)[0]
+        similarities[valid] = np.einsum("ij,ij->i", vectors[inverse], queries[query_rows])
+    k = min(k, candidate_ids.shape[1])
+    order = np.argsort(-similarities, axis=1, kind="stable")[:, :k]
+    ids = np.take_along_axis(candidate_ids, order, axis=1)
+    top = np.take_along_axis(similarities, order, axis=1)
+    ids = np.where(np.isfinite(top), ids, -1)
+    return ids, (1.0 - top).astype(np.float32)
@@ -0,0 +1,129 @@
+"""
+retrieval.py
+============
+
+Aggregation of nearest‑neighbour hits into retrieved contexts.
+
+Querying the vector store with every span of an incident produces
+``n_spans * k`` hits, many of which point at the same stored span or
+at different spans of the same historical trace.  Instead of
+deduplicating by comparing full metadata dictionaries, the
+:class:`ContextAggregator` accumulates similarity per store row with
+vectorised NumPy operations, resolves metadata once per unique row,
+deduplicates spans by ``(trace_id, span_id)`` and ranks historical
+traces by their total similarity.  Work is linear in the number of
+hits, and the reasoner receives the most relevant traces rather than
+the first ones encountered.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+import numpy as np
+
+
+@dataclass
+class RetrievedTrace:
+    """A historical trace ranked by its similarity to the current incident.
+
+    Attributes:
+        trace_id: Identifier of the historical trace.
+        score: Sum of cosine similarities of all neighbour hits that
+            fell into this trace.
+        hits: Number of neighbour hits that fell into this trace.
+        contexts: Metadata of the distinct spans hit, most similar
+            first.
+    """
+
+    trace_id: Any
+    score: float
+    hits: int
+    contexts: List[Any] = field(default_factory=list)
+
+
+def _span_key(meta: Any, row: int) -> Tuple[Hashable, Hashable]:
+    """Return the ``(trace_id, span_id)`` identity of a stored span."""
+    if isinstance(meta, dict):
+        trace_id = meta.get("trace_id")
+        span_id = meta.get("span_id")
+        if span_id is not None:
+            return trace_id, span_id
+        return trace_id, ("row", row)
+    return None, ("row", row)
+
+
+class ContextAggregator:
+    """Accumulates neighbour hits from one or more batched queries."""
+
+    def __init__(self) -> None:
+        self._score: Dict[int, float] = {}
+        self._best: Dict[int, float] = {}
+        self._hits: Dict[int, int] = {}
+
+    def add(self, ids: np.ndarray, distances: np.ndarray) -> None:
+        """Record the hits of a :meth:`VectorMemoryStore.query_batch` call.
+
+        Args:
+            ids: Neighbour row ids, shape ``(n_queries, k)``.  Entries
+                of ``-1`` (padding) are ignored.
+            distances: Matching cosine distances.
+        """
+        mask = ids >= 0
+        rows = ids[mask]
+        if rows.size == 0:
+            return
+        similarities = 1.0 - distances[mask].astype(np.float64)
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        sums = np.bincount(inverse, weights=similarities)
+        counts = np.bincount(inverse)
+        best = np.full(unique_rows.shape[0], -np.inf)
+        np.maximum.at(best, inverse, similarities)
+        for row, total, count, top in zip(unique_rows.tolist(), sums.tolist(), counts.tolist(), best.tolist()):
+            self._score[row] = self._score.get(row, 0.0) + total
+            self._hits[row] = self._hits.get(row, 0) + count
+            self._best[row] = max(self._best.get(row, -np.inf), top)
+
+    def __len__(self) -> int:
+        return len(self._score)
+
+    def top_traces(
+        self,
+        get_metadata: Callable[[int], Any],
+        max_traces: int | None = None,
+        max_spans_per_trace: int | None = None,
+    ) -> List[RetrievedTrace]:
+        """Group the accumulated hits by trace and rank the traces.
+
+        Args:
+            get_metadata: Function resolving a store row id to its
+                metadata, typically :meth:`VectorMemoryStore.get_metadata`.
+            max_traces: Maximum number of traces to return.  ``None``
+                returns all of them.
+            max_spans_per_trace: Maximum number of span contexts kept
+                per trace.  ``None`` keeps all distinct spans.
+
+        Returns:
+            Traces sorted by descending score.
+        """
+        traces: Dict[Hashable, RetrievedTrace] = {}
+        span_best: Dict[Tuple[Hashable, Hashable], float] = {}
+        span_meta: Dict[Tuple[Hashable, Hashable], Any] = {}
+        for row, score in self._score.items():
+            meta = get_metadata(row)
+            key = _span_key(meta, row)
+            trace = traces.get(key[0])
+            if trace is None:
+                trace = traces[key[0]] = RetrievedTrace(trace_id=key[0], score=0.0, hits=0)
+            trace.score += score
+            trace.hits += self._hits[row]
+            if key not in span_meta or self._best[row] > span_best[key]:
+                span_meta[key] = meta
+                span_best[key] = self._best[row]
+        ordered_spans = sorted(span_meta, key=lambda key: -span_best[key])
+        for key in ordered_spans:
+            trace = traces[key[0]]
+            if max_spans_per_trace is None or len(trace.contexts) < max_spans_per_trace:
+                trace.contexts.append(span_meta[key])
+        ranked = sorted(traces.values(), key=lambda trace: (-trace.score, str(trace.trace_id)))
+        return ranked if max_traces is None else ranked[:max_traces]
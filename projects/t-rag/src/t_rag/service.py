@@ -4,15 +4,21 @@ service.py
 
 Entry point and orchestrator for the T‑RAG pipeline.  This module
 ties together the configuration loading, trace parsing, embedding,
-vector storage and language model reasoning into a single function
-(``run``) and a command‑line interface (``_cli``).
+vector storage and language model reasoning into a long‑lived
+:class:`TragEngine`, a convenience function (``run``) backed by a
+process‑wide engine, and a command‑line interface (``_cli``).
+
+Loading the embedding model takes seconds, so callers that analyse
+many incidents (the control plane, SLO Copilot) should reuse one warm
+engine rather than constructing the pipeline per request; ``run`` does
+this automatically via :func:`get_engine`.
 
 You can run this module directly with a JSON trace file to obtain a
 root cause hypothesis::
 
     python -m t_rag.service --trace path/to/trace.json
 
-In a larger system you might import the ``run`` function and expose
+In a larger system you might import ``run`` or a :class:`TragEngine` and expose
 it via a REST API, message bus or other interface.  See the README
 for integration guidance and how to extend this pipeline for
 production use.
@@ -21,42 +27,245 @@ from __future__ import annotations
 
 import argparse
 import json
-from typing import List, Dict, Any
+import threading
+from dataclasses import replace
+from typing import List, Dict, Any, Iterable, Iterator
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-from .config import load_config
+from .config import TRAGConfig, load_config
+from .embedders import Embedder, SentenceTransformerEmbedder, create_embedder
+from .embedding_cache import EmbeddingCache
+from .retrieval import ContextAggregator
 from .trace_loader import TraceLoader, SpanRecord
 from .vector_memory import VectorMemoryStore
-from .llm_reasoner import LLMReasoner
+from .llm_reasoner import LLMReasoner, create_reasoner
+from .metadata_index import SpanFilter
+
+
+def _as_embedder(model: Any, model_name: str = "") -> Embedder:
+    """Wrap a bare ``SentenceTransformer`` so that it yields unit vectors."""
+    if isinstance(model, Embedder):
+        return model
+    return SentenceTransformerEmbedder(model_name, model=model)
 
 
-def embed_messages(model: SentenceTransformer, records: List[SpanRecord]) -> np.ndarray:
+def embed_messages(
+    embedder: Embedder | Any,
+    records: List[SpanRecord],
+    cache: EmbeddingCache | None = None,
+) -> np.ndarray:
     """Compute embeddings for a list of span records.
 
     Args:
-        model: A ``SentenceTransformer`` instance.
+        embedder: An :class:`~t_rag.embedders.Embedder` backend, or a
+            preloaded ``SentenceTransformer`` which is wrapped in a
+            :class:`~t_rag.embedders.SentenceTransformerEmbedder` so its
+            vectors are normalised as before.
         records: A list of :class:`SpanRecord` objects to embed.
+        cache: Optional :class:`~t_rag.embedding_cache.EmbeddingCache`.
+            When given, only messages not already cached are encoded
+            by the embedder.
 
     Returns:
         A 2‑D NumPy array of shape ``(len(records), dim)`` containing
         the normalised vector embeddings.
     """
+    embedder = _as_embedder(embedder)
     texts = [rec.message for rec in records]
-    # ``encode`` returns a list of vectors.  ``convert_to_numpy`` ensures
-    # a NumPy array and ``normalize_embeddings`` scales vectors to unit length.
-    return model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    if cache is None:
+        return embedder.encode(texts)
+    return cache.encode(texts, embedder.encode)
+
+
+def _chunked(records: Iterable[SpanRecord], chunk_size: int) -> Iterator[List[SpanRecord]]:
+    """Split an iterable of records into lists of at most ``chunk_size``."""
+    chunk: List[SpanRecord] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class TragEngine:
+    """Warm T‑RAG pipeline that can analyse many incidents.
+
+    The engine loads the embedding model, vector store, embedding cache
+    and LLM reasoner once and keeps them for its lifetime.  With
+    ``StoreConfig.remember_incidents`` enabled, spans of every analysed
+    incident remain in the vector store, so later incidents can
+    retrieve them as historical context; otherwise the store only
+    holds what it was restored from and does not grow.
+
+    :meth:`analyze` is thread‑safe: embedding and store access are
+    serialised by a lock, while the (slow) LLM round trip runs outside
+    it so concurrent requests overlap on network latency.
+    """
+
+    def __init__(
+        self,
+        config: TRAGConfig | None = None,
+        model: Embedder | Any | None = None,
+        reasoner: LLMReasoner | None = None,
+    ) -> None:
+        """Load the pipeline components.
+
+        Args:
+            config: Configuration to use.  Defaults to
+                :func:`t_rag.config.load_config`.
+            model: Optional preloaded embedder, or a preloaded
+                ``SentenceTransformer`` which is wrapped in a
+                :class:`~t_rag.embedders.SentenceTransformerEmbedder`.
+                Defaults to the backend named by
+                ``ModelConfig.embedding_backend`` (see
+                :func:`t_rag.embedders.create_embedder`).
+            reasoner: Optional reasoner.  Defaults to the provider named
+                by ``ModelConfig.llm_provider`` (see
+                :func:`t_rag.llm_reasoner.create_reasoner`).
+        """
+        self.config = config or load_config()
+        cfg = self.config
+        # Load the embedding backend specified in the configuration
+        if model is None:
+            model = create_embedder(cfg.model)
+        self.embedder: Embedder = _as_embedder(model, cfg.model.embedding_model_name)
+        # The store takes its dimension from the embedder; the caller's
+        # configuration object is left untouched
+        self.store = VectorMemoryStore.from_config(replace(cfg.store, dimension=self.embedder.dimension))
+        self.cache: EmbeddingCache | None = None
+        if cfg.model.embedding_cache_size > 0 or cfg.model.embedding_cache_path:
+            self.cache = EmbeddingCache(
+                self.embedder.name,
+                max_entries=cfg.model.embedding_cache_size,
+                path=cfg.model.embedding_cache_path,
+            )
+        self.reasoner = reasoner or create_reasoner(cfg.model)
+        self._lock = threading.Lock()
+
+    def analyze(
+        self,
+        trace_path: str | None = None,
+        spans: Iterable[SpanRecord] | None = None,
+        where: SpanFilter | None = None,
+    ) -> Dict[str, Any]:
+        """Produce a root cause analysis for one incident.
+
+        Exactly one of ``trace_path`` and ``spans`` must be given.
+
+        Args:
+            trace_path: Path to a JSON file (or directory of files)
+                containing the spans for the current incident.
+            spans: Already loaded span records for the current incident.
+            where: Optional filter restricting which historical spans
+                may be retrieved, e.g. by service, status or time
+                window (see :class:`t_rag.metadata_index.SpanFilter`).
+
+        Returns:
+            A dictionary containing the root cause analysis result.  See
+            :meth:`t_rag.llm_reasoner.LLMReasoner.generate_root_cause`
+            for the returned schema.  A ``retrieved_traces`` key lists
+            the historical traces used as context with their scores.
+        """
+        if (trace_path is None) == (spans is None):
+            raise ValueError("exactly one of trace_path and spans must be provided")
+        cfg = self.config
+        if trace_path is not None:
+            loader = TraceLoader(
+                trace_path,
+                streaming=cfg.ingest.streaming,
+                workers=cfg.ingest.workers,
+                files_per_task=cfg.ingest.files_per_task,
+            )
+            chunks = loader.iter_chunks(cfg.ingest.chunk_size)
+        else:
+            chunks = _chunked(spans, cfg.ingest.chunk_size)
+        if cfg.store.retrieval_mode not in {"historical", "inclusive"}:
+            raise ValueError(f"unknown retrieval mode {cfg.store.retrieval_mode!r}")
+        historical = cfg.store.retrieval_mode == "historical"
+        # Load current spans chunk by chunk.  Each chunk is embedded as
+        # soon as it is parsed, so that with streaming ingestion the raw
+        # trace never has to be held in memory at once.  In historical
+        # mode the current spans are only inserted after retrieval, so
+        # they cannot crowd out historical neighbours.
+        records: List[SpanRecord] = []
+        aggregator = ContextAggregator()
+        with self._lock:
+            embedding_chunks: List[np.ndarray] = []
+            for chunk in chunks:
+                chunk_embeddings = embed_messages(self.embedder, chunk, self.cache)
+                if not historical:
+                    self.store.add_records(chunk_embeddings, chunk)
+                records.extend(chunk)
+                embedding_chunks.append(chunk_embeddings)
+            # Retrieve similar contexts.  Neighbour hits are accumulated
+            # per store row, deduplicated by (trace_id, span_id) and
+            # grouped into historical traces ranked by total similarity.
+            # Spans stored under the current trace ids (e.g. from an
+            # earlier analysis of the same incident) are masked out.
+            exclude = {rec.trace_id for rec in records} if historical else None
+            for chunk_embeddings in embedding_chunks:
+                neighbour_ids, distances = self.store.query_batch(
+                    chunk_embeddings, k=cfg.model.top_k, exclude_trace_ids=exclude, where=where
+                )
+                aggregator.add(neighbour_ids, distances)
+            top_traces = aggregator.top_traces(
+                self.store.get_metadata,
+                max_traces=cfg.model.max_context_traces,
+                max_spans_per_trace=cfg.model.max_spans_per_trace,
+            )
+            if not historical and not cfg.store.remember_incidents:
+                # Drop the current spans again so the store does not
+                # grow; they were inserted last and compaction keeps
+                # row order, so they are the trailing rows
+                self.store.delete(range(len(self.store) - len(records), len(self.store)))
+            if historical and cfg.store.remember_incidents:
+                offset = 0
+                for chunk_embeddings in embedding_chunks:
+                    count = len(chunk_embeddings)
+                    self.store.add_records(chunk_embeddings, records[offset : offset + count])
+                    offset += count
+        retrieved = [ctx for trace in top_traces for ctx in trace.contexts]
+        # Perform reasoning using the language model
+        result = self.reasoner.generate_root_cause(
+            current_spans=[rec.__dict__ for rec in records],
+            retrieved_contexts=retrieved,
+        )
+        result["retrieved_traces"] = [
+            {"trace_id": trace.trace_id, "score": round(trace.score, 4), "hits": trace.hits}
+            for trace in top_traces
+        ]
+        return result
+
+    def close(self) -> None:
+        """Release resources held by the engine (e.g. the on‑disk cache)."""
+        if self.cache is not None:
+            self.cache.close()
+
+
+_ENGINE: TragEngine | None = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_engine() -> TragEngine:
+    """Return the process‑wide :class:`TragEngine`, creating it on first use."""
+    global _ENGINE
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _ENGINE = TragEngine()
+    return _ENGINE
 
 
 def run(trace_path: str) -> Dict[str, Any]:
     """Execute the T‑RAG pipeline for a given trace file.
 
-    This function orchestrates the entire pipeline: it loads
-    configuration, instantiates the embedding model and vector store,
-    parses the trace into records, computes embeddings, retrieves
-    similar contexts and finally invokes the LLM for a root cause
-    report.
+    This is a thin wrapper around :meth:`TragEngine.analyze` on the
+    process‑wide engine returned by :func:`get_engine`, so the
+    embedding model, vector store and reasoner are only loaded by the
+    first call.
 
     Args:
         trace_path: Path to a JSON file containing the spans for the
@@ -67,39 +276,7 @@ def run(trace_path: str) -> Dict[str, Any]:
         :meth:`t_rag.llm_reasoner.LLMReasoner.generate_root_cause` for
         the returned schema.
     """
-    cfg = load_config()
-    # Load the embedding model specified in the configuration
-    model = SentenceTransformer(cfg.model.embedding_model_name)
-    # Populate the vector dimension once the model is initialised
-    cfg.store.dimension = model.get_sentence_embedding_dimension()
-    vstore = VectorMemoryStore(dimension=cfg.store.dimension, n_neighbors=cfg.store.n_neighbors)
-    # Load current spans
-    loader = TraceLoader(trace_path)
-    records = loader.load_spans()
-    # Compute embeddings and add them to the vector store.  In many
-    # situations you may want to add current spans after analysis to
-    # avoid biasing retrieval with the spans themselves; this example
-    # inserts them immediately for simplicity.
-    embeddings = embed_messages(model, records)
-    vstore.add(embeddings, [rec.__dict__ for rec in records])
-    # Retrieve similar contexts.  We query the store with each current
-    # embedding and aggregate unique metadata entries.  In a real
-    # deployment you might maintain a persistent store across incidents
-    # and implement more sophisticated aggregation (e.g. deduplication
-    # based on trace ID).
-    retrieved: List[Dict[str, Any]] = []
-    for emb in embeddings:
-        neighbours = vstore.query(emb, k=cfg.model.top_k)
-        for meta, _dist in neighbours:
-            if meta not in retrieved:
-                retrieved.append(meta)
-    # Perform reasoning using the language model
-    reasoner = LLMReasoner(cfg.model)
-    result = reasoner.generate_root_cause(
-        current_spans=[rec.__dict__ for rec in records],
-        retrieved_contexts=retrieved,
-    )
-    return result
+    return get_engine().analyze(trace_path)
 
 
 def _cli() -> None:
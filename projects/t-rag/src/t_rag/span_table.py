@@ -0,0 +1,379 @@
+"""
+span_table.py
+=============
+
+Columnar (struct‑of‑arrays) storage for span records.
+
+Keeping one :class:`t_rag.trace_loader.SpanRecord` plus a metadata
+dictionary per stored span costs well over a kilobyte per span, most
+of it repeated strings and per‑object overhead.  :class:`SpanTable`
+stores the same information column by column instead:
+
+* trace, span and parent ids, service names, operations and messages
+  are interned in a shared :class:`StringPool` and stored as ``int32``
+  codes;
+* statuses are interned in their own small pool and stored as
+  ``int16`` codes;
+* start and end timestamps are ``int64`` arrays (integral epoch
+  values; anything else, such as ISO‑8601 strings, is kept aside
+  verbatim);
+* attributes are stored in compressed sparse row form, with keys
+  interned in a dictionary shared by all rows;
+* resource attribute dictionaries, which the loader shares between all
+  spans of a resource, are stored once and referenced by an ``int32``
+  code.
+
+Rows are identified by their integer position.  Record and dictionary
+views of a row are built on demand by :meth:`SpanTable.record` and
+:meth:`SpanTable.to_dict`, so callers such as
+:class:`t_rag.vector_memory.VectorMemoryStore` can keep row ids rather
+than copies of the metadata.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from .trace_loader import SpanRecord
+
+# Stored in the time columns when a timestamp is missing or not an integer
+_NO_TIME = np.iinfo(np.int64).min
+
+
+class StringPool:
+    """Bidirectional mapping between strings and dense integer codes.
+
+    ``None`` is represented by the code ``-1`` and never stored.
+    """
+
+    def __init__(self) -> None:
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, code: int) -> str | None:
+        return None if code < 0 else self._values[code]
+
+    def intern(self, value: Any) -> int:
+        """Return the code of ``value``, adding it to the pool if new."""
+        if value is None:
+            return -1
+        value = str(value)
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._values)
+            self._values.append(value)
+        return code
+
+    def code(self, value: Any) -> int | None:
+        """Return the code of ``value`` without adding it, or ``None``."""
+        if value is None:
+            return -1
+        return self._codes.get(str(value))
+
+    def retain(self, codes: np.ndarray) -> np.ndarray:
+        """Drop every string whose code is not in ``codes``.
+
+        Surviving strings are renumbered densely in their original
+        order.
+
+        Args:
+            codes: Codes to keep; negative entries are ignored.
+
+        Returns:
+            An ``int32`` array mapping every old code to its new code,
+            or ``-1`` for dropped strings.
+        """
+        kept = np.unique(codes[codes >= 0])
+        mapping = np.full(len(self._values), -1, dtype=np.int32)
+        mapping[kept] = np.arange(kept.shape[0], dtype=np.int32)
+        self._values = [self._values[code] for code in kept.tolist()]
+        self._codes = {value: code for code, value in enumerate(self._values)}
+        return mapping
+
+
+def _as_time(value: Any) -> int | None:
+    """Return ``value`` as an integer timestamp if it is one."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+def _remap(codes: np.ndarray, mapping: np.ndarray) -> None:
+    """Translate non‑negative ``codes`` in place through ``mapping``."""
+    valid = codes >= 0
+    codes[valid] = mapping[codes[valid]]
+
+
+class SpanTable:
+    """Append‑only struct‑of‑arrays table of spans."""
+
+    def __init__(self, initial_capacity: int = 1024) -> None:
+        """Create an empty table.
+
+        Args:
+            initial_capacity: Number of rows preallocated per column.
+                Columns double in size when full.
+        """
+        capacity = max(1, initial_capacity)
+        #: Pool shared by ids, service names, operations and messages
+        self.strings = StringPool()
+        #: Pool of status strings
+        self.statuses = StringPool()
+        #: Pool of attribute keys shared by all rows
+        self.attribute_keys = StringPool()
+        self._size = 0
+        self._trace = np.empty(capacity, dtype=np.int32)
+        self._span = np.empty(capacity, dtype=np.int32)
+        self._parent = np.empty(capacity, dtype=np.int32)
+        self._service = np.empty(capacity, dtype=np.int32)
+        self._operation = np.empty(capacity, dtype=np.int32)
+        self._message = np.empty(capacity, dtype=np.int32)
+        self._status = np.empty(capacity, dtype=np.int16)
+        self._start = np.empty(capacity, dtype=np.int64)
+        self._end = np.empty(capacity, dtype=np.int64)
+        # Attributes of row ``i`` are entries
+        # ``_attr_offsets[i]:_attr_offsets[i + 1]`` of the key and value columns.
+        self._attr_offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._attr_keys = np.empty(capacity, dtype=np.int32)
+        self._attr_values: List[Any] = []
+        # Distinct resource attribute dictionaries, deduplicated by identity
+        self._resource = np.empty(capacity, dtype=np.int32)
+        self._resources: List[Dict[str, Any]] = []
+        self._resource_codes: Dict[int, int] = {}
+        # Non‑integral timestamps keyed by (row, column), column 0 = start
+        self._raw_times: Dict[Tuple[int, int], Any] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[SpanRecord]) -> "SpanTable":
+        """Build a table from an iterable of records."""
+        table = cls()
+        table.extend(records)
+        return table
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, row: int) -> SpanRecord:
+        return self.record(row)
+
+    def __iter__(self) -> Iterator[SpanRecord]:
+        for row in range(self._size):
+            yield self.record(row)
+
+    @property
+    def capacity(self) -> int:
+        """Number of rows the table can hold before reallocating."""
+        return self._trace.shape[0]
+
+    @property
+    def trace_codes(self) -> np.ndarray:
+        """Interned trace id codes per row (see :attr:`strings`)."""
+        return self._trace[: self._size]
+
+    @property
+    def service_codes(self) -> np.ndarray:
+        """Interned service name codes per row (see :attr:`strings`)."""
+        return self._service[: self._size]
+
+    @property
+    def status_codes(self) -> np.ndarray:
+        """Interned status codes per row (see :attr:`statuses`)."""
+        return self._status[: self._size]
+
+    @property
+    def start_times(self) -> np.ndarray:
+        """Integer start timestamps; missing values hold ``int64`` minimum."""
+        return self._start[: self._size]
+
+    @property
+    def end_times(self) -> np.ndarray:
+        """Integer end timestamps; missing values hold ``int64`` minimum."""
+        return self._end[: self._size]
+
+    def extend(self, records: Iterable[SpanRecord]) -> np.ndarray:
+        """Append records to the table.
+
+        Args:
+            records: Span records to append.
+
+        Returns:
+            The row ids assigned to the records, in order.
+        """
+        first = self._size
+        for record in records:
+            self.append(record)
+        return np.arange(first, self._size, dtype=np.int64)
+
+    def append(self, record: SpanRecord) -> int:
+        """Append a single record and return its row id."""
+        row = self._size
+        self._reserve(row + 1)
+        strings = self.strings
+        self._trace[row] = strings.intern(record.trace_id)
+        self._span[row] = strings.intern(record.span_id)
+        self._parent[row] = strings.intern(record.parent_id)
+        self._service[row] = strings.intern(record.service_name)
+        self._operation[row] = strings.intern(record.operation)
+        self._message[row] = strings.intern(record.message)
+        status = self.statuses.intern(record.status)
+        if status > np.iinfo(self._status.dtype).max:
+            self._status = self._status.astype(np.int32)
+        self._status[row] = status
+        for column, (array, value) in enumerate(((self._start, record.start_time), (self._end, record.end_time))):
+            as_int = _as_time(value)
+            if as_int is None:
+                array[row] = _NO_TIME
+                if value is not None:
+                    self._raw_times[(row, column)] = value
+            else:
+                array[row] = as_int
+        attributes = record.attributes or {}
+        offset = int(self._attr_offsets[row])
+        self._reserve_attributes(offset + len(attributes))
+        for i, (key, value) in enumerate(attributes.items()):
+            self._attr_keys[offset + i] = self.attribute_keys.intern(key)
+            self._attr_values.append(value)
+        self._attr_offsets[row + 1] = offset + len(attributes)
+        self._resource[row] = self._intern_resource(record.resource_attributes)
+        self._size = row + 1
+        return row
+
+    def _intern_resource(self, resource: Dict[str, Any] | None) -> int:
+        if not resource:
+            return -1
+        # The table keeps a reference to every interned dictionary, so
+        # its id cannot be reused by another object.
+        code = self._resource_codes.get(id(resource))
+        if code is None:
+            code = self._resource_codes[id(resource)] = len(self._resources)
+            self._resources.append(resource)
+        return code
+
+    def _reserve(self, required: int) -> None:
+        """Grow the per‑row columns geometrically to hold ``required`` rows."""
+        capacity = self.capacity
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        for name in ("_trace", "_span", "_parent", "_service", "_operation", "_message", "_status", "_start", "_end", "_resource"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[: self._size] = old[: self._size]
+            setattr(self, name, new)
+        offsets = np.zeros(capacity + 1, dtype=np.int64)
+        offsets[: self._size + 1] = self._attr_offsets[: self._size + 1]
+        self._attr_offsets = offsets
+
+    def _reserve_attributes(self, required: int) -> None:
+        capacity = self._attr_keys.shape[0]
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        keys = np.empty(capacity, dtype=np.int32)
+        used = int(self._attr_offsets[self._size])
+        keys[:used] = self._attr_keys[:used]
+        self._attr_keys = keys
+
+    def compact(self, rows: np.ndarray) -> None:
+        """Keep only ``rows`` (ascending row ids), renumbering them from 0.
+
+        Strings and resource dictionaries referenced only by dropped
+        rows are released, so a table whose rows are continually
+        replaced does not grow without bound.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        count = rows.shape[0]
+        new_rows = np.full(self._size, -1, dtype=np.int64)
+        new_rows[rows] = np.arange(count)
+        columns = ("_trace", "_span", "_parent", "_service", "_operation", "_message")
+        for name in columns + ("_status", "_start", "_end", "_resource"):
+            array = getattr(self, name)
+            array[:count] = array[rows]
+        mapping = self.strings.retain(np.concatenate([getattr(self, name)[:count] for name in columns]))
+        for name in columns:
+            _remap(getattr(self, name)[:count], mapping)
+        # Attribute entries of the kept rows, in row order
+        starts = self._attr_offsets[rows]
+        lengths = self._attr_offsets[rows + 1] - starts
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        entries = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        self._attr_keys[: entries.shape[0]] = self._attr_keys[entries]
+        self._attr_values = [self._attr_values[entry] for entry in entries.tolist()]
+        self._attr_offsets[: count + 1] = offsets
+        resources = self._resource[:count]
+        used = np.unique(resources[resources >= 0])
+        resource_map = np.full(len(self._resources), -1, dtype=np.int32)
+        resource_map[used] = np.arange(used.shape[0], dtype=np.int32)
+        _remap(resources, resource_map)
+        self._resources = [self._resources[code] for code in used.tolist()]
+        self._resource_codes = {id(resource): code for code, resource in enumerate(self._resources)}
+        self._raw_times = {
+            (int(new_rows[row]), column): value
+            for (row, column), value in self._raw_times.items()
+            if new_rows[row] >= 0
+        }
+        self._size = count
+
+    def _time(self, row: int, column: int) -> Any:
+        value = (self._start if column == 0 else self._end)[row]
+        if value == _NO_TIME:
+            return self._raw_times.get((row, column))
+        return int(value)
+
+    def attributes(self, row: int) -> Dict[str, Any]:
+        """Return the attributes of ``row`` as a new dictionary."""
+        start, end = int(self._attr_offsets[row]), int(self._attr_offsets[row + 1])
+        keys = self.attribute_keys
+        return {keys[int(code)]: value for code, value in zip(self._attr_keys[start:end], self._attr_values[start:end])}
+
+    def _check_row(self, row: int) -> int:
+        row = int(row)
+        if row < 0:
+            row += self._size
+        if row < 0 or row >= self._size:
+            raise IndexError("span table row out of range")
+        return row
+
+    def record(self, row: int) -> SpanRecord:
+        """Materialise ``row`` as a :class:`SpanRecord`."""
+        return SpanRecord(**self.to_dict(row))
+
+    def to_dict(self, row: int) -> Dict[str, Any]:
+        """Materialise ``row`` as a dictionary with :class:`SpanRecord` fields."""
+        row = self._check_row(row)
+        strings = self.strings
+        return {
+            "trace_id": strings[int(self._trace[row])],
+            "span_id": strings[int(self._span[row])],
+            "parent_id": strings[int(self._parent[row])],
+            "service_name": strings[int(self._service[row])],
+            "operation": strings[int(self._operation[row])],
+            "start_time": self._time(row, 0),
+            "end_time": self._time(row, 1),
+            "attributes": self.attributes(row),
+            "status": self.statuses[int(self._status[row])],
+            "message": strings[int(self._message[row])],
+            "resource_attributes": self.resource_attributes(row),
+        }
+
+    def resource_attributes(self, row: int) -> Dict[str, Any]:
+        """Return the (shared, read‑only) resource attributes of ``row``."""
+        code = int(self._resource[row])
+        return {} if code < 0 else self._resources[code]
+
+    def trace_id(self, row: int) -> str | None:
+        """Return the trace id of ``row`` without materialising the row."""
+        return self.strings[int(self._trace[self._check_row(row)])]
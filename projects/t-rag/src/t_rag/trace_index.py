@@ -0,0 +1,271 @@
+"""
+trace_index.py
+==============
+
+Trace‑level index for coarse‑to‑fine retrieval.
+
+Span‑level search compares every current span with every historical
+span, although the reasoner ultimately consumes whole historical
+traces (see :mod:`t_rag.retrieval`).  :class:`TraceIndex` keeps one
+embedding per historical trace, pooled from its span embeddings, so a
+query can first select the few most similar traces from a matrix that
+is smaller by the average trace length and then search spans only
+within those traces.  Span‑level results are still returned, so the
+reasoner keeps span context.
+
+Two pooling strategies are available:
+
+``"mean"``
+    The normalised mean of the span embeddings, maintained
+    incrementally from running sums.
+``"attention"``
+    A softmax‑weighted mean in which spans unlike the rest of their
+    trace (``1 - cos(span, mean)``, divided by a temperature) get more
+    weight, so a single failing span is not drowned out by hundreds of
+    routine ones.  It is recomputed from the span embeddings of a
+    trace whenever the trace changes.
+
+Pooled embeddings are refreshed lazily, on the first search after the
+traces they summarise gained or lost spans.  Rows without a trace id
+are not part of any trace and cannot be reached through the index.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .ann_index import exact_search
+from .metadata_index import _Postings, _union
+
+#: Supported values of ``StoreConfig.trace_pooling``
+TRACE_POOLINGS = ("mean", "attention")
+
+
+class TraceIndex:
+    """Pooled per‑trace embeddings plus the store rows of each trace."""
+
+    def __init__(self, dimension: int, pooling: str = "mean", temperature: float = 0.05) -> None:
+        """Create an empty index.
+
+        Args:
+            dimension: Dimensionality of the span embeddings.
+            pooling: ``"mean"`` or ``"attention"`` (see the module
+                documentation).
+            temperature: Softmax temperature of attention pooling.
+                Smaller values concentrate the weight on the most
+                atypical spans.
+        """
+        if pooling not in TRACE_POOLINGS:
+            raise ValueError(f"unknown trace pooling {pooling!r}; expected one of {list(TRACE_POOLINGS)}")
+        if temperature <= 0:
+            raise ValueError("temperature must be positive")
+        self.dimension = dimension
+        self.pooling = pooling
+        self.temperature = temperature
+        self._slots: Dict[int, int] = {}
+        self._keys = np.empty(64, dtype=np.int64)
+        self._sums = np.zeros((64, dimension), dtype=np.float32)
+        self._pooled = np.zeros((64, dimension), dtype=np.float32)
+        self._dirty = np.zeros(64, dtype=bool)
+        # Number of live rows per trace; traces without any are not searched
+        self._counts = np.zeros(64, dtype=np.int64)
+        self._postings: List[_Postings] = []
+        # Trace slot of every indexed store row, -1 for rows without a trace
+        self._row_slots = np.empty(1024, dtype=np.int32)
+        self._rows = 0
+
+    def __len__(self) -> int:
+        """Number of store rows indexed so far."""
+        return self._rows
+
+    @property
+    def n_traces(self) -> int:
+        """Number of distinct traces in the index."""
+        return len(self._postings)
+
+    def add(self, trace_keys: np.ndarray, embeddings: np.ndarray) -> None:
+        """Index the next ``len(trace_keys)`` store rows.
+
+        Args:
+            trace_keys: Trace key of each row (see
+                :func:`t_rag.persistence.trace_key`); ``0`` marks rows
+                without a trace id.
+            embeddings: ``float32`` embeddings of the rows.
+        """
+        first = self._rows
+        count = len(trace_keys)
+        if count == 0:
+            return
+        keys, inverse = np.unique(np.asarray(trace_keys, dtype=np.int64), return_inverse=True)
+        slots = np.array([self._slot(int(key)) for key in keys], dtype=np.int32)
+        row_slots = slots[inverse]
+        self._reserve_rows(first + count)
+        self._row_slots[first : first + count] = row_slots
+        self._rows = first + count
+        traced = row_slots >= 0
+        if not np.any(traced):
+            return
+        np.add.at(self._sums, row_slots[traced], np.asarray(embeddings, dtype=np.float32)[traced])
+        np.add.at(self._counts, row_slots[traced], 1)
+        # Rows of each trace in ascending order: sort the batch by slot
+        rows = np.flatnonzero(traced)
+        order = np.argsort(row_slots[rows], kind="stable")
+        rows, batch_slots = rows[order] + first, row_slots[rows[order]]
+        heads = np.flatnonzero(np.r_[True, batch_slots[1:] != batch_slots[:-1]])
+        for start, stop in zip(heads, np.r_[heads[1:], rows.shape[0]]):
+            self._postings[batch_slots[start]].extend(rows[start:stop])
+        self._dirty[np.unique(batch_slots)] = True
+
+    def remove(self, rows: np.ndarray, vectors: Callable[[np.ndarray], np.ndarray]) -> None:
+        """Take indexed store ``rows`` out of their traces.
+
+        Args:
+            rows: Store rows that were evicted; rows not indexed yet
+                are ignored.
+            vectors: Row embedding accessor (see :meth:`pooled`).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[rows < self._rows]
+        rows = rows[self._row_slots[rows] >= 0]
+        if not rows.size:
+            return
+        slots = self._row_slots[rows]
+        np.subtract.at(self._sums, slots, np.asarray(vectors(rows), dtype=np.float32))
+        np.subtract.at(self._counts, slots, 1)
+        self._row_slots[rows] = -1
+        self._dirty[np.unique(slots)] = True
+
+    def _slot(self, key: int) -> int:
+        """Return the slot of trace ``key``, creating it if new."""
+        if key == 0:
+            return -1
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = len(self._postings)
+            if slot == self._keys.shape[0]:
+                self._grow_traces(2 * slot)
+            self._keys[slot] = key
+            self._postings.append(_Postings())
+        return slot
+
+    def _grow_traces(self, capacity: int) -> None:
+        used = self.n_traces
+        keys = np.empty(capacity, dtype=np.int64)
+        keys[:used] = self._keys[:used]
+        self._keys = keys
+        for name in ("_sums", "_pooled"):
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:used] = getattr(self, name)[:used]
+            setattr(self, name, grown)
+        for name in ("_dirty", "_counts"):
+            old = getattr(self, name)
+            grown = np.zeros(capacity, dtype=old.dtype)
+            grown[:used] = old[:used]
+            setattr(self, name, grown)
+
+    def _reserve_rows(self, required: int) -> None:
+        capacity = self._row_slots.shape[0]
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        row_slots = np.empty(capacity, dtype=np.int32)
+        row_slots[: self._rows] = self._row_slots[: self._rows]
+        self._row_slots = row_slots
+
+    def pooled(self, vectors: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """Return the pooled embeddings of all traces, refreshing stale ones.
+
+        Args:
+            vectors: Function returning the ``float32`` embeddings of
+                an array of store rows; only used by attention pooling.
+
+        Returns:
+            A unit‑normalised matrix of shape ``(n_traces, dimension)``
+            whose row ``i`` summarises the trace in slot ``i``.
+        """
+        traces = self.n_traces
+        stale = np.flatnonzero(self._dirty[:traces])
+        if stale.size:
+            means = self._sums[stale]
+            means /= np.maximum(np.linalg.norm(means, axis=1, keepdims=True), 1e-12)
+            if self.pooling == "attention":
+                for offset, slot in enumerate(stale):
+                    rows = self._live_rows(slot)
+                    if rows.size:
+                        means[offset] = self._attend(vectors(rows), means[offset])
+            self._pooled[stale] = means
+            self._dirty[stale] = False
+        return self._pooled[:traces]
+
+    def _live_rows(self, slot: int) -> np.ndarray:
+        rows = self._postings[slot].view()
+        return rows[self._row_slots[rows] == slot]
+
+    def _attend(self, spans: np.ndarray, mean: np.ndarray) -> np.ndarray:
+        """Attention pooling of one trace's span embeddings."""
+        logits = (1.0 - spans @ mean) / self.temperature
+        weights = np.exp(logits - logits.max())
+        pooled = (weights / weights.sum()) @ spans
+        return pooled / max(float(np.linalg.norm(pooled)), 1e-12)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        n_traces: int,
+        vectors: Callable[[np.ndarray], np.ndarray],
+        exclude_keys: Iterable[int] | None = None,
+        within_rows: np.ndarray | None = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the most similar traces for each query.
+
+        Args:
+            queries: Query embeddings of shape ``(n_queries, dimension)``.
+            n_traces: Number of traces per query.
+            vectors: Row embedding accessor (see :meth:`pooled`).
+            exclude_keys: Optional trace keys that must not be returned.
+            within_rows: Optional store rows; only traces owning at
+                least one of them are eligible.
+
+        Returns:
+            A tuple ``(slots, distances)`` as returned by
+            :func:`t_rag.ann_index.exact_search`.
+        """
+        pooled = self.pooled(vectors)
+        mask = self._counts[: self.n_traces] > 0
+        if within_rows is not None:
+            owners = np.zeros(self.n_traces, dtype=bool)
+            slots = self._row_slots[within_rows]
+            owners[slots[slots >= 0]] = True
+            mask &= owners
+        if exclude_keys is not None:
+            excluded = np.fromiter(exclude_keys, dtype=np.int64)
+            if excluded.size:
+                mask &= ~np.isin(self._keys[: self.n_traces], excluded)
+        return exact_search(pooled, queries, n_traces, mask=mask)
+
+    def rows(self, slots: np.ndarray) -> np.ndarray:
+        """Return the sorted live store rows of the traces in ``slots``."""
+        rows = _union(self._postings[int(slot)].view() for slot in np.unique(slots) if slot >= 0)
+        return rows[self._row_slots[rows] >= 0]
+
+    def candidates(
+        self,
+        queries: np.ndarray,
+        n_traces: int,
+        vectors: Callable[[np.ndarray], np.ndarray],
+        exclude_keys: Iterable[int] | None = None,
+        within_rows: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Return the store rows of the union of each query's top traces.
+
+        Arguments are those of :meth:`search`.  The result is a sorted
+        ``int64`` array of row ids, restricted to ``within_rows`` when
+        given.
+        """
+        slots, _ = self.search(queries, n_traces, vectors, exclude_keys, within_rows)
+        rows = self.rows(slots.ravel())
+        if within_rows is not None:
+            rows = np.intersect1d(rows, within_rows, assume_unique=True)
+        return rows
@@ -13,16 +13,50 @@ OpenTelemetry JSON exports.  A single trace file typically contains
 a list of spans or a nested structure (resourceSpans/scopeSpans) that
 can be flattened.  See ``examples/sample_trace.json`` for an example.
 
+Large exports can be read in streaming mode (``streaming=True``), in
+which case spans are parsed incrementally with
+:mod:`t_rag.json_stream` and yielded one at a time by
+:meth:`TraceLoader.iter_spans`, keeping memory bounded regardless of
+file size.  Directories of per‑pod trace files can be ingested
+concurrently by passing ``workers > 1``; files are then parsed and
+converted to records in a process pool and merged back in sorted file
+order, so the output is identical to a serial load.  Workers send their
+records back in chunks through small bounded queues, so memory stays
+bounded by a few chunks per worker rather than by file size.  The
+loader (including any subclass state) is pickled to the workers;
+loaders that cannot be pickled, such as locally defined subclasses,
+are read serially.
+
 If you wish to ingest spans from other sources (e.g. directly from a
 Jaeger or Tempo backend), you can extend :class:`TraceLoader` and
-override the :meth:`load_raw` method.
+override the :meth:`load_raw` method.  Such subclasses are always
+read serially through that method, since the process pool parses files
+by itself.
 """
 from __future__ import annotations
 
+import copy
 import json
-from dataclasses import dataclass
+import multiprocessing
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Iterable, Any
+from typing import Dict, List, Iterable, Iterator, Any, Tuple
+
+from .json_stream import iter_otlp_spans
+
+#: Key under which flattened OTLP spans carry the attributes of their
+#: ``resource`` block, resolved to a flat dictionary.  All spans of one
+#: ``resourceSpans`` entry share the same dictionary object.
+RESOURCE_ATTRIBUTES_KEY = "_resource_attributes"
+
+# Records per chunk sent back by a worker process, and chunks a worker
+# may queue ahead of the consumer
+_WORKER_CHUNK_SPANS = 1024
+_WORKER_QUEUE_CHUNKS = 2
 
 
 @dataclass
@@ -40,6 +74,9 @@ class SpanRecord:
         attributes: Dictionary of span attributes.
         status: Status of the span (e.g. "OK", "ERROR").
         message: Human‑readable string summarizing the span contents.
+        resource_attributes: Attributes of the OTLP resource that
+            emitted the span.  Spans of the same resource share one
+            dictionary, which must therefore be treated as read‑only.
     """
 
     trace_id: str
@@ -52,12 +89,30 @@ class SpanRecord:
     attributes: Dict[str, Any]
     status: str
     message: str
+    resource_attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def to_metadata(self) -> Dict[str, Any]:
+        """Return the fields of the record that are persisted as row metadata.
+
+        ``resource_attributes`` is left out: it is shared by every span
+        of a resource and would otherwise be written out once per span.
+        The service name it may carry is already in ``service_name``.
+        """
+        metadata = dict(self.__dict__)
+        del metadata["resource_attributes"]
+        return metadata
 
 
 class TraceLoader:
     """Loads and processes trace data into :class:`SpanRecord` objects."""
 
-    def __init__(self, source: str | Path) -> None:
+    def __init__(
+        self,
+        source: str | Path,
+        streaming: bool = False,
+        workers: int = 1,
+        files_per_task: int = 1,
+    ) -> None:
         """Initialize the loader.
 
         Args:
@@ -66,8 +121,26 @@ class TraceLoader:
                 should contain a list of spans in OpenTelemetry JSON
                 format.  See ``examples/sample_trace.json`` for an
                 example schema.
+            streaming: If ``True``, files are parsed incrementally
+                rather than with ``json.load``, so that only one span
+                is decoded at a time.
+            workers: Number of worker processes used when ``source`` is
+                a directory.  ``1`` (the default) loads files serially
+                in the current process; ``0`` uses one worker per CPU.
+                Ignored by subclasses that override :meth:`load_raw`
+                and by loaders that cannot be pickled.
+            files_per_task: Number of files handed to a worker process
+                per task.  Larger values reduce inter‑process overhead
+                for directories with many small files.
         """
+        if workers < 0:
+            raise ValueError("workers must be non-negative")
+        if files_per_task < 1:
+            raise ValueError("files_per_task must be positive")
         self.source = Path(source)
+        self.streaming = streaming
+        self.workers = workers or os.cpu_count() or 1
+        self.files_per_task = files_per_task
 
     def load_spans(self) -> List[SpanRecord]:
         """Load spans from the configured source.
@@ -77,17 +150,47 @@ class TraceLoader:
             successfully parsed spans.  Invalid spans are skipped with
             a warning.
         """
-        raw_spans: Iterable[Dict[str, Any]] = self.load_raw()
-        records: List[SpanRecord] = []
-        for span in raw_spans:
+        return list(self.iter_spans())
+
+    def iter_spans(self) -> Iterator[SpanRecord]:
+        """Lazily yield :class:`SpanRecord` objects from the source.
+
+        Combined with ``streaming=True`` this keeps memory bounded by a
+        single span rather than the size of the input.  Invalid spans
+        are skipped with a warning.
+        """
+        if self.workers > 1 and self.source.is_dir() and self._parallel_worker() is not None:
+            yield from self._iter_spans_parallel()
+            return
+        for span in self.load_raw():
             try:
                 record = self._span_to_record(span)
-                records.append(record)
             except Exception as exc:
                 # Skip spans that cannot be parsed and log a warning
                 print(f"Warning: failed to parse span {span}: {exc}")
                 continue
-        return records
+            yield record
+
+    def iter_chunks(self, chunk_size: int) -> Iterator[List[SpanRecord]]:
+        """Yield span records in lists of at most ``chunk_size`` items.
+
+        Args:
+            chunk_size: Maximum number of records per chunk.
+
+        Yields:
+            Non‑empty lists of :class:`SpanRecord` objects in source
+            order.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        chunk: List[SpanRecord] = []
+        for record in self.iter_spans():
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
     def load_raw(self) -> Iterable[Dict[str, Any]]:
         """Load raw span dictionaries from the source.
@@ -98,14 +201,73 @@ class TraceLoader:
         Returns:
             An iterable of raw span dictionaries.
         """
+        for file_path in self._source_files():
+            yield from self._load_file(file_path)
+
+    def _source_files(self) -> List[Path]:
+        """Return the trace files to read, in a deterministic order."""
         if self.source.is_dir():
-            for file_path in self.source.glob("*.json"):
-                yield from self._load_file(file_path)
-        else:
-            yield from self._load_file(self.source)
+            return sorted(self.source.glob("*.json"))
+        return [self.source]
+
+    def _parallel_worker(self) -> "TraceLoader | None":
+        """Return the serial copy of this loader sent to worker processes.
+
+        ``None`` if files cannot be parsed in workers: the subclass reads
+        spans through its own :meth:`load_raw`, or cannot be pickled.
+        """
+        if type(self).load_raw is not TraceLoader.load_raw:
+            return None
+        worker = copy.copy(self)
+        worker.workers = 1
+        try:
+            pickle.dumps(worker)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return None
+        return worker
+
+    def _iter_spans_parallel(self) -> Iterator[SpanRecord]:
+        """Parse the files of a directory source in a process pool.
+
+        Each task covers ``files_per_task`` files and streams their
+        records back in chunks through its own bounded queue.  At most
+        one task per worker is in flight and queues are drained in
+        sorted file order, so the output matches the serial path and
+        at most ``_WORKER_QUEUE_CHUNKS`` chunks per worker are buffered.
+        """
+        worker = self._parallel_worker()
+        files = self._source_files()
+        groups = iter([files[i : i + self.files_per_task] for i in range(0, len(files), self.files_per_task)])
+        max_workers = max(1, min(self.workers, -(-len(files) // self.files_per_task)))
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=max_workers) as pool:
+            pending: deque = deque()
+
+            def submit() -> None:
+                group = next(groups, None)
+                if group is not None:
+                    queue = manager.Queue(maxsize=_WORKER_QUEUE_CHUNKS)
+                    pending.append((queue, pool.submit(_stream_file_records, worker, group, queue)))
+
+            for _ in range(max_workers):
+                submit()
+            try:
+                while pending:
+                    queue, future = pending[0]
+                    while (chunk := queue.get()) is not None:
+                        yield from chunk
+                    pending.popleft()
+                    future.result()
+                    submit()
+            finally:
+                # Unblock workers still writing if the consumer stopped early
+                for queue, _ in pending:
+                    while queue.get() is not None:
+                        pass
 
     def _load_file(self, file_path: Path) -> Iterable[Dict[str, Any]]:
         """Load spans from a single JSON file."""
+        if self.streaming:
+            return self._stream_file(file_path)
         with file_path.open("r", encoding="utf-8") as f:
             data = json.load(f)
             if isinstance(data, list):
@@ -115,6 +277,21 @@ class TraceLoader:
             # resource spans and scope spans; we flatten them here.
             return self._extract_spans_from_otlp(data)
 
+    def _stream_file(self, file_path: Path) -> Iterator[Dict[str, Any]]:
+        """Incrementally yield spans from a single JSON file."""
+        with file_path.open("r", encoding="utf-8") as f:
+            raw: Dict[str, Any] | None = None
+            resource_attributes: Dict[str, Any] = {}
+            for resource, span in iter_otlp_spans(f):
+                if resource is None:
+                    yield span
+                    continue
+                if resource is not raw:
+                    raw = resource
+                    resource_attributes = flatten_attributes(resource.get("attributes", []))
+                span[RESOURCE_ATTRIBUTES_KEY] = resource_attributes
+                yield span
+
     def _extract_spans_from_otlp(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Extract spans from the OTLP collector format.
 
@@ -135,8 +312,10 @@ class TraceLoader:
             }
 
         This helper walks through the nested fields and returns a flat
-        list of spans.  If no spans are found, an empty list is
-        returned.
+        list of spans.  The attributes of each ``resource`` are
+        flattened once and attached to all of its spans by reference
+        under :data:`RESOURCE_ATTRIBUTES_KEY`.  If no
+        spans are found, an empty list is returned.
 
         Args:
             data: The parsed JSON object from the trace file.
@@ -148,9 +327,12 @@ class TraceLoader:
         spans: List[Dict[str, Any]] = []
         resource_spans = data.get("resourceSpans", [])
         for res in resource_spans:
+            resource_attributes = flatten_attributes((res.get("resource") or {}).get("attributes", []))
             scope_spans = res.get("scopeSpans", [])
             for scope in scope_spans:
-                spans.extend(scope.get("spans", []))
+                for span in scope.get("spans", []):
+                    span[RESOURCE_ATTRIBUTES_KEY] = resource_attributes
+                    spans.append(span)
         return spans
 
     def _span_to_record(self, span: Dict[str, Any]) -> SpanRecord:
@@ -167,11 +349,12 @@ class TraceLoader:
         trace_id = span.get("traceId") or span.get("trace_id")
         span_id = span.get("spanId") or span.get("span_id")
         parent_id = span.get("parentSpanId") or span.get("parent_id")
-        service_name = self._get_service_name(span)
+        attributes = self._get_attributes(span)
+        resource_attributes = self._get_resource_attributes(span)
+        service_name = self._get_service_name(span, attributes, resource_attributes)
         operation = span.get("name") or span.get("operationName")
         start_time = span.get("startTimeUnixNano") or span.get("startTime")
         end_time = span.get("endTimeUnixNano") or span.get("endTime")
-        attributes = self._get_attributes(span)
         status = self._get_status(span)
         # Compose a succinct human‑readable summary of the span
         message = self._build_message(service_name, operation, attributes, status)
@@ -186,40 +369,47 @@ class TraceLoader:
             attributes=attributes,
             status=status,
             message=message,
+            resource_attributes=resource_attributes,
         )
 
-    def _get_service_name(self, span: Dict[str, Any]) -> str:
-        """Extract the service name from span attributes or resource."""
+    def _get_service_name(
+        self,
+        span: Dict[str, Any],
+        attributes: Dict[str, Any] | None = None,
+        resource_attributes: Dict[str, Any] | None = None,
+    ) -> str:
+        """Extract the service name from span attributes or resource.
+
+        Already flattened ``attributes`` and ``resource_attributes``
+        may be passed to avoid resolving them again.
+        """
+        if attributes is None:
+            attributes = self._get_attributes(span)
         # Check attributes first
-        for attribute in span.get("attributes", []):
-            key = attribute.get("key") or attribute.get("name")
-            if key == "service.name":
-                value = attribute.get("value")
-                if isinstance(value, dict):
-                    return value.get("stringValue") or value.get("value") or "unknown_service"
-                return value or "unknown_service"
-        # Fall back to resource field if present
-        resource = span.get("resource") or {}
-        for attribute in resource.get("attributes", []):
-            key = attribute.get("key") or attribute.get("name")
-            if key == "service.name":
-                value = attribute.get("value")
-                if isinstance(value, dict):
-                    return value.get("stringValue") or value.get("value") or "unknown_service"
-                return value or "unknown_service"
-        return "unknown_service"
+        if attributes.get("service.name"):
+            return attributes["service.name"]
+        # Fall back to the resource the span was emitted by
+        if resource_attributes is None:
+            resource_attributes = self._get_resource_attributes(span)
+        return resource_attributes.get("service.name") or "unknown_service"
 
     def _get_attributes(self, span: Dict[str, Any]) -> Dict[str, Any]:
         """Extract attributes from the span into a flat dictionary."""
-        attrs: Dict[str, Any] = {}
-        for attribute in span.get("attributes", []):
-            key = attribute.get("key") or attribute.get("name")
-            value = attribute.get("value")
-            # OTLP attributes wrap values in type containers
-            if isinstance(value, dict):
-                value = next(iter(value.values()))
-            attrs[key] = value
-        return attrs
+        # OTLP attributes wrap values in type containers
+        return flatten_attributes(span.get("attributes", []))
+
+    def _get_resource_attributes(self, span: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the attributes of the resource that emitted ``span``.
+
+        Spans flattened from ``resourceSpans`` carry a dictionary shared
+        by all spans of their resource; a ``resource`` block embedded in
+        an individual span is flattened on the fly.
+        """
+        shared = span.get(RESOURCE_ATTRIBUTES_KEY)
+        if shared is not None:
+            return shared
+        resource = span.get("resource") or {}
+        return flatten_attributes(resource.get("attributes", []))
 
     def _get_status(self, span: Dict[str, Any]) -> str:
         """Derive a simple status string from the span."""
@@ -261,4 +451,36 @@ class TraceLoader:
         for key in interesting_keys:
             if key in attributes:
                 parts.append(f"{key}: {attributes[key]}")
-        return "; ".join(parts)
\ No newline at end of file
+        return "; ".join(parts)
+
+
+def flatten_attributes(attributes: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert an OTLP ``[{"key": ..., "value": {...}}]`` list to a dict.
+
+    OTLP wraps values in type containers such as ``{"stringValue": ...}``;
+    the contained value is unwrapped.  ``name`` is accepted as an alias
+    of ``key``.
+    """
+    flat: Dict[str, Any] = {}
+    for attribute in attributes:
+        key = attribute.get("key") or attribute.get("name")
+        value = attribute.get("value")
+        if isinstance(value, dict):
+            value = next(iter(value.values()), None)
+        flat[key] = value
+    return flat
+
+
+def _stream_file_records(loader: TraceLoader, files: List[Path], queue: Any) -> None:
+    """Worker entry point: put the records of ``files`` on ``queue`` in chunks.
+
+    ``None`` is always put last, also when parsing fails, so the
+    consumer never waits for a task that has ended.
+    """
+    try:
+        for file_path in files:
+            loader.source = file_path
+            for chunk in loader.iter_chunks(_WORKER_CHUNK_SPANS):
+                queue.put(chunk)
+    finally:
+        queue.put(None)
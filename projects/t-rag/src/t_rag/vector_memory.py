@@ -10,95 +10,966 @@ scikit‑learn’s :class:`~sklearn.neighbors.NearestNeighbors`, which is
 adequate for prototyping and small datasets.  For production
 deployments handling millions of vectors you should consider using a
 dedicated vector database such as FAISS, Milvus or Pinecone.
+
+For many simultaneous queries, :meth:`VectorMemoryStore.query_batch`
+bypasses the scikit‑learn index and scores a whole block of queries
+with a single matrix multiplication, relying on the embeddings being
+unit‑normalised (as produced by :func:`t_rag.service.embed_messages`).
+Stores holding millions of vectors can instead delegate search to an
+approximate backend from :mod:`t_rag.ann_index`, selected through
+:class:`t_rag.config.StoreConfig`.
+
+Span records added with :meth:`VectorMemoryStore.add_records` are kept
+in a columnar :class:`t_rag.span_table.SpanTable` owned by the store;
+only their row ids are stored alongside the embeddings and metadata
+dictionaries are built on demand by :meth:`get_metadata`.
+
+Embeddings can be held as ``float16`` or scalar‑quantised ``int8``
+codes instead of ``float32`` (see :mod:`t_rag.quantization`), cutting
+memory by a factor of two or four.  Candidate search then runs on the
+codes, optionally followed by exact rescoring of the top candidates
+against full‑precision vectors.
+
+Queries can be restricted with a :class:`t_rag.metadata_index.SpanFilter`
+(service, status, start‑time range).  Inverted indexes maintained at
+insert time turn the filter into a candidate set before any distance
+is computed, so selective filters make queries cheaper.
+
+With ``trace_candidates`` set, queries run coarse‑to‑fine: a
+:class:`t_rag.trace_index.TraceIndex` of pooled per‑trace embeddings
+selects the most similar historical traces first, and spans are then
+searched only within those traces.
+
+Rows can be deleted explicitly (:meth:`VectorMemoryStore.delete`) or
+evicted by an :class:`t_rag.eviction.EvictionPolicy` bounding the
+number of live rows, their age and per‑service counts.  Removed rows
+become tombstones that searches skip, and :meth:`VectorMemoryStore.compact`
+reclaims their slots once enough have accumulated.
+
+Stores can be persisted with :meth:`VectorMemoryStore.snapshot` and
+reopened with :meth:`VectorMemoryStore.restore`; see
+:mod:`t_rag.persistence` for the on‑disk format.
 """
 from __future__ import annotations
 
+import time
+from pathlib import Path
 from typing import List, Dict, Any, Iterable, Tuple
 
 import numpy as np
 from sklearn.neighbors import NearestNeighbors
 
+from .ann_index import NeighborIndex, create_index, exact_search
+from .config import StoreConfig
+from .eviction import EvictionPolicy, select_victims
+from .metadata_index import MetadataIndex, SpanFilter
+from .persistence import (
+    append_snapshot,
+    metadata_trace_key,
+    open_snapshot,
+    read_manifest,
+    replace_snapshot,
+    trace_key,
+)
+from .quantization import STORAGE_DTYPES, QuantizedMatrix, quantize, rescore
+from .span_table import SpanTable
+from .trace_index import TraceIndex
+from .trace_loader import SpanRecord
+
+
+# Rows quantised per step when restoring a snapshot into compact storage
+_RESTORE_BLOCK_ROWS = 65_536
+
 
 class VectorMemoryStore:
     """A simple vector memory store using scikit‑learn's nearest neighbour index.
 
     Each entry in the store consists of a vector embedding and an
-    associated metadata object.  Embeddings are stored in a NumPy
-    array of shape ``(n_samples, dim)``, and a :class:`~sklearn.neighbors.NearestNeighbors`
-    index is rebuilt when new items are added.  Although this is
-    inefficient for very large datasets, it simplifies the API and
-    allows for rapid prototyping.  For larger or more dynamic
-    workloads, replace this class with an interface to an external
-    vector database.
+    associated metadata object.  Embeddings are kept in a preallocated
+    ``float32`` buffer whose capacity doubles when full, so appending
+    a batch costs amortised time proportional to the batch rather than
+    to the whole store.  The :class:`~sklearn.neighbors.NearestNeighbors`
+    index is not refitted on every write; it is marked stale and
+    rebuilt lazily on the first query after one or more additions,
+    which allows historical incidents to be streamed into memory
+    continuously.  For larger or more dynamic workloads, replace this
+    class with an interface to an external vector database.
     """
 
-    def __init__(self, dimension: int, n_neighbors: int = 5) -> None:
+    #: Number of query rows scored per matrix multiplication in
+    #: :meth:`query_batch`, bounding the size of the similarity block.
+    query_block_size = 1024
+
+    #: Filtered queries with an approximate backend scan the candidate
+    #: rows exactly when there are at most this many of them.
+    filtered_exact_limit = 65_536
+
+    def __init__(
+        self,
+        dimension: int,
+        n_neighbors: int = 5,
+        initial_capacity: int = 1024,
+        ann_index: NeighborIndex | None = None,
+        storage: str = "float32",
+        rescore_factor: int = 0,
+        time_bucket_seconds: float = 3600.0,
+        trace_candidates: int = 0,
+        trace_pooling: str = "mean",
+        eviction: EvictionPolicy | None = None,
+    ) -> None:
+        """Initialise an empty store.
+
+        Args:
+            dimension: Dimensionality of the stored embeddings.
+            n_neighbors: Default number of neighbours per query.
+            initial_capacity: Number of rows preallocated in the
+                embedding buffer.
+            ann_index: Optional approximate nearest‑neighbour backend.
+                When given, both :meth:`query` and :meth:`query_batch`
+                are answered by it instead of by exact search.
+            storage: Embedding storage format, one of ``"float32"``,
+                ``"float16"`` and ``"int8"``.
+            rescore_factor: For compact storage, over‑fetch
+                ``k * rescore_factor`` candidates from the codes and
+                re‑rank them exactly against full‑precision vectors.
+                Those vectors are kept in memory until the next
+                :meth:`snapshot` and memory‑mapped from it afterwards.
+                ``0`` disables rescoring and keeps only the codes.
+            time_bucket_seconds: Width of the start‑time buckets of the
+                metadata index used by filtered queries.
+            trace_candidates: Number of traces selected per query by
+                the trace‑level index before searching spans within
+                them.  ``0`` searches all spans.
+            trace_pooling: Pooling of span embeddings into trace
+                embeddings, ``"mean"`` or ``"attention"``.
+            eviction: Optional limits on the rows kept.  They are
+                enforced after every insert (see :meth:`evict`).
+        """
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"unknown storage dtype {storage!r}; expected one of {list(STORAGE_DTYPES)}")
+        if rescore_factor < 0:
+            raise ValueError("rescore_factor must be non-negative")
+        if trace_candidates < 0:
+            raise ValueError("trace_candidates must be non-negative")
         self.dimension = dimension
         self.n_neighbors = n_neighbors
-        # Internal storage for embeddings and metadata.  We start with
-        # an empty array of the correct dimensionality to simplify
-        # concatenation later on.
-        self._embeddings: np.ndarray = np.empty((0, dimension), dtype=np.float32)
+        self.ann_index = ann_index
+        self.storage = storage
+        self.rescore_factor = rescore_factor
+        self.trace_candidates = trace_candidates
+        self.eviction = eviction or EvictionPolicy()
+        # Internal storage for embeddings and metadata.  Only the first
+        # ``self._size`` rows of the buffer hold valid embeddings.
+        capacity = max(1, initial_capacity)
+        self._buffer: np.ndarray = np.empty((capacity, dimension), dtype=storage)
+        # Per‑row scales of int8 codes
+        self._scales: np.ndarray | None = np.ones(capacity, dtype=np.float32) if storage == "int8" else None
+        # Full‑precision rows used for rescoring compact storage: the
+        # first ``_exact_rows`` come from the snapshot memmap
+        # ``_exact``, the rest from the in‑memory ``_pending`` buffer.
+        self._exact: np.ndarray | None = None
+        self._exact_rows = 0
+        self._pending: np.ndarray | None = (
+            np.empty((capacity, dimension), dtype=np.float32)
+            if storage != "float32" and rescore_factor > 0
+            else None
+        )
+        self._trace_keys: np.ndarray = np.zeros(max(1, initial_capacity), dtype=np.int64)
+        self._size = 0
         self._metadata: List[Any] = []
+        # Row of each embedding in ``self.spans``, or -1 when its
+        # metadata is held in ``self._metadata`` instead.
+        self._span_rows: np.ndarray = np.full(max(1, initial_capacity), -1, dtype=np.int64)
+        # Tombstones: rows that were deleted or evicted but not yet
+        # compacted away are ``False`` here and skipped by searches.
+        self._alive: np.ndarray = np.ones(capacity, dtype=bool)
+        self._dead = 0
+        # Wall‑clock insertion time per row, the eviction age of rows
+        # without a span start time
+        self._inserted: np.ndarray = np.zeros(capacity, dtype=np.float64)
+        # Logical time at which each row was inserted or last returned
+        # by a query, for least‑recently‑retrieved eviction
+        self._touched: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+        #: Columnar storage for span records added with :meth:`add_records`
+        self.spans = SpanTable()
+        #: Inverted indexes over service, status and start time.  Rows
+        #: are indexed on insert; rows of a restored snapshot are
+        #: indexed on the first filtered query.
+        self.metadata_index = MetadataIndex(bucket_seconds=time_bucket_seconds)
+        #: Pooled per‑trace embeddings for coarse‑to‑fine search.  Rows
+        #: are indexed on insert while ``trace_candidates`` is set;
+        #: other rows are indexed on the first coarse‑to‑fine query.
+        self.trace_index = TraceIndex(dimension, pooling=trace_pooling)
         self._index: NearestNeighbors | None = None
+        self._index_stale = False
+        # Snapshot directory this store is synchronised with, and the
+        # number of leading rows already written to it.
+        self._snapshot_path: Path | None = None
+        self._snapshot_rows = 0
+        # Set by :meth:`compact`, which renumbers rows: the next snapshot
+        # to ``_snapshot_path`` must be rewritten rather than appended.
+        self._rewrite_snapshot = False
+
+    @classmethod
+    def from_config(cls, config: StoreConfig) -> "VectorMemoryStore":
+        """Create a store, including its search backend, from configuration.
+
+        If ``config.persist_path`` points at an existing snapshot, the
+        store is restored from it instead of starting empty.
+        """
+        ann_index = create_index(
+            config.index_backend,
+            n_lists=config.ivf_n_lists,
+            n_probe=config.ivf_n_probe,
+        )
+        if config.persist_path and read_manifest(config.persist_path) is not None:
+            store = cls.restore(
+                config.persist_path,
+                n_neighbors=config.n_neighbors or 5,
+                ann_index=ann_index,
+                storage=config.storage_dtype,
+                rescore_factor=config.rescore_factor,
+                time_bucket_seconds=config.time_bucket_seconds,
+                trace_candidates=config.trace_candidates,
+                trace_pooling=config.trace_pooling,
+                eviction=EvictionPolicy.from_config(config),
+            )
+            if config.dimension is not None and store.dimension != config.dimension:
+                raise ValueError(
+                    f"snapshot dimension {store.dimension} does not match configured dimension"
+                    f" {config.dimension}"
+                )
+            return store
+        return cls(
+            dimension=config.dimension,
+            n_neighbors=config.n_neighbors or 5,
+            ann_index=ann_index,
+            storage=config.storage_dtype,
+            rescore_factor=config.rescore_factor,
+            time_bucket_seconds=config.time_bucket_seconds,
+            trace_candidates=config.trace_candidates,
+            trace_pooling=config.trace_pooling,
+            eviction=EvictionPolicy.from_config(config),
+        )
+
+    @classmethod
+    def restore(
+        cls,
+        path: str | Path,
+        n_neighbors: int = 5,
+        ann_index: NeighborIndex | None = None,
+        storage: str = "float32",
+        rescore_factor: int = 0,
+        time_bucket_seconds: float = 3600.0,
+        trace_candidates: int = 0,
+        trace_pooling: str = "mean",
+        eviction: EvictionPolicy | None = None,
+    ) -> "VectorMemoryStore":
+        """Open a snapshot written by :meth:`snapshot`.
+
+        The embedding matrix is memory‑mapped read‑only and metadata is
+        decoded lazily, so opening is independent of the store size and
+        several processes can share the same snapshot through the OS
+        page cache.  The first :meth:`add` after restoring copies the
+        matrix into process memory.  With compact ``storage`` the
+        snapshot is instead quantised into memory block by block, and
+        the memory map only serves rescoring.
+
+        Args:
+            path: Snapshot directory.
+            n_neighbors: Default number of neighbours per query.
+            ann_index: Optional approximate nearest‑neighbour backend.
+            storage: Embedding storage format (see :meth:`__init__`).
+            rescore_factor: Candidate over‑fetch factor for rescoring.
+            time_bucket_seconds: Width of the metadata index time buckets.
+            trace_candidates: Traces selected per query before span search.
+            trace_pooling: Pooling of span embeddings into trace embeddings.
+            eviction: Optional limits on the rows kept.  Restored rows
+                count towards them from the first insert on.
+        """
+        embeddings, trace_keys, metadata, dimension = open_snapshot(path)
+        store = cls(
+            dimension=dimension,
+            n_neighbors=n_neighbors,
+            initial_capacity=1,
+            ann_index=ann_index,
+            storage=storage,
+            rescore_factor=rescore_factor,
+            time_bucket_seconds=time_bucket_seconds,
+            trace_candidates=trace_candidates,
+            trace_pooling=trace_pooling,
+            eviction=eviction,
+        )
+        rows = embeddings.shape[0]
+        if rows:
+            if storage == "float32":
+                store._buffer = embeddings
+            else:
+                store._buffer = np.empty((rows, dimension), dtype=storage)
+                if store._scales is not None:
+                    store._scales = np.ones(rows, dtype=np.float32)
+                for start in range(0, rows, _RESTORE_BLOCK_ROWS):
+                    stop = min(start + _RESTORE_BLOCK_ROWS, rows)
+                    codes, scales = quantize(embeddings[start:stop], storage)
+                    store._buffer[start:stop] = codes
+                    if scales is not None:
+                        store._scales[start:stop] = scales
+                if store._pending is not None:
+                    store._exact = embeddings
+                    store._exact_rows = rows
+            store._trace_keys = trace_keys
+            store._span_rows = np.full(rows, -1, dtype=np.int64)
+            store._alive = np.ones(rows, dtype=bool)
+            store._inserted = np.full(rows, time.time())
+            store._touched = np.zeros(rows, dtype=np.int64)
+        store._size = embeddings.shape[0]
+        store._metadata = metadata  # type: ignore[assignment]
+        store._index_stale = store._size > 0
+        store._snapshot_path = Path(path).resolve()
+        store._snapshot_rows = store._size
+        return store
+
+    def snapshot(self, path: str | Path) -> int:
+        """Persist the store to ``path``, appending only rows not yet written.
+
+        The first snapshot to an empty directory writes every row.
+        Subsequent snapshots of the same store (or of a store restored
+        from ``path``) append the rows added since.  Tombstoned rows are
+        compacted away first; if compaction renumbered rows already
+        written, a new snapshot is written next to ``path`` and swapped
+        in atomically (see :func:`t_rag.persistence.replace_snapshot`).
+        Rows added with :meth:`add_records` are written without their
+        resource attributes (see :meth:`SpanRecord.to_metadata`).
+
+        Args:
+            path: Snapshot directory.
+
+        Returns:
+            The number of rows committed to the snapshot.
+
+        Raises:
+            ValueError: If ``path`` holds a snapshot that this store was
+                not restored from or previously written to.
+        """
+        root = Path(path).resolve()
+        if self._dead:
+            self.compact()
+        manifest = read_manifest(root)
+        persisted = manifest["rows"] if manifest else 0
+        if persisted and (root != self._snapshot_path or persisted != self._snapshot_rows):
+            raise ValueError(f"snapshot at {root} was not written from this store")
+        # Rows renumbered by compaction since the last snapshot are
+        # written to a fresh snapshot that replaces the old one
+        write = replace_snapshot if persisted and self._rewrite_snapshot else append_snapshot
+        if write is replace_snapshot:
+            persisted = 0
+        rows = write(
+            root,
+            self._full_precision(persisted, self._size),
+            (self._persisted_metadata(idx) for idx in range(persisted, self._size)),
+            self.dimension,
+            trace_keys=self._trace_keys[persisted : self._size],
+        )
+        self._snapshot_path = root
+        self._snapshot_rows = rows
+        self._rewrite_snapshot = False
+        if self._pending is not None:
+            # Rescoring now reads every row from the snapshot
+            self._exact = open_snapshot(root)[0]
+            self._exact_rows = rows
+            self._pending = np.empty((1, self.dimension), dtype=np.float32)
+        return rows
+
+    def _full_precision(self, start: int, stop: int) -> np.ndarray:
+        """Return rows ``start:stop`` as ``float32`` for persisting."""
+        if self.storage == "float32":
+            return self._buffer[start:stop]
+        if self._pending is not None:
+            return self._full_rows(np.arange(start, stop))
+        return self.embeddings[start:stop]
+
+    def _full_rows(self, ids: np.ndarray) -> np.ndarray:
+        """Gather full‑precision vectors of the rows ``ids``."""
+        if self._pending is None:
+            return self.embeddings[ids]
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = np.empty((ids.shape[0], self.dimension), dtype=np.float32)
+        in_snapshot = ids < self._exact_rows
+        if np.any(in_snapshot):
+            rows[in_snapshot] = self._exact[ids[in_snapshot]]
+        rows[~in_snapshot] = self._pending[ids[~in_snapshot] - self._exact_rows]
+        return rows
+
+    def __len__(self) -> int:
+        """Number of row slots in use, including tombstoned rows."""
+        return self._size
+
+    @property
+    def live_rows(self) -> int:
+        """Number of rows that have not been deleted or evicted."""
+        return self._size - self._dead
+
+    @property
+    def capacity(self) -> int:
+        """Number of embeddings the store can hold before reallocating."""
+        return self._buffer.shape[0]
+
+    @property
+    def embeddings(self) -> np.ndarray | QuantizedMatrix:
+        """View of the stored embeddings with shape ``(len(self), dimension)``.
+
+        For compact storage this is a
+        :class:`~t_rag.quantization.QuantizedMatrix` whose rows
+        dequantise to ``float32`` when indexed.
+        """
+        if self.storage == "float32":
+            return self._buffer[: self._size]
+        return QuantizedMatrix(
+            self._buffer[: self._size],
+            None if self._scales is None else self._scales[: self._size],
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held for searching the stored embeddings.
+
+        Counts the (possibly quantised) rows and, when rescoring,
+        full‑precision rows not yet written to a snapshot.  Capacity
+        reserved for future rows is not included.
+        """
+        total = self.embeddings.nbytes
+        if self._pending is not None:
+            total += (self._size - self._exact_rows) * self.dimension * 4
+        return total
+
+    def get_metadata(self, idx: int) -> Any:
+        """Return the metadata stored for the embedding at row ``idx``.
+
+        Rows added with :meth:`add_records` are materialised from the
+        span table as a dictionary of :class:`SpanRecord` fields.
+        """
+        idx = int(idx)
+        if idx < 0:
+            idx += self._size
+        if 0 <= idx < self._size and self._span_rows[idx] >= 0:
+            return self.spans.to_dict(int(self._span_rows[idx]))
+        return self._metadata[idx]
+
+    def _persisted_metadata(self, idx: int) -> Any:
+        """Return the metadata written to snapshots for row ``idx``."""
+        metadata = self.get_metadata(idx)
+        if self._span_rows[idx] >= 0:
+            del metadata["resource_attributes"]
+        return metadata
 
     def add(self, embeddings: Iterable[np.ndarray], metadata: Iterable[Any]) -> None:
         """Add a batch of embeddings and their metadata to the store.
 
         Args:
-            embeddings: Iterable of 1‑D NumPy arrays, each of length
-                ``self.dimension``.
+            embeddings: A 2‑D array or an iterable of 1‑D NumPy arrays,
+                each of length ``self.dimension``.
             metadata: Iterable of objects associated with each
                 embedding.  Must have the same length as
                 ``embeddings``.
         """
-        emb_list = list(embeddings)
         meta_list = list(metadata)
-        if len(emb_list) != len(meta_list):
-            raise ValueError("embeddings and metadata must have the same length")
-        if not emb_list:
+        emb_array = self._as_matrix(embeddings, len(meta_list))
+        if not meta_list:
             return
-        # Stack embeddings into a 2D array and append
-        emb_array = np.vstack([np.array(e, dtype=np.float32) for e in emb_list])
-        if self._embeddings.size == 0:
-            self._embeddings = emb_array
+        first = self._size
+        indexed = len(self.metadata_index) == first
+        self._append(
+            emb_array,
+            meta_list,
+            [metadata_trace_key(meta) for meta in meta_list],
+            np.full(len(meta_list), -1, dtype=np.int64),
+        )
+        if indexed:
+            self.metadata_index.add_metadata(meta_list)
+        self._enforce_limits(first)
+
+    def add_records(self, embeddings: Iterable[np.ndarray], records: Iterable[SpanRecord]) -> None:
+        """Add a batch of embeddings for span records.
+
+        Unlike :meth:`add`, the records are not kept as metadata
+        objects: they are appended to the columnar :attr:`spans` table
+        and only their row ids are stored.  :meth:`get_metadata`
+        returns the same dictionary as ``record.__dict__`` would,
+        except that integral timestamps are returned as integers.
+
+        Args:
+            embeddings: A 2‑D array or an iterable of 1‑D NumPy arrays.
+            records: Span records associated with each embedding.
+        """
+        record_list = list(records)
+        emb_array = self._as_matrix(embeddings, len(record_list))
+        if not record_list:
+            return
+        rows = self.spans.extend(record_list)
+        # Hash each distinct trace id of the batch once
+        codes, inverse = np.unique(self.spans.trace_codes[rows], return_inverse=True)
+        keys = np.array(
+            [0 if code < 0 else trace_key(self.spans.strings[int(code)]) for code in codes],
+            dtype=np.int64,
+        )
+        first = self._size
+        indexed = len(self.metadata_index) == first
+        self._append(emb_array, [None] * len(record_list), keys[inverse], rows)
+        if indexed:
+            self.metadata_index.add(
+                [rec.service_name for rec in record_list],
+                [rec.status for rec in record_list],
+                [rec.start_time for rec in record_list],
+            )
+        self._enforce_limits(first)
+
+    def _as_matrix(self, embeddings: Iterable[np.ndarray], count: int) -> np.ndarray:
+        """Validate a batch of ``count`` embeddings and return it as a matrix."""
+        if isinstance(embeddings, np.ndarray):
+            emb_array = np.asarray(embeddings, dtype=np.float32)
         else:
-            self._embeddings = np.vstack([self._embeddings, emb_array])
+            emb_list = list(embeddings)
+            emb_array = (
+                np.asarray(emb_list, dtype=np.float32)
+                if emb_list
+                else np.empty((0, self.dimension), dtype=np.float32)
+            )
+        if emb_array.shape[0] != count:
+            raise ValueError("embeddings and metadata must have the same length")
+        if count == 0:
+            return emb_array
+        emb_array = emb_array.reshape(count, -1)
+        if emb_array.shape[1] != self.dimension:
+            raise ValueError(
+                f"expected embeddings of dimension {self.dimension}, got {emb_array.shape[1]}"
+            )
+        return emb_array
+
+    def _append(
+        self,
+        emb_array: np.ndarray,
+        meta_list: List[Any],
+        trace_keys: Iterable[int],
+        span_rows: np.ndarray,
+    ) -> None:
+        count = emb_array.shape[0]
+        if self.trace_candidates > 0 and len(self.trace_index) == self._size:
+            self.trace_index.add(np.asarray(trace_keys, dtype=np.int64), emb_array)
+        self._reserve(self._size + count)
+        codes, scales = quantize(emb_array, self.storage)
+        self._buffer[self._size : self._size + count] = codes
+        if scales is not None:
+            self._scales[self._size : self._size + count] = scales
+        if self._pending is not None:
+            self._reserve_pending(self._size + count - self._exact_rows)
+            start = self._size - self._exact_rows
+            self._pending[start : start + count] = emb_array
+        self._trace_keys[self._size : self._size + count] = trace_keys
+        self._span_rows[self._size : self._size + count] = span_rows
+        self._alive[self._size : self._size + count] = True
+        self._inserted[self._size : self._size + count] = time.time()
+        self._touched[self._size : self._size + count] = self._clock
+        self._size += count
         self._metadata.extend(meta_list)
-        # Rebuild the nearest neighbour index whenever new data is added
-        self._build_index()
+        # Defer the index rebuild until the next query
+        self._index_stale = True
+
+    def _reserve(self, required: int) -> None:
+        """Grow the embedding buffer geometrically to hold ``required`` rows."""
+        capacity = self.capacity
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        buffer = np.empty((capacity, self.dimension), dtype=self._buffer.dtype)
+        buffer[: self._size] = self._buffer[: self._size]
+        if self._scales is not None:
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[: self._size] = self._scales[: self._size]
+            self._scales = scales
+        trace_keys = np.zeros(capacity, dtype=np.int64)
+        trace_keys[: self._size] = self._trace_keys[: self._size]
+        span_rows = np.full(capacity, -1, dtype=np.int64)
+        span_rows[: self._size] = self._span_rows[: self._size]
+        self._buffer = buffer
+        self._trace_keys = trace_keys
+        self._span_rows = span_rows
+        for name in ("_alive", "_inserted", "_touched"):
+            old = getattr(self, name)
+            grown = np.empty(capacity, dtype=old.dtype)
+            grown[: self._size] = old[: self._size]
+            setattr(self, name, grown)
+
+    def _sync_metadata_index(self) -> None:
+        """Index rows that were not indexed on insert (restored rows)."""
+        indexed = len(self.metadata_index)
+        if indexed < self._size:
+            self.metadata_index.add_metadata(self.get_metadata(idx) for idx in range(indexed, self._size))
+
+    def _sync_trace_index(self) -> None:
+        """Index rows that were not indexed on insert in the trace index."""
+        for start in range(len(self.trace_index), self._size, _RESTORE_BLOCK_ROWS):
+            stop = min(start + _RESTORE_BLOCK_ROWS, self._size)
+            # Rows deleted before they were indexed join no trace
+            keys = np.where(self._alive[start:stop], self._trace_keys[start:stop], 0)
+            self.trace_index.add(keys, self._full_rows(np.arange(start, stop)))
+
+    def delete(self, ids: Iterable[int]) -> int:
+        """Delete rows by id.
+
+        Deleted rows are tombstoned: searches skip them at once and
+        their slots are reclaimed by the next :meth:`compact`, which
+        runs automatically once tombstones reach
+        ``eviction.compact_ratio`` of the rows.
+
+        Returns:
+            The number of rows newly deleted.
+        """
+        ids = np.unique(np.asarray(list(ids), dtype=np.int64))
+        if ids.size and (ids[0] < 0 or ids[-1] >= self._size):
+            raise IndexError("row id out of range")
+        removed = self._tombstone(ids)
+        self._maybe_compact()
+        return removed
+
+    def delete_traces(self, trace_ids: Iterable[Any]) -> int:
+        """Delete every row belonging to the given trace ids.
+
+        Returns:
+            The number of rows newly deleted.
+        """
+        keys = np.array([trace_key(trace_id) for trace_id in trace_ids], dtype=np.int64)
+        return self.delete(np.flatnonzero(np.isin(self._trace_keys[: self._size], keys)))
+
+    def evict(self, now: float | None = None) -> int:
+        """Apply :attr:`eviction` to all rows, e.g. to expire old spans.
+
+        Inserts enforce the policy automatically, sparing the rows they
+        add; call this periodically when the store may sit idle while
+        rows expire.
+
+        Args:
+            now: Current time in epoch seconds.  Defaults to the clock.
+
+        Returns:
+            The number of rows evicted.
+        """
+        return self._enforce_limits(self._size, now)
+
+    def _enforce_limits(self, protected_from: int, now: float | None = None) -> int:
+        """Evict rows violating :attr:`eviction`, sparing rows from ``protected_from`` on."""
+        if not self.eviction.enabled or not self._size:
+            return 0
+        self._sync_metadata_index()
+        size = self._size
+        start = self.metadata_index.start_seconds
+        # Rows without a span start time age from their insertion
+        start = np.where(np.isnan(start), self._inserted[:size], start)
+        if self.eviction.policy == "lru":
+            # Ties between rows last touched at the same time go to the older row
+            priority = self._touched[:size] * size + np.arange(size)
+        else:
+            priority = start
+        victims = select_victims(
+            self.eviction,
+            self._alive[:size],
+            protected_from,
+            priority,
+            start,
+            self.metadata_index.service_rows(),
+            time.time() if now is None else now,
+        )
+        evicted = self._tombstone(victims)
+        self._maybe_compact()
+        return evicted
+
+    def _tombstone(self, ids: np.ndarray) -> int:
+        """Mark rows as deleted; returns the number of rows newly marked."""
+        ids = ids[self._alive[ids]]
+        if not ids.size:
+            return 0
+        self._alive[ids] = False
+        self._dead += ids.shape[0]
+        self.trace_index.remove(ids, self._full_rows)
+        return int(ids.shape[0])
+
+    def _maybe_compact(self) -> None:
+        if self._dead and self._dead >= self.eviction.compact_ratio * self._size:
+            self.compact()
+
+    def compact(self) -> int:
+        """Reclaim the slots of deleted and evicted rows.
+
+        Live rows are moved to the front of every buffer and renumbered
+        in order, so row ids obtained before compaction become invalid.
+        Span records, strings and metadata of removed rows are released
+        and the search backend is rebuilt on the next query.
+
+        Returns:
+            The number of slots reclaimed.
+        """
+        removed = self._dead
+        if not removed:
+            return 0
+        keep = np.flatnonzero(self._alive[: self._size])
+        count = keep.shape[0]
+        capacity = max(1, self.capacity)
+        full_rows = self._full_rows(keep) if self._pending is not None else None
+        buffer = np.empty((capacity, self.dimension), dtype=self._buffer.dtype)
+        buffer[:count] = self._buffer[keep]
+        self._buffer = buffer
+        if self._scales is not None:
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[:count] = self._scales[keep]
+            self._scales = scales
+        if full_rows is not None:
+            # Full‑precision rows move back into memory until the next snapshot
+            self._pending = np.empty((capacity, self.dimension), dtype=np.float32)
+            self._pending[:count] = full_rows
+            self._exact = None
+            self._exact_rows = 0
+        span_rows = self._span_rows[keep]
+        table_rows = span_rows[span_rows >= 0]
+        if table_rows.size < len(self.spans):
+            self.spans.compact(table_rows)
+            span_rows[span_rows >= 0] = np.arange(table_rows.shape[0])
+        columns = {
+            "_trace_keys": self._trace_keys[keep],
+            "_span_rows": span_rows,
+            "_inserted": self._inserted[keep],
+            "_touched": self._touched[keep],
+        }
+        for name, column in columns.items():
+            array = np.zeros(capacity, dtype=column.dtype)
+            array[:count] = column
+            setattr(self, name, array)
+        self._alive = np.ones(capacity, dtype=bool)
+        self._metadata = [self._metadata[idx] for idx in keep.tolist()]
+        indexed = len(self.metadata_index)
+        self.metadata_index.compact(keep[keep < indexed])
+        # Trace sums are rebuilt from the live rows on the next coarse query
+        self.trace_index = TraceIndex(self.dimension, pooling=self.trace_index.pooling)
+        self._size = count
+        self._dead = 0
+        # Row ids changed, so the search backend cannot reuse its assignments
+        if self.ann_index is not None:
+            self.ann_index.reset()
+        self._index_stale = True
+        if self._snapshot_path is not None:
+            self._rewrite_snapshot = True
+        return removed
+
+    def _reserve_pending(self, required: int) -> None:
+        """Grow the full‑precision rescoring buffer to hold ``required`` rows."""
+        capacity = self._pending.shape[0]
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        pending = np.empty((capacity, self.dimension), dtype=np.float32)
+        used = self._size - self._exact_rows
+        pending[:used] = self._pending[:used]
+        self._pending = pending
 
     def _build_index(self) -> None:
         """Construct or rebuild the nearest neighbour index."""
-        if self._embeddings.shape[0] == 0:
+        self._index_stale = False
+        if self.ann_index is not None:
+            self.ann_index.build(self.embeddings)
+            return
+        if self._size == 0:
             # Nothing to build
+            self._index = None
             return
         self._index = NearestNeighbors(
-            n_neighbors=min(self.n_neighbors, len(self._metadata)),
+            n_neighbors=min(self.n_neighbors, self._size),
             metric="cosine",
             algorithm="auto",
         )
-        self._index.fit(self._embeddings)
+        self._index.fit(self.embeddings)
 
-    def query(self, embedding: np.ndarray, k: int | None = None) -> List[Tuple[Any, float]]:
+    def query(
+        self,
+        embedding: np.ndarray,
+        k: int | None = None,
+        where: SpanFilter | None = None,
+    ) -> List[Tuple[Any, float]]:
         """Query the store for the nearest neighbours of a given embedding.
 
         Args:
             embedding: A single embedding vector of shape ``(dimension,)``.
             k: The number of neighbours to retrieve.  Defaults to
-                ``self.n_neighbors``.
+                ``self.n_neighbors``.  At most ``len(self)`` results are
+                returned.
+            where: Optional metadata filter (see :meth:`query_batch`).
 
         Returns:
             A list of tuples ``(metadata, distance)`` sorted by ascending
             distance (cosine distance).  Smaller distances indicate
             higher similarity.
         """
+        if (
+            self.ann_index is not None
+            or self.storage != "float32"
+            or where is not None
+            or self.trace_candidates > 0
+            or self._dead
+            or self.eviction.policy == "lru"
+        ):
+            ids, distances = self.query_batch(np.asarray(embedding)[None, :], k, where=where)
+            return [
+                (self.get_metadata(idx), float(dist))
+                for idx, dist in zip(ids[0], distances[0])
+                if idx >= 0
+            ]
+        if self._index_stale:
+            self._build_index()
         if self._index is None:
             return []
-        num_neighbors = k or self.n_neighbors
+        num_neighbors = min(k or self.n_neighbors, self._size)
         # scikit‑learn returns arrays of shape (1, k)
         distances, indices = self._index.kneighbors([embedding], n_neighbors=num_neighbors)
         results: List[Tuple[Any, float]] = []
         for dist, idx in zip(distances[0], indices[0]):
-            results.append((self._metadata[idx], float(dist)))
-        return results
\ No newline at end of file
+            results.append((self.get_metadata(idx), float(dist)))
+        return results
+
+    def query_batch(
+        self,
+        embeddings: np.ndarray,
+        k: int | None = None,
+        exclude_trace_ids: Iterable[Any] | None = None,
+        where: SpanFilter | None = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Query the store for the nearest neighbours of many embeddings at once.
+
+        Similarities are computed as a dot product between the query
+        block and the stored matrix, which equals cosine similarity for
+        unit‑normalised embeddings.  The top ``k`` candidates of each
+        row are selected with :func:`numpy.argpartition` and only those
+        are sorted.  With compact storage and a positive
+        ``rescore_factor``, ``k * rescore_factor`` candidates are
+        selected from the codes and re‑ranked by exact distance.
+
+        Args:
+            embeddings: Array of shape ``(n_queries, dimension)``.
+            k: The number of neighbours to retrieve per query.  Defaults
+                to ``self.n_neighbors``.  At most ``len(self)`` results
+                are returned.
+            exclude_trace_ids: Optional trace ids whose spans must not
+                be returned, typically those of the incident being
+                analysed.  They are masked inside the search kernel, so
+                up to ``k`` other neighbours are still returned.
+            where: Optional metadata filter.  Matching rows are looked
+                up in :attr:`metadata_index` first and only they are
+                scored; with an approximate backend, large candidate
+                sets are instead applied as a mask inside the index.
+
+        When :attr:`trace_candidates` is positive, the trace index first
+        selects that many traces per query (among traces that are not
+        excluded and own rows passing ``where``) and each query only
+        scores the spans of its own selected traces; queries that
+        selected the same traces are searched together.  Rows without
+        a trace id are not searched in this mode, and rows of a query
+        with fewer eligible spans than others are padded with id
+        ``-1``.
+
+        Returns:
+            A tuple ``(ids, distances)`` of arrays with shape
+            ``(n_queries, k)``.  ``ids`` are row ids that can be resolved
+            with :meth:`get_metadata`; ``distances`` are cosine distances
+            sorted in ascending order within each row.  Approximate
+            backends pad rows with fewer candidates with id ``-1``.
+        """
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        mask = self._alive[: self._size] if self._dead else None
+        excluded = None
+        if exclude_trace_ids is not None:
+            excluded = np.array([trace_key(trace_id) for trace_id in exclude_trace_ids], dtype=np.int64)
+            if excluded.size:
+                keep = ~np.isin(self._trace_keys[: self._size], excluded)
+                mask = keep if mask is None else mask & keep
+        candidates = None
+        if where is not None:
+            self._sync_metadata_index()
+            candidates = self.metadata_index.candidates(where)
+            if candidates is not None and mask is not None:
+                candidates = candidates[mask[candidates]]
+        if self.trace_candidates > 0 and self._size:
+            ids, distances = self._search_top_traces(queries, k, candidates, mask, excluded)
+        else:
+            ids, distances = self._search_rows(queries, k, candidates, mask)
+        if self.eviction.policy == "lru":
+            self._clock += 1
+            self._touched[ids[ids >= 0]] = self._clock
+        return ids, distances
+
+    def _search_top_traces(
+        self,
+        queries: np.ndarray,
+        k: int | None,
+        candidates: np.ndarray | None,
+        mask: np.ndarray | None,
+        excluded: np.ndarray | None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Coarse‑to‑fine search: each query only scores the spans of its own top traces."""
+        self._sync_trace_index()
+        slots, _ = self.trace_index.search(
+            queries, self.trace_candidates, self._full_rows, exclude_keys=excluded, within_rows=candidates
+        )
+        width = min(k or self.n_neighbors, self._size)
+        ids = np.full((queries.shape[0], width), -1, dtype=np.int64)
+        distances = np.full((queries.shape[0], width), np.inf, dtype=np.float32)
+        # Queries with the same set of top traces are searched together
+        groups, inverse = np.unique(np.sort(slots, axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(groups.shape[0] + 1))
+        found = 0
+        for group, trace_slots in enumerate(groups):
+            members = order[bounds[group] : bounds[group + 1]]
+            rows = self.trace_index.rows(trace_slots)
+            if candidates is not None:
+                rows = np.intersect1d(rows, candidates, assume_unique=True)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            group_ids, group_distances = self._search_rows(queries[members], k, rows, mask)
+            count = group_ids.shape[1]
+            ids[members, :count] = group_ids
+            distances[members, :count] = group_distances
+            found = max(found, count)
+        return ids[:, :found], distances[:, :found]
+
+    def _search_rows(
+        self,
+        queries: np.ndarray,
+        k: int | None,
+        candidates: np.ndarray | None,
+        mask: np.ndarray | None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search all rows passing ``mask``, or only ``candidates`` when given."""
+        if candidates is not None:
+            eligible = len(candidates)
+        else:
+            eligible = self._size if mask is None else int(np.count_nonzero(mask))
+        num_neighbors = min(k or self.n_neighbors, eligible)
+        fetch = num_neighbors
+        if self._pending is not None:
+            fetch = min(num_neighbors * self.rescore_factor, eligible)
+        if candidates is not None and (self.ann_index is None or eligible <= self.filtered_exact_limit):
+            # Score only the rows passing the filter
+            sub_ids, distances = exact_search(self.embeddings[candidates], queries, fetch, self.query_block_size)
+            ids = candidates[sub_ids]
+        elif self.ann_index is not None:
+            if self._index_stale:
+                self._build_index()
+            if candidates is not None:
+                mask = np.zeros(self._size, dtype=bool)
+                mask[candidates] = True
+            ids, distances = self.ann_index.search(queries, fetch, mask=mask)
+        else:
+            ids, distances = exact_search(self.embeddings, queries, fetch, self.query_block_size, mask=mask)
+        if self._pending is not None:
+            ids, distances = rescore(queries, ids, self._full_rows, num_neighbors)
+        return ids, distances
@@ -0,0 +1,14 @@
+"""Helpers shared by the test modules.
+
+The tests are plain :mod:`unittest` cases; pytest puts this directory on
+``sys.path``, as does running a test file directly, so modules import
+these helpers with ``from conftest import ...``.
+"""
+import numpy as np
+
+
+def unit_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Return ``count`` random unit‑norm ``float32`` vectors of size ``dim``."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
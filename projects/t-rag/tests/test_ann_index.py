@@ -0,0 +1,66 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from conftest import unit_vectors
+from t_rag.ann_index import IVFIndex, create_index, exact_search, recall_at_k
+from t_rag.config import StoreConfig
+from t_rag.vector_memory import VectorMemoryStore
+
+
+class IVFIndexTests(unittest.TestCase):
+    def test_full_probe_matches_exact_search(self):
+        matrix = unit_vectors(500, 16)
+        queries = unit_vectors(20, 16, seed=1)
+        index = IVFIndex(n_lists=10, n_probe=10)
+        index.build(matrix)
+        approx_ids, approx_dists = index.search(queries, 5)
+        exact_ids, exact_dists = exact_search(matrix, queries, 5)
+        self.assertEqual(recall_at_k(approx_ids, exact_ids), 1.0)
+        np.testing.assert_allclose(approx_dists, exact_dists, atol=1e-5)
+
+    def test_recall_increases_with_probes(self):
+        matrix = unit_vectors(2000, 16)
+        queries = unit_vectors(50, 16, seed=2)
+        exact_ids, _ = exact_search(matrix, queries, 10)
+        index = IVFIndex(n_lists=40, n_probe=1)
+        index.build(matrix)
+        low = recall_at_k(index.search(queries, 10)[0], exact_ids)
+        index.n_probe = 20
+        high = recall_at_k(index.search(queries, 10)[0], exact_ids)
+        self.assertLess(low, high)
+        self.assertGreater(high, 0.8)
+
+    def test_appends_reuse_centroids(self):
+        matrix = unit_vectors(300, 8)
+        index = IVFIndex(n_lists=5, n_probe=5, retrain_growth=2.0)
+        index.build(matrix[:200])
+        centroids = index._centroids
+        index.build(matrix)
+        self.assertIs(index._centroids, centroids)
+        ids, _ = index.search(matrix[250:251], 1)
+        self.assertEqual(ids[0, 0], 250)
+
+    def test_store_selects_backend_from_config(self):
+        self.assertIsNone(create_index("exact"))
+        with self.assertRaises(ValueError):
+            create_index("bogus")
+        config = StoreConfig(dimension=8, n_neighbors=3, index_backend="ivf", ivf_n_lists=4, ivf_n_probe=4)
+        store = VectorMemoryStore.from_config(config)
+        self.assertIsInstance(store.ann_index, IVFIndex)
+        vectors = unit_vectors(100, 8)
+        store.add(vectors, [{"id": i} for i in range(100)])
+        meta, dist = store.query(vectors[42])[0]
+        self.assertEqual(meta, {"id": 42})
+        self.assertAlmostEqual(dist, 0.0, places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.config import ModelConfig
+from t_rag.llm_reasoner import LLMReasoner, StubLLMReasoner
+
+
+def _incident(index: int):
+    return [{"message": f"service: svc-{index}; operation: op; status: error"}], []
+
+
+class AsyncReasonerTests(unittest.TestCase):
+    def test_batch_is_concurrent_but_bounded(self):
+        reasoner = StubLLMReasoner(ModelConfig(llm_max_concurrency=4, llm_cache_size=0), latency=0.05)
+        started = time.perf_counter()
+        results = reasoner.generate_batch([_incident(i) for i in range(12)])
+        elapsed = time.perf_counter() - started
+        self.assertEqual(len(results), 12)
+        self.assertEqual([r["root_cause"] for r in results][:2], [
+            "service: svc-0; operation: op; status: error",
+            "service: svc-1; operation: op; status: error",
+        ])
+        self.assertEqual(reasoner.calls, 12)
+        self.assertEqual(reasoner.peak_in_flight, 4)
+        # Three waves of 50 ms rather than twelve sequential calls
+        self.assertLess(elapsed, 0.4)
+
+    def test_timeouts_are_reported_per_incident(self):
+        reasoner = StubLLMReasoner(ModelConfig(llm_cache_size=0), latency=0.2)
+        results = reasoner.generate_batch([_incident(0), _incident(1)], timeout=0.01)
+        self.assertTrue(all(isinstance(r, asyncio.TimeoutError) for r in results))
+
+    def test_timed_out_calls_keep_their_slot(self):
+        class ThreadedStub(StubLLMReasoner):
+            _acall_llm = LLMReasoner._acall_llm
+
+        reasoner = ThreadedStub(ModelConfig(llm_max_concurrency=2, llm_cache_size=0), latency=0.1)
+
+        async def run():
+            first = await reasoner.agenerate_batch([_incident(0), _incident(1)], timeout=0.01)
+            second = await reasoner.agenerate_batch([_incident(2), _incident(3)], timeout=1)
+            return first + second
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, asyncio.TimeoutError) for r in results[:2]))
+        self.assertEqual(results[2]["root_cause"], _incident(2)[0][0]["message"])
+        # The abandoned worker threads still count against the limit
+        self.assertEqual(reasoner.calls, 4)
+        self.assertEqual(reasoner.peak_in_flight, 2)
+
+    def test_identical_async_requests_are_coalesced(self):
+        reasoner = StubLLMReasoner(ModelConfig(), latency=0.02)
+        results = reasoner.generate_batch([_incident(0)] * 5)
+        self.assertEqual(reasoner.calls, 1)
+        self.assertEqual(len({r["raw"] for r in results}), 1)
+        reasoner.generate_root_cause(*_incident(0))
+        self.assertEqual(reasoner.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import hashlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.corpus_builder import CorpusBuilder
+from t_rag.persistence import append_snapshot
+from t_rag.vector_memory import VectorMemoryStore
+
+
+def _encode(texts):
+    vectors = np.array(
+        [np.frombuffer(hashlib.sha256(text.encode()).digest()[:32], dtype=np.uint8) for text in texts],
+        dtype=np.float32,
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _write_archive(root: Path) -> int:
+    total = 0
+    for incident in range(4):
+        directory = root / f"incident-{incident}"
+        directory.mkdir()
+        for part in range(2):
+            spans = [
+                {"traceId": f"t{incident}", "spanId": f"{incident}-{part}-{i}", "name": f"op{i}"}
+                for i in range(7 + incident)
+            ]
+            (directory / f"part-{part}.json").write_text(json.dumps(spans))
+            total += len(spans)
+    spans = [{"traceId": "loose", "spanId": f"loose-{i}", "name": "op"} for i in range(5)]
+    (root / "loose.json").write_text(json.dumps(spans))
+    return total + len(spans)
+
+
+class _Crash(Exception):
+    pass
+
+
+class CorpusBuilderTests(unittest.TestCase):
+    def _span_ids(self, output: Path, summary):
+        ids = []
+        for shard in summary["shards"]:
+            store = VectorMemoryStore.restore(shard["path"])
+            ids.extend(store.get_metadata(i)["span_id"] for i in range(len(store)))
+        return ids
+
+    def test_build_writes_all_spans_into_bounded_shards(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            archive, output = Path(tmp, "archive"), Path(tmp, "out")
+            archive.mkdir()
+            total = _write_archive(archive)
+            log = io.StringIO()
+            summary = CorpusBuilder(output, _encode, batch_size=16, shard_rows=40, log=log).build(archive)
+            self.assertEqual(summary["spans_total"], total)
+            self.assertEqual(summary["entries_completed"], 5)
+            self.assertTrue(all(shard["rows"] <= 40 for shard in summary["shards"]))
+            self.assertEqual(sum(shard["rows"] for shard in summary["shards"]), total)
+            self.assertIn("spans/s", log.getvalue())
+            ids = self._span_ids(output, summary)
+            self.assertEqual(len(ids), len(set(ids)))
+
+    def test_crashed_build_resumes_without_duplicates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = Path(tmp, "archive")
+            archive.mkdir()
+            total = _write_archive(archive)
+            reference = CorpusBuilder(Path(tmp, "ref"), _encode, batch_size=10, shard_rows=25, log=None).build(archive)
+            calls = {"n": 0}
+
+            def flaky(texts):
+                calls["n"] += 1
+                if calls["n"] == 4:
+                    raise _Crash()
+                return _encode(texts)
+
+            output = Path(tmp, "out")
+            with self.assertRaises(_Crash):
+                CorpusBuilder(output, flaky, batch_size=10, shard_rows=25, log=None).build(archive)
+            checkpoint = json.loads((output / "checkpoint.json").read_text())
+            self.assertEqual(checkpoint["spans"], 30)
+            # Rows committed to a shard after the last checkpoint are rolled back
+            last = output / checkpoint["shards"][-1]["name"]
+            append_snapshot(last, _encode(["orphan"]), [{"span_id": "orphan"}], 32)
+            resumed = CorpusBuilder(output, _encode, batch_size=10, shard_rows=25, log=None)
+            summary = resumed.build(archive)
+            self.assertEqual(summary["spans_total"], total)
+            self.assertEqual(summary["spans_this_run"], total - 30)
+            self.assertEqual(self._span_ids(output, summary), self._span_ids(Path(tmp, "ref"), reference))
+
+    def test_resume_rejects_a_different_model(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            archive, output = Path(tmp, "archive"), Path(tmp, "out")
+            archive.mkdir()
+            _write_archive(archive)
+            CorpusBuilder(output, _encode, model_name="a", log=None).build(archive)
+            with self.assertRaises(ValueError):
+                CorpusBuilder(output, _encode, model_name="b", log=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
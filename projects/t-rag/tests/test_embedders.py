@@ -0,0 +1,129 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.config import ModelConfig, TRAGConfig
+from t_rag.embedders import HashingEmbedder, create_embedder
+from t_rag.service import TragEngine, embed_messages
+from t_rag.trace_loader import SpanRecord
+
+MESSAGES = [
+    "service: payment-service; operation: POST /charge; status: ERROR; error: card declined",
+    "service: payment-service; operation: POST /charge; status: ERROR; error: card expired",
+    "service: inventory; operation: GET /stock; status: OK",
+    "",
+    "Überweisung fehlgeschlagen ✗",
+]
+
+
+class HashingEmbedderTests(unittest.TestCase):
+    def test_vectors_are_unit_norm_and_deterministic(self):
+        embedder = HashingEmbedder(dimension=64)
+        first = embedder.encode(MESSAGES)
+        self.assertEqual(first.shape, (len(MESSAGES), 64))
+        self.assertEqual(first.dtype, np.float32)
+        norms = np.linalg.norm(first, axis=1)
+        np.testing.assert_allclose(norms[[0, 1, 2, 4]], 1.0, rtol=1e-5)
+        # Messages shorter than the smallest n-gram embed to zeros
+        self.assertEqual(norms[3], 0.0)
+        np.testing.assert_array_equal(first, HashingEmbedder(dimension=64).encode(MESSAGES))
+
+    def test_batches_do_not_affect_vectors(self):
+        embedder = HashingEmbedder(dimension=64)
+        together = embedder.encode(MESSAGES)
+        alone = np.vstack([embedder.encode([message]) for message in MESSAGES])
+        np.testing.assert_allclose(together, alone, atol=1e-6)
+        embedder.batch_size = 2
+        np.testing.assert_allclose(embedder.encode(MESSAGES), together, atol=1e-6)
+
+    def test_similar_messages_score_higher(self):
+        for embedder in (HashingEmbedder(), HashingEmbedder(dimension=128, n_features=4096)):
+            vectors = embedder.encode(MESSAGES[:3])
+            self.assertGreater(vectors[0] @ vectors[1], vectors[0] @ vectors[2])
+
+    def test_projection_and_names(self):
+        projected = HashingEmbedder(dimension=32, n_features=1024)
+        self.assertEqual(projected.encode(MESSAGES).shape, (len(MESSAGES), 32))
+        names = {HashingEmbedder().name, HashingEmbedder(seed=1).name, projected.name}
+        self.assertEqual(len(names), 3)
+        with self.assertRaises(ValueError):
+            HashingEmbedder(ngram_range=(4, 2))
+
+    def test_create_embedder(self):
+        embedder = create_embedder(
+            ModelConfig(embedding_backend="hashing", hashing_dimension=48, hashing_features=512)
+        )
+        self.assertIsInstance(embedder, HashingEmbedder)
+        self.assertEqual((embedder.dimension, embedder.n_features), (48, 512))
+        with self.assertRaises(ValueError):
+            create_embedder(ModelConfig(embedding_backend="word2vec"))
+
+
+def _trace(trace_id, service, error):
+    return [
+        SpanRecord(trace_id, f"{trace_id}-{i}", None, service, "handle", 0, 1, {}, "ERROR",
+                   f"service: {service}; operation: handle; status: ERROR; error: {error}")
+        for i in range(3)
+    ]
+
+
+class FakeSentenceTransformer:
+    """Minimal stand-in for a ``SentenceTransformer`` with unnormalised output."""
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        vectors = np.tile(np.array([3.0, 4.0], dtype=np.float32), (len(texts), 1))
+        return vectors / 5 if normalize_embeddings else vectors
+
+
+class OfflineEngineTests(unittest.TestCase):
+    def test_bare_sentence_transformer_is_normalised(self):
+        embeddings = embed_messages(FakeSentenceTransformer(), _trace("t", "svc", "boom"))
+        np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0)
+
+
+    def test_engine_runs_without_network(self):
+        config = TRAGConfig()
+        config.model.embedding_backend = "hashing"
+        config.model.llm_provider = "stub"
+        config.model.embedding_cache_size = 0
+        config.model.embedding_cache_path = None
+        config.store.persist_path = None
+        config.store.remember_incidents = True
+        engine = TragEngine(config)
+        self.assertEqual(engine.store.dimension, config.model.hashing_dimension)
+        self.assertIsNone(config.store.dimension)
+        engine.analyze(spans=_trace("old-db", "orders-db", "connection pool exhausted"))
+        engine.analyze(spans=_trace("old-cdn", "static-cdn", "certificate expired"))
+        result = engine.analyze(spans=_trace("new", "orders-db", "connection pool exhausted after retry"))
+        traces = [trace["trace_id"] for trace in result["retrieved_traces"]]
+        self.assertEqual(traces[0], "old-db")
+        self.assertNotIn("new", traces)
+        engine.close()
+
+    def test_engine_forgets_incidents_by_default(self):
+        for mode in ("historical", "inclusive"):
+            config = TRAGConfig()
+            config.model.embedding_backend = "hashing"
+            config.model.llm_provider = "stub"
+            config.model.embedding_cache_size = 0
+            config.model.embedding_cache_path = None
+            config.store.persist_path = None
+            config.store.retrieval_mode = mode
+            self.assertFalse(config.store.remember_incidents)
+            engine = TragEngine(config)
+            engine.analyze(spans=_trace("old-db", "orders-db", "connection pool exhausted"))
+            self.assertEqual(engine.store.live_rows, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.embedding_cache import EmbeddingCache
+
+
+class FakeEncoder:
+    def __init__(self) -> None:
+        self.encoded = []
+
+    def __call__(self, batch):
+        self.encoded.extend(batch)
+        return np.array([[len(text), text.count("a"), 1.0] for text in batch], dtype=np.float32)
+
+
+class EmbeddingCacheTests(unittest.TestCase):
+    def test_only_unseen_messages_are_encoded(self):
+        encoder = FakeEncoder()
+        cache = EmbeddingCache("fake-model", max_entries=10)
+        messages = ["service: a", "service: b", "service: a", "service: a"]
+        first = cache.encode(messages, encoder)
+        self.assertEqual(encoder.encoded, ["service: a", "service: b"])
+        np.testing.assert_array_equal(first, encoder(messages))
+        encoder.encoded.clear()
+        cache.encode(["service: b", "service: c"], encoder)
+        self.assertEqual(encoder.encoded, ["service: c"])
+        self.assertEqual((cache.hits, cache.misses), (3, 3))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_lru_eviction(self):
+        encoder = FakeEncoder()
+        cache = EmbeddingCache("fake-model", max_entries=2)
+        cache.encode(["x", "y"], encoder)
+        cache.encode(["x"], encoder)
+        cache.encode(["z"], encoder)
+        self.assertEqual(len(cache), 2)
+        encoder.encoded.clear()
+        cache.encode(["x", "y"], encoder)
+        self.assertEqual(encoder.encoded, ["y"])
+        # Entries own their memory rather than viewing the encoded batch
+        self.assertTrue(all(vector.base is None for vector in cache._memory.values()))
+
+    def test_disk_tier_is_shared_and_keyed_by_model(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache.sqlite"
+            EmbeddingCache("model-a", path=path).encode(["alpha", "beta"], FakeEncoder())
+            encoder = FakeEncoder()
+            warm = EmbeddingCache("model-a", max_entries=0, path=path)
+            vectors = warm.encode(["beta", "alpha"], encoder)
+            self.assertEqual(encoder.encoded, [])
+            np.testing.assert_array_equal(vectors, FakeEncoder()(["beta", "alpha"]))
+            other = FakeEncoder()
+            EmbeddingCache("model-b", path=path).encode(["alpha"], other)
+            self.assertEqual(other.encoded, ["alpha"])
+            warm.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
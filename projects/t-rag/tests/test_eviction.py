@@ -0,0 +1,185 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from conftest import unit_vectors
+from t_rag.ann_index import IVFIndex
+from t_rag.config import StoreConfig
+from t_rag.eviction import EvictionPolicy
+from t_rag.span_table import SpanTable
+from t_rag.trace_loader import SpanRecord
+from t_rag.vector_memory import VectorMemoryStore
+
+DIM = 16
+NOW = 1_700_000_000
+
+
+def _incident(index: int, spans: int = 10, service: str = "checkout"):
+    """Spans of incident ``index``, which started ``index`` minutes after NOW."""
+    records = [
+        SpanRecord(
+            trace_id=f"incident-{index}",
+            span_id=f"{index}-{i}",
+            parent_id=None,
+            service_name=service,
+            operation=f"op-{i}",
+            start_time=(NOW + 60 * index) * 10**9 + i,
+            end_time=None,
+            attributes={"incident": index, "span": i},
+            status="ERROR" if i == 0 else "OK",
+            message=f"{service} incident {index} span {i}",
+        )
+        for i in range(spans)
+    ]
+    return unit_vectors(spans, DIM, index), records
+
+
+def _trace_ids(store: VectorMemoryStore, ids) -> set:
+    return {store.get_metadata(int(i))["trace_id"] for i in np.ravel(ids) if i >= 0}
+
+
+def _live_services(store: VectorMemoryStore) -> dict:
+    counts: dict = {}
+    for i in range(len(store)):
+        if store._alive[i]:
+            service = store.get_metadata(i)["service_name"]
+            counts[service] = counts.get(service, 0) + 1
+    return counts
+
+
+class SpanTableCompactionTests(unittest.TestCase):
+    def test_compact_keeps_rows_and_releases_strings(self):
+        records = _incident(0)[1] + _incident(1)[1]
+        records[3].resource_attributes = {"service.name": "checkout"}
+        records[4].start_time = "2024-01-01T00:00:00Z"
+        table = SpanTable.from_records(records)
+        strings = len(table.strings)
+        keep = np.array([3, 4, 12, 19])
+        table.compact(keep)
+        self.assertEqual(len(table), 4)
+        for row, old in enumerate(keep):
+            expected = dict(records[old].__dict__)
+            self.assertEqual(table.to_dict(row), expected)
+        self.assertLess(len(table.strings), strings)
+        table.append(records[0])
+        self.assertEqual(table.to_dict(4), records[0].__dict__)
+
+
+class EvictionTests(unittest.TestCase):
+    def test_capacity_keeps_newest_incidents_and_memory_flat(self):
+        store = VectorMemoryStore(dimension=DIM, eviction=EvictionPolicy(max_rows=50, compact_ratio=0.2))
+        capacities = []
+        for index in range(30):
+            store.add_records(*_incident(index))
+            self.assertLessEqual(store.live_rows, 50)
+            capacities.append((store.capacity, store.spans.capacity, len(store.spans.strings)))
+        self.assertEqual(store.live_rows, 50)
+        # Slots and interned strings are reclaimed instead of growing
+        self.assertLessEqual(len(store), 50 / 0.8)
+        self.assertEqual(capacities[-1], capacities[15])
+        live = {store.get_metadata(i)["trace_id"] for i in range(len(store)) if store._alive[i]}
+        self.assertEqual(live, {f"incident-{i}" for i in range(25, 30)})
+        ids, _ = store.query_batch(unit_vectors(5, DIM, 99), k=len(store))
+        self.assertLessEqual(_trace_ids(store, ids), live)
+
+    def test_least_recently_retrieved_rows_survive(self):
+        store = VectorMemoryStore(dimension=DIM, eviction=EvictionPolicy(max_rows=30, policy="lru"))
+        for index in range(3):
+            store.add_records(*_incident(index))
+        queries, _ = _incident(0)
+        store.query_batch(queries, k=1)
+        store.add_records(*_incident(3))
+        live = {store.get_metadata(i)["trace_id"] for i in range(len(store)) if store._alive[i]}
+        self.assertEqual(live, {"incident-0", "incident-2", "incident-3"})
+
+    def test_service_quotas_and_ttl(self):
+        policy = EvictionPolicy(service_quota=15, service_quotas={"payment": 5})
+        store = VectorMemoryStore(dimension=DIM, eviction=policy)
+        for index in range(4):
+            store.add_records(*_incident(index, service="checkout"))
+            store.add_records(*_incident(index, service="payment"))
+        # The newest incident is kept whole even where it exceeds a quota
+        self.assertEqual(_live_services(store), {"checkout": 15, "payment": 10})
+        store.add_records(*_incident(4, service="checkout"))
+        self.assertEqual(_live_services(store), {"checkout": 15, "payment": 5})
+        store.eviction.ttl_seconds = 3600
+        # Incident 3 started at NOW + 180 s and incident 4 at NOW + 240 s
+        self.assertEqual(store.evict(now=NOW + 170 + 3600), 0)
+        self.assertEqual(store.evict(now=NOW + 200 + 3600), 10)
+        self.assertEqual(_live_services(store), {"checkout": 10})
+        self.assertEqual(store.evict(now=NOW + 250 + 3600), 10)
+        self.assertEqual(store.query_batch(unit_vectors(1, DIM, 5), k=3)[0].size, 0)
+
+    def test_delete_compact_and_snapshot_rewrite(self):
+        store = VectorMemoryStore(dimension=DIM, storage="int8", rescore_factor=2, trace_candidates=2)
+        for index in range(4):
+            store.add_records(*_incident(index))
+        with tempfile.TemporaryDirectory() as tmp:
+            store.snapshot(tmp)
+            self.assertEqual(store.delete_traces(["incident-1"]), 10)
+            queries, _ = _incident(1)
+            ids, _ = store.query_batch(queries, k=5)
+            self.assertNotIn("incident-1", _trace_ids(store, ids))
+            store.add_records(*_incident(4))
+            self.assertEqual(store.snapshot(tmp), 40)
+            restored = VectorMemoryStore.restore(tmp)
+            self.assertEqual(
+                [restored.get_metadata(i)["span_id"] for i in range(40)],
+                [store.get_metadata(i)["span_id"] for i in range(40)],
+            )
+            queries, _ = _incident(4)
+            self.assertEqual(_trace_ids(store, store.query_batch(queries, k=1)[0]), {"incident-4"})
+
+    def test_compaction_resets_ivf_assignments(self):
+        store = VectorMemoryStore(
+            dimension=DIM,
+            ann_index=IVFIndex(n_lists=8, n_probe=1),
+            eviction=EvictionPolicy(max_rows=200, compact_ratio=0.2),
+        )
+        for index in range(20):
+            store.add_records(*_incident(index))
+        store.query_batch(unit_vectors(1, DIM, 99), k=1)
+        for index in range(20, 25):
+            store.add_records(*_incident(index))
+        self.assertEqual(len(store), 200)
+        # Every live row must still be its own nearest neighbour
+        for index in range(5, 25):
+            queries, _ = _incident(index)
+            ids, _ = store.query_batch(queries, k=1)
+            self.assertEqual(
+                [store.get_metadata(int(i))["span_id"] for i in ids[:, 0]],
+                [f"{index}-{i}" for i in range(10)],
+            )
+
+    def test_rows_deleted_before_trace_indexing_stay_out(self):
+        store = VectorMemoryStore(dimension=DIM, trace_candidates=1)
+        for index in range(20):
+            store.add_records(*_incident(index))
+        store.delete_traces(["incident-0"])
+        store.compact()
+        self.assertEqual(store.delete_traces(["incident-3"]), 10)
+        # The pooled vector of the deleted trace is the closest to the query
+        query = _incident(3)[0].mean(axis=0, keepdims=True)
+        ids, _ = store.query_batch(query, k=5)
+        self.assertEqual(ids.shape, (1, 5))
+        self.assertNotIn("incident-3", _trace_ids(store, ids))
+
+    def test_from_config(self):
+        config = StoreConfig(dimension=DIM, max_rows=20, eviction_policy="lru", service_quotas={"a": 3})
+        store = VectorMemoryStore.from_config(config)
+        self.assertEqual((store.eviction.max_rows, store.eviction.policy), (20, "lru"))
+        self.assertEqual(store.eviction.quota("a"), 3)
+        with self.assertRaises(ValueError):
+            EvictionPolicy(policy="random")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.config import ModelConfig
+from t_rag.llm_cache import ResponseCache, prompt_fingerprint
+from t_rag.llm_reasoner import StubLLMReasoner, create_reasoner
+
+SPANS = [
+    {"message": "service: gateway; operation: GET /orders; status: OK"},
+    {"message": "service: db; operation: SELECT; status: error timeout"},
+]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def test_fingerprint_normalises_whitespace_and_includes_params(self):
+        base = [{"role": "user", "content": "a  b\n c"}]
+        same = [{"role": "user", "content": " a b c "}]
+        self.assertEqual(prompt_fingerprint(base, "m", 0.2), prompt_fingerprint(same, "m", 0.2))
+        self.assertNotEqual(prompt_fingerprint(base, "m", 0.2), prompt_fingerprint(base, "m", 0.3))
+        self.assertNotEqual(prompt_fingerprint(base, "m", 0.2), prompt_fingerprint(base, "n", 0.2))
+
+    def test_ttl_and_lru_eviction(self):
+        clock = FakeClock()
+        cache = ResponseCache(max_entries=2, ttl_seconds=10, clock=clock)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        self.assertEqual(cache.get("a"), "1")
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        clock.now = 11
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 1)
+
+    def test_concurrent_requests_are_coalesced(self):
+        cache = ResponseCache()
+        started = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return "answer"
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            first = pool.submit(cache.get_or_compute, "key", compute)
+            started.wait()
+            others = [pool.submit(cache.get_or_compute, "key", compute) for _ in range(7)]
+            results = [first.result()] + [f.result() for f in others]
+        self.assertEqual(results, ["answer"] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits + cache.coalesced, 7)
+
+    def test_errors_are_not_cached(self):
+        cache = ResponseCache()
+
+        def fail():
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_compute("key", fail)
+        self.assertEqual(cache.get_or_compute("key", lambda: "ok"), "ok")
+
+    def test_cancelled_async_caller_does_not_fail_waiters(self):
+        cache = ResponseCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        async def run():
+            first = asyncio.wait_for(cache.aget_or_compute("key", compute), 0.01)
+            second = asyncio.wait_for(cache.aget_or_compute("key", compute), 1)
+            return await asyncio.gather(first, second, return_exceptions=True)
+
+        first, second = asyncio.run(run())
+        self.assertIsInstance(first, asyncio.TimeoutError)
+        self.assertEqual(second, "answer")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get("key"), "answer")
+
+
+class StubReasonerTests(unittest.TestCase):
+    def test_repeated_analysis_hits_cache(self):
+        reasoner = create_reasoner(ModelConfig(llm_provider="stub"))
+        self.assertIsInstance(reasoner, StubLLMReasoner)
+        first = reasoner.generate_root_cause(SPANS, [])
+        second = reasoner.generate_root_cause(SPANS, [])
+        self.assertEqual(first, second)
+        self.assertIn("db", first["root_cause"])
+        self.assertEqual(reasoner.calls, 1)
+
+    def test_cache_can_be_disabled(self):
+        reasoner = StubLLMReasoner(ModelConfig(llm_cache_size=0))
+        reasoner.generate_root_cause(SPANS, [])
+        reasoner.generate_root_cause(SPANS, [])
+        self.assertEqual(reasoner.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
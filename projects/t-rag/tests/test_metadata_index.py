@@ -0,0 +1,113 @@
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from conftest import unit_vectors
+from t_rag.ann_index import IVFIndex
+from t_rag.metadata_index import MetadataIndex, SpanFilter, to_epoch_seconds
+from t_rag.trace_loader import SpanRecord
+from t_rag.vector_memory import VectorMemoryStore
+
+DAY = 86_400
+NOW = 1_700_000_000
+
+
+def _records(count: int):
+    services = ["payment", "checkout", "search"]
+    return [
+        SpanRecord(
+            trace_id=f"t{i // 10}",
+            span_id=f"s{i}",
+            parent_id=None,
+            service_name=services[i % 3],
+            operation="op",
+            start_time=str((NOW - (i % 14) * DAY) * 10**9),
+            end_time=None,
+            attributes={},
+            status="ERROR" if i % 4 == 0 else "OK",
+            message=f"span {i}",
+        )
+        for i in range(count)
+    ]
+
+
+def _matches(rec: SpanRecord, since: float) -> bool:
+    return rec.service_name == "payment" and rec.status == "ERROR" and int(rec.start_time) / 1e9 >= since
+
+
+class MetadataIndexTests(unittest.TestCase):
+    def test_timestamp_formats(self):
+        self.assertEqual(to_epoch_seconds(NOW * 10**9), NOW)
+        self.assertEqual(to_epoch_seconds(str(NOW * 1000)), NOW)
+        self.assertEqual(to_epoch_seconds("2023-11-14T22:13:20Z"), NOW)
+        self.assertEqual(to_epoch_seconds(datetime.fromtimestamp(NOW, tz=timezone.utc)), NOW)
+        self.assertIsNone(to_epoch_seconds("not a time"))
+
+    def test_candidates_intersect_postings(self):
+        index = MetadataIndex(bucket_seconds=DAY)
+        records = _records(300)
+        index.add_metadata(rec.__dict__ for rec in records)
+        since = NOW - 7 * DAY + 1
+        where = SpanFilter(services=["payment"], statuses=["error"], since=since)
+        expected = [i for i, rec in enumerate(records) if _matches(rec, since)]
+        np.testing.assert_array_equal(index.candidates(where), expected)
+        self.assertIsNone(index.candidates(SpanFilter()))
+        self.assertEqual(len(index.candidates(SpanFilter(errors_only=True))), 75)
+        self.assertEqual(len(index.candidates(SpanFilter(services=["unknown"]))), 0)
+
+    def test_repeated_filter_values_do_not_duplicate_rows(self):
+        records = _records(30)
+        store = VectorMemoryStore(dimension=16)
+        store.add_records(unit_vectors(30, 16), records)
+        store._sync_metadata_index()
+        index = store.metadata_index
+        payment = index.candidates(SpanFilter(services=["payment"]))
+        np.testing.assert_array_equal(index.candidates(SpanFilter(services=["payment"] * 3)), payment)
+        errors = index.candidates(SpanFilter(statuses=["ERROR"]))
+        np.testing.assert_array_equal(index.candidates(SpanFilter(statuses=["error", "ERROR"])), errors)
+        ids, _ = store.query_batch(unit_vectors(1, 16, 5), k=3, where=SpanFilter(services=["payment"] * 3))
+        self.assertEqual(len(set(ids[0].tolist())), 3)
+
+    def test_filtered_query_returns_only_matching_rows(self):
+        records = _records(600)
+        vectors = unit_vectors(600, 16)
+        since = NOW - 7 * DAY + 1
+        expected = {i for i, rec in enumerate(records) if _matches(rec, since)}
+        where = SpanFilter(services=["payment"], statuses=["ERROR"], since=since)
+        for ann_index in (None, IVFIndex(n_probe=64)):
+            store = VectorMemoryStore(dimension=16, ann_index=ann_index)
+            store.add_records(vectors, records)
+            store.filtered_exact_limit = 10
+            ids, distances = store.query_batch(vectors[:5], k=8, where=where, exclude_trace_ids={"t0"})
+            self.assertEqual(ids.shape, (5, 8))
+            self.assertTrue(set(ids.ravel().tolist()) <= expected - set(range(10)))
+            self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+        meta, _ = store.query(vectors[1], k=1, where=SpanFilter(services=["checkout"]))[0]
+        self.assertEqual(meta["span_id"], "s1")
+
+    def test_restored_store_is_indexed_on_first_filtered_query(self):
+        records = _records(60)
+        vectors = unit_vectors(60, 8)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorMemoryStore(dimension=8)
+            store.add_records(vectors, records)
+            store.snapshot(tmp)
+            restored = VectorMemoryStore.restore(tmp)
+            restored.add_records(vectors[:3], _records(3))
+            self.assertEqual(len(restored.metadata_index), 0)
+            ids, _ = restored.query_batch(vectors[:1], k=100, where=SpanFilter(services=["search"]))
+            self.assertEqual(len(restored.metadata_index), 63)
+            self.assertEqual(sorted(ids[0].tolist()), [i for i in range(60) if i % 3 == 2] + [62])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from conftest import unit_vectors
+from t_rag.config import StoreConfig
+from t_rag.persistence import (
+    MANIFEST_FILE,
+    TRACE_KEYS_FILE,
+    VECTORS_FILE,
+    append_snapshot,
+    read_manifest,
+    replace_snapshot,
+    trace_key,
+)
+from t_rag.vector_memory import VectorMemoryStore
+
+
+class SnapshotTests(unittest.TestCase):
+    def test_snapshot_restore_roundtrip_and_append(self):
+        vectors = unit_vectors(30, 8)
+        metadata = [{"span_id": f"s{i}", "attributes": {"n": i}} for i in range(30)]
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorMemoryStore(dimension=8, n_neighbors=2)
+            store.add(vectors[:20], metadata[:20])
+            self.assertEqual(store.snapshot(tmp), 20)
+
+            restored = VectorMemoryStore.restore(tmp, n_neighbors=2)
+            self.assertIsInstance(restored.embeddings, np.memmap)
+            np.testing.assert_array_equal(restored.embeddings, vectors[:20])
+            self.assertEqual(restored.get_metadata(7), metadata[7])
+            self.assertEqual(restored.query(vectors[3], k=1)[0][0], metadata[3])
+
+            restored.add(vectors[20:], metadata[20:])
+            self.assertEqual(restored.get_metadata(25), metadata[25])
+            self.assertEqual(restored.snapshot(tmp), 30)
+            self.assertEqual((Path(tmp) / VECTORS_FILE).stat().st_size, 30 * 8 * 4)
+
+            reopened = VectorMemoryStore.restore(tmp)
+            self.assertEqual(len(reopened), 30)
+            self.assertEqual(list(reopened._metadata), metadata)
+            ids, _ = reopened.query_batch(vectors[28:30], k=1)
+            self.assertEqual(ids[:, 0].tolist(), [28, 29])
+
+            with self.assertRaises(ValueError):
+                VectorMemoryStore(dimension=8).snapshot(tmp)
+
+    def test_trace_keys_survive_restore(self):
+        vectors = unit_vectors(6, 8)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorMemoryStore(dimension=8)
+            store.add(vectors, [{"trace_id": "old" if i < 3 else "new"} for i in range(6)])
+            store.snapshot(tmp)
+            restored = VectorMemoryStore.restore(tmp)
+            ids, _ = restored.query_batch(vectors[4:5], k=6, exclude_trace_ids=["new"])
+            self.assertEqual(sorted(ids[0].tolist()), [0, 1, 2])
+
+    def test_snapshot_without_trace_keys_file(self):
+        vectors = unit_vectors(6, 8)
+        metadata = [{"trace_id": "old" if i < 3 else "new"} for i in range(6)]
+        with tempfile.TemporaryDirectory() as tmp:
+            append_snapshot(tmp, vectors[:4], metadata[:4], 8)
+            # Layout written before the keys file was introduced
+            (Path(tmp) / TRACE_KEYS_FILE).unlink()
+            restored = VectorMemoryStore.restore(tmp)
+            ids, _ = restored.query_batch(vectors[3:4], k=4, exclude_trace_ids=["new"])
+            self.assertEqual(sorted(ids[0].tolist()), [0, 1, 2])
+            expected = [trace_key(meta["trace_id"]) for meta in metadata]
+            self.assertEqual(append_snapshot(tmp, vectors[4:], metadata[4:], 8, trace_keys=expected[4:]), 6)
+            self.assertEqual(np.fromfile(Path(tmp) / TRACE_KEYS_FILE, dtype=np.int64).tolist(), expected)
+
+    def test_uncommitted_tail_is_ignored(self):
+        vectors = unit_vectors(4, 8)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorMemoryStore(dimension=8)
+            store.add(vectors[:2], [{"id": 0}, {"id": 1}])
+            store.snapshot(tmp)
+            # Simulate a writer that crashed before committing the manifest
+            with (Path(tmp) / VECTORS_FILE).open("ab") as f:
+                f.write(b"\x00" * 37)
+            restored = VectorMemoryStore.restore(tmp)
+            self.assertEqual(len(restored), 2)
+            restored.add(vectors[2:], [{"id": 2}, {"id": 3}])
+            restored.snapshot(tmp)
+            manifest = json.loads((Path(tmp) / MANIFEST_FILE).read_text())
+            self.assertEqual(manifest["rows"], 4)
+            np.testing.assert_array_equal(VectorMemoryStore.restore(tmp).embeddings, vectors)
+
+    def test_replace_keeps_mapped_readers_and_recovers_interrupted_swap(self):
+        vectors = unit_vectors(20, 8)
+        metadata = [{"span_id": f"s{i}"} for i in range(20)]
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "store"
+            append_snapshot(root, vectors, metadata, 8)
+            reader = VectorMemoryStore.restore(root)
+            self.assertEqual(replace_snapshot(root, vectors[10:], metadata[10:], 8), 10)
+            # The old files are moved aside, not truncated under the reader
+            np.testing.assert_array_equal(reader.embeddings, vectors)
+            self.assertEqual(reader.get_metadata(3), metadata[3])
+            self.assertEqual(VectorMemoryStore.restore(root).get_metadata(0), metadata[10])
+            self.assertEqual(sorted(os.listdir(tmp)), ["store", "store.lock"])
+
+            # Crash after moving the old snapshot aside, before renaming the new one
+            append_snapshot(Path(tmp) / "store.new", vectors[:5], metadata[:5], 8)
+            os.replace(root, Path(tmp) / "store.old")
+            # Readers use the complete new snapshot without touching the directories
+            self.assertEqual(read_manifest(root)["rows"], 5)
+            self.assertEqual(VectorMemoryStore.restore(root).get_metadata(4), metadata[4])
+            self.assertEqual(sorted(os.listdir(tmp)), ["store.lock", "store.new", "store.new.lock", "store.old"])
+            # The next writer completes the swap
+            self.assertEqual(append_snapshot(root, vectors[5:7], metadata[5:7], 8), 7)
+            self.assertEqual(sorted(os.listdir(tmp)), ["store", "store.lock", "store.new.lock"])
+
+    def test_from_config_restores_persisted_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = StoreConfig(dimension=8, n_neighbors=3, persist_path=tmp)
+            self.assertEqual(len(VectorMemoryStore.from_config(config)), 0)
+            store = VectorMemoryStore(dimension=8)
+            store.add(unit_vectors(5, 8), [{"id": i} for i in range(5)])
+            store.snapshot(tmp)
+            self.assertEqual(len(VectorMemoryStore.from_config(config)), 5)
+            with self.assertRaises(ValueError):
+                VectorMemoryStore.from_config(StoreConfig(dimension=4, persist_path=tmp))
+
+
+if __name__ == "__main__":
+    unittest.main()
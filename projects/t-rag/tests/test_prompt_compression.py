@@ -0,0 +1,74 @@
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.config import ModelConfig
+from t_rag.llm_reasoner import StubLLMReasoner
+from t_rag.prompt_compression import compress_spans, estimate_tokens, summarise_spans
+
+
+def _span(i: int, status: str = "OK", duration: int = 10):
+    return {
+        "message": f"service: api; operation: GET /items/{i}; status: {status}",
+        "status": status,
+        "start_time": 0,
+        "end_time": duration,
+    }
+
+
+class PromptCompressionTests(unittest.TestCase):
+    def test_repeated_messages_are_grouped_with_counts(self):
+        spans = [_span(i) for i in range(100)]
+        lines, omitted = compress_spans(spans, token_budget=1000, slow_fraction=0)
+        self.assertEqual(omitted, 0)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith("1. [x100] "))
+
+    def test_errors_and_slow_spans_are_kept_verbatim_first(self):
+        spans = [_span(i) for i in range(50)]
+        spans[7] = _span(7, status="ERROR")
+        spans[30] = _span(30, duration=5000)
+        lines, _ = compress_spans(spans, token_budget=1000, slow_fraction=0.02)
+        self.assertIn("GET /items/7; status: ERROR", lines[0])
+        self.assertIn("GET /items/30", lines[1])
+        self.assertIn("[x48]", lines[2])
+
+    def test_output_respects_token_budget(self):
+        spans = [{"message": f"unique message {chr(65 + i % 26)} {'x' * (i % 7)}"} for i in range(500)]
+        text = summarise_spans(spans, token_budget=200)
+        # One token per line for the newline, as in compress_spans
+        self.assertLessEqual(sum(estimate_tokens(line) + 1 for line in text.splitlines()), 200)
+        self.assertIn("more spans omitted", text)
+
+    def test_repeated_errors_are_grouped_with_counts(self):
+        spans = [_span(i, status="ERROR") for i in range(2000)] + [_span(i) for i in range(10)]
+        spans.append({"message": "service: db; operation: SELECT; status: ERROR", "status": "ERROR"})
+        lines, omitted = compress_spans(spans, token_budget=100, slow_fraction=0)
+        self.assertEqual(omitted, 0)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0], "1. [x2000] service: api; operation: GET /items/0; status: ERROR")
+        self.assertIn("SELECT", lines[1])
+        self.assertTrue(lines[2].startswith("3. [x10] "))
+
+    def test_prompt_size_is_bounded_and_stub_still_finds_error(self):
+        spans = [_span(i) for i in range(5000)]
+        spans[4321] = _span(4321, status="ERROR")
+        reasoner = StubLLMReasoner(ModelConfig(prompt_token_budget=500, llm_cache_size=0))
+        messages = reasoner._build_prompt(spans, [_span(i) for i in range(1000)])
+        self.assertLess(estimate_tokens(messages[1]["content"]), 600)
+        result = reasoner.generate_root_cause(spans, [])
+        self.assertIn("GET /items/4321", result["root_cause"])
+
+    def test_zero_budget_keeps_legacy_listing(self):
+        reasoner = StubLLMReasoner(ModelConfig(prompt_token_budget=0, llm_cache_size=0))
+        messages = reasoner._build_prompt([_span(i) for i in range(3)], [])
+        self.assertIn("3. service: api; operation: GET /items/2", messages[1]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
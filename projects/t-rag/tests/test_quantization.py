@@ -0,0 +1,70 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from conftest import unit_vectors
+from t_rag.ann_index import exact_search, recall_at_k
+from t_rag.quantization import QuantizedMatrix, dequantize, quantize
+from t_rag.vector_memory import VectorMemoryStore
+
+
+class QuantizationTests(unittest.TestCase):
+    def test_int8_codes_reconstruct_rows(self):
+        vectors = unit_vectors(50, 32)
+        codes, scales = quantize(vectors, "int8")
+        self.assertEqual(codes.dtype, np.int8)
+        np.testing.assert_allclose(dequantize(codes, scales), vectors, atol=0.01)
+        matrix = QuantizedMatrix(codes, scales)
+        matrix.block_rows = 7
+        queries = vectors[:3]
+        np.testing.assert_allclose(matrix.dot(queries), queries @ matrix[:].T, rtol=1e-5, atol=1e-6)
+
+    def test_compact_storage_reduces_memory_and_keeps_recall(self):
+        vectors, queries = unit_vectors(2000, 64), unit_vectors(50, 64, seed=1)
+        exact_ids, _ = exact_search(vectors, queries, 10)
+        sizes = {}
+        for storage in ("float32", "float16", "int8"):
+            store = VectorMemoryStore(dimension=64, storage=storage)
+            store.add(vectors, [{"id": i} for i in range(len(vectors))])
+            ids, _ = store.query_batch(queries, k=10)
+            self.assertGreater(recall_at_k(ids, exact_ids), 0.9)
+            sizes[storage] = store.nbytes
+        self.assertEqual(sizes["float16"] * 2, sizes["float32"])
+        self.assertLess(sizes["int8"] * 3, sizes["float32"])
+
+    def test_rescoring_returns_exact_distances(self):
+        vectors, queries = unit_vectors(1000, 32), unit_vectors(20, 32, seed=2)
+        exact_ids, exact_dists = exact_search(vectors, queries, 5)
+        store = VectorMemoryStore(dimension=32, storage="int8", rescore_factor=4)
+        store.add(vectors, [{"id": i} for i in range(len(vectors))])
+        ids, dists = store.query_batch(queries, k=5)
+        self.assertEqual(recall_at_k(ids, exact_ids), 1.0)
+        np.testing.assert_allclose(dists, exact_dists, atol=1e-5)
+        self.assertEqual(store.query(queries[0], k=1)[0][0], {"id": int(exact_ids[0, 0])})
+
+    def test_rescoring_reads_snapshot_after_persisting(self):
+        vectors, queries = unit_vectors(300, 16), unit_vectors(10, 16, seed=3)
+        exact_ids, _ = exact_search(vectors, queries, 3)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorMemoryStore(dimension=16, storage="float16", rescore_factor=3)
+            store.add(vectors[:200], [{"id": i} for i in range(200)])
+            store.snapshot(tmp)
+            self.assertEqual(store.nbytes, 200 * 16 * 2)
+            store.add(vectors[200:], [{"id": i} for i in range(200, 300)])
+            ids, _ = store.query_batch(queries, k=3)
+            self.assertEqual(recall_at_k(ids, exact_ids), 1.0)
+            store.snapshot(tmp)
+            restored = VectorMemoryStore.restore(tmp, storage="int8", rescore_factor=3)
+            np.testing.assert_array_equal(restored.query_batch(queries, k=3)[0][:, 0], exact_ids[:, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
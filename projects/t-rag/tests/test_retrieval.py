@@ -0,0 +1,50 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.retrieval import ContextAggregator
+
+
+METADATA = [
+    {"trace_id": "t1", "span_id": "a", "message": "t1/a"},
+    {"trace_id": "t1", "span_id": "b", "message": "t1/b"},
+    {"trace_id": "t2", "span_id": "c", "message": "t2/c"},
+    {"trace_id": "t3", "span_id": "d", "message": "t3/d"},
+    # Same span stored twice must be deduplicated
+    {"trace_id": "t1", "span_id": "a", "message": "t1/a"},
+]
+
+
+class ContextAggregatorTests(unittest.TestCase):
+    def test_traces_ranked_by_total_similarity(self):
+        aggregator = ContextAggregator()
+        aggregator.add(
+            np.array([[2, 0], [0, 1]]),
+            np.array([[0.0, 0.5], [0.1, 0.2]], dtype=np.float32),
+        )
+        aggregator.add(np.array([[4, 3], [-1, -1]]), np.array([[0.3, 0.9], [0, 0]], dtype=np.float32))
+        traces = aggregator.top_traces(METADATA.__getitem__)
+        self.assertEqual([trace.trace_id for trace in traces], ["t1", "t2", "t3"])
+        self.assertEqual(traces[0].hits, 4)
+        self.assertAlmostEqual(traces[0].score, 0.5 + 0.9 + 0.8 + 0.7, places=5)
+        self.assertEqual([ctx["message"] for ctx in traces[0].contexts], ["t1/a", "t1/b"])
+        self.assertEqual(traces[1].contexts, [METADATA[2]])
+
+    def test_limits(self):
+        aggregator = ContextAggregator()
+        aggregator.add(np.array([[0, 1, 2, 3]]), np.zeros((1, 4), dtype=np.float32))
+        traces = aggregator.top_traces(METADATA.__getitem__, max_traces=1, max_spans_per_trace=1)
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(traces[0].trace_id, "t1")
+        self.assertEqual(len(traces[0].contexts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
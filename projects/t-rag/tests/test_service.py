@@ -0,0 +1,98 @@
+import os
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag import service
+from t_rag.config import TRAGConfig
+from t_rag.llm_reasoner import StubLLMReasoner
+from t_rag.service import TragEngine, get_engine, run
+from t_rag.trace_loader import SpanRecord
+
+OFFLINE_ENV = {
+    "TRAG_EMBEDDING_BACKEND": "hashing",
+    "TRAG_LLM_PROVIDER": "stub",
+    "TRAG_EMBEDDING_CACHE_SIZE": "0",
+    "TRAG_EMBEDDING_CACHE_PATH": "",
+    "TRAG_STORE_PATH": "",
+}
+
+
+def _offline_config() -> TRAGConfig:
+    config = TRAGConfig()
+    config.model.embedding_backend = "hashing"
+    config.model.llm_provider = "stub"
+    config.model.embedding_cache_size = 0
+    config.model.embedding_cache_path = None
+    config.store.persist_path = None
+    return config
+
+
+def _incident(index: int):
+    return [
+        SpanRecord(f"incident-{index}", f"{index}-{i}", None, f"svc-{index}", "handle", 0, 1, {},
+                   "ERROR" if i == 0 else "OK", f"service: svc-{index}; operation: handle {i}; status: ERROR")
+        for i in range(3)
+    ]
+
+
+class TragEngineTests(unittest.TestCase):
+    def test_concurrent_analyses_are_isolated_and_overlap_on_the_llm(self):
+        config = _offline_config()
+        config.store.remember_incidents = True
+        reasoner = StubLLMReasoner(config.model, latency=0.05)
+        engine = TragEngine(config, reasoner=reasoner)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: engine.analyze(spans=_incident(i)), range(16)))
+        for index, result in enumerate(results):
+            self.assertIn(f"svc-{index};", result["root_cause"])
+            self.assertNotIn(f"incident-{index}", [trace["trace_id"] for trace in result["retrieved_traces"]])
+        self.assertEqual(engine.store.live_rows, 16 * 3)
+        self.assertEqual(reasoner.calls, 16)
+        # The LLM round trip runs outside the engine lock
+        self.assertGreater(reasoner.peak_in_flight, 1)
+        self.assertIsNone(config.store.dimension)
+        engine.close()
+
+    def test_analyze_requires_exactly_one_source(self):
+        engine = TragEngine(_offline_config())
+        with self.assertRaises(ValueError):
+            engine.analyze()
+        with self.assertRaises(ValueError):
+            engine.analyze(trace_path="trace.json", spans=_incident(0))
+
+
+class EngineSingletonTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, OFFLINE_ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        service._ENGINE = None
+        self.addCleanup(setattr, service, "_ENGINE", None)
+
+    def test_get_engine_is_created_once(self):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            engines = list(pool.map(lambda _: get_engine(), range(8)))
+        self.assertTrue(all(engine is engines[0] for engine in engines))
+        self.assertIsInstance(engines[0].reasoner, StubLLMReasoner)
+
+    def test_run_delegates_to_the_shared_engine(self):
+        trace = ROOT / "examples" / "sample_trace.json"
+        first = run(str(trace))
+        engine = get_engine()
+        with mock.patch.object(engine, "analyze", wraps=engine.analyze) as analyze:
+            second = run(str(trace))
+        analyze.assert_called_once_with(str(trace))
+        self.assertEqual(second["root_cause"], first["root_cause"])
+        self.assertIs(get_engine(), engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.span_table import SpanTable
+from t_rag.trace_loader import SpanRecord
+from t_rag.vector_memory import VectorMemoryStore
+
+
+def _record(i: int, trace: str = "t1", status: str = "OK", start=None) -> SpanRecord:
+    return SpanRecord(
+        trace_id=trace,
+        span_id=f"s{i}",
+        parent_id=None if i == 0 else "s0",
+        service_name="checkout",
+        operation="GET /cart",
+        start_time=str(1_700_000_000_000_000_000 + i) if start is None else start,
+        end_time=1_700_000_000_000_500_000 + i,
+        attributes={"http.method": "GET", "retry": i},
+        status=status,
+        message=f"service: checkout; operation: GET /cart; status: {status}",
+    )
+
+
+class SpanTableTests(unittest.TestCase):
+    def test_rows_round_trip_with_numeric_times(self):
+        records = [_record(i) for i in range(3)] + [_record(3, start="2024-01-01T00:00:00Z")]
+        table = SpanTable.from_records(records)
+        self.assertEqual(len(table), 4)
+        expected = dict(records[1].__dict__, start_time=1_700_000_000_000_000_001)
+        self.assertEqual(table.to_dict(1), expected)
+        self.assertEqual(table[3].start_time, "2024-01-01T00:00:00Z")
+        self.assertIsNone(table.record(0).parent_id)
+        self.assertEqual(table.start_times.dtype, np.int64)
+        self.assertEqual(int(table.end_times[2] - table.start_times[2]), 500_000)
+
+    def test_repeated_strings_and_attribute_keys_are_interned(self):
+        table = SpanTable(initial_capacity=2)
+        table.extend(_record(i, status="ERROR" if i % 2 else "OK") for i in range(100))
+        self.assertEqual(len(table), 100)
+        self.assertEqual(len(set(table.service_codes.tolist())), 1)
+        self.assertEqual(sorted(table.statuses._values), ["ERROR", "OK"])
+        self.assertEqual(table.status_codes.dtype, np.int16)
+        self.assertEqual(len(table.attribute_keys), 2)
+        self.assertEqual(table.attributes(99), {"http.method": "GET", "retry": 99})
+
+    def test_store_keeps_row_ids_and_builds_metadata_on_demand(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(6, 4)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        store = VectorMemoryStore(dimension=4, initial_capacity=2)
+        store.add(vectors[:2], [{"trace_id": "legacy", "id": 0}, {"trace_id": "legacy", "id": 1}])
+        store.add_records(vectors[2:], [_record(i, trace="t1" if i < 2 else "t2") for i in range(4)])
+        self.assertEqual(len(store.spans), 4)
+        self.assertEqual(store.get_metadata(0), {"trace_id": "legacy", "id": 0})
+        self.assertEqual(store.get_metadata(4)["span_id"], "s2")
+        self.assertEqual(store.get_metadata(-1)["trace_id"], "t2")
+        ids, _ = store.query_batch(vectors[2:3], k=6, exclude_trace_ids={"t1"})
+        self.assertEqual(sorted(ids[0].tolist()), [0, 1, 4, 5])
+        with tempfile.TemporaryDirectory() as tmp:
+            store.snapshot(tmp)
+            restored = VectorMemoryStore.restore(tmp)
+            expected = store.get_metadata(5)
+            del expected["resource_attributes"]
+            self.assertEqual(restored.get_metadata(5), expected)
+            restored.add_records(vectors[:1], [_record(9, trace="t3")])
+            self.assertEqual(restored.get_metadata(6)["span_id"], "s9")
+
+    def test_resource_attributes_are_not_persisted_per_span(self):
+        resource = {"k8s.pod.name": "checkout-5f7", "host.name": "node-1"}
+        records = [_record(i) for i in range(3)]
+        for record in records:
+            record.resource_attributes = resource
+        self.assertNotIn("resource_attributes", records[0].to_metadata())
+        self.assertEqual(records[0].to_metadata()["span_id"], "s0")
+        store = VectorMemoryStore(dimension=4)
+        store.add_records(np.eye(4, dtype=np.float32)[:3], records)
+        self.assertIs(store.get_metadata(1)["resource_attributes"], resource)
+        with tempfile.TemporaryDirectory() as tmp:
+            store.snapshot(tmp)
+            self.assertNotIn("checkout-5f7", (Path(tmp) / "metadata.jsonl").read_text(encoding="utf-8"))
+            restored = VectorMemoryStore.restore(tmp)
+            self.assertNotIn("resource_attributes", restored.get_metadata(2))
+            self.assertEqual(restored.get_metadata(2)["span_id"], "s2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.metadata_index import SpanFilter
+from t_rag.trace_index import TraceIndex
+from t_rag.trace_loader import SpanRecord
+from t_rag.vector_memory import VectorMemoryStore, trace_key
+
+DIM = 32
+
+
+def _traces(n_traces: int, spans_per_trace: int, seed: int = 0):
+    """Spans scattered around one centre per trace, in interleaved order."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_traces, DIM))
+    labels = np.tile(np.arange(n_traces), spans_per_trace)
+    vectors = (centres[labels] + 0.3 * rng.normal(size=(labels.shape[0], DIM))).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    records = [
+        SpanRecord(f"t{label}", f"s{i}", None, "checkout" if label % 2 else "payment", "op",
+                   None, None, {}, "ERROR" if i % 3 == 0 else "OK", f"span {i}")
+        for i, label in enumerate(labels)
+    ]
+    return vectors, records, centres
+
+
+def _queries(centres: np.ndarray, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = (centres + 0.3 * rng.normal(size=centres.shape)).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+class TraceIndexTests(unittest.TestCase):
+    def test_mean_pooling_and_postings(self):
+        index = TraceIndex(DIM)
+        vectors, records, _ = _traces(5, 4)
+        keys = np.array([trace_key(rec.trace_id) for rec in records])
+        index.add(keys[:7], vectors[:7])
+        index.add(np.r_[keys[7:], 0], np.vstack([vectors[7:], vectors[:1]]))
+        self.assertEqual((len(index), index.n_traces), (21, 5))
+        pooled = index.pooled(lambda rows: vectors[rows])
+        for slot in range(5):
+            rows = index.rows(np.array([slot, -1]))
+            # Trace ``t<label>`` owns rows label, label + 5, ...
+            np.testing.assert_array_equal(rows, np.arange(rows[0], 20, 5))
+            mean = vectors[rows].mean(axis=0)
+            np.testing.assert_allclose(pooled[slot], mean / np.linalg.norm(mean), atol=1e-6)
+
+    def test_attention_pooling_emphasises_atypical_spans(self):
+        vectors = np.zeros((10, DIM), dtype=np.float32)
+        vectors[:9, 0] = 1.0
+        vectors[9, 1] = 1.0
+        keys = np.full(10, trace_key("t"))
+        pooled = {}
+        for pooling in ("mean", "attention"):
+            index = TraceIndex(DIM, pooling=pooling)
+            index.add(keys, vectors)
+            pooled[pooling] = index.pooled(lambda rows: vectors[rows])[0]
+        self.assertGreater(pooled["attention"][1], pooled["mean"][1])
+        self.assertAlmostEqual(float(np.linalg.norm(pooled["attention"])), 1.0, places=5)
+        with self.assertRaises(ValueError):
+            TraceIndex(DIM, pooling="max")
+
+
+class CoarseToFineStoreTests(unittest.TestCase):
+    def _stores(self, **kwargs):
+        vectors, records, centres = _traces(40, 25)
+        exact = VectorMemoryStore(dimension=DIM)
+        coarse = VectorMemoryStore(dimension=DIM, trace_candidates=3, **kwargs)
+        for store in (exact, coarse):
+            store.add_records(vectors, records)
+        return exact, coarse, _queries(centres)
+
+    def test_results_match_exact_search_on_separated_traces(self):
+        for pooling in ("mean", "attention"):
+            exact, coarse, queries = self._stores(trace_pooling=pooling)
+            expected, _ = exact.query_batch(queries, k=10)
+            ids, distances = coarse.query_batch(queries, k=10)
+            np.testing.assert_array_equal(ids, expected)
+            self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+            self.assertEqual(coarse.trace_index.n_traces, 40)
+
+    def test_exclusion_and_filters_apply_to_traces(self):
+        _, coarse, queries = self._stores()
+        ids, _ = coarse.query_batch(queries[:1], k=10, exclude_trace_ids=["t0"])
+        self.assertNotIn("t0", {coarse.get_metadata(i)["trace_id"] for i in ids[0]})
+        ids, _ = coarse.query_batch(queries[:1], k=10, where=SpanFilter(services=["checkout"], errors_only=True))
+        self.assertEqual(ids.shape, (1, 10))
+        for i in ids[0]:
+            meta = coarse.get_metadata(i)
+            self.assertEqual((meta["service_name"], meta["status"]), ("checkout", "ERROR"))
+
+    def test_each_query_searches_only_its_own_traces(self):
+        vectors, records, centres = _traces(40, 25)
+        store = VectorMemoryStore(dimension=DIM, trace_candidates=1)
+        store.add_records(vectors, records)
+        # The two queries have disjoint top traces
+        ids, distances = store.query_batch(_queries(centres[:2]), k=30)
+        self.assertEqual(ids.shape, (2, 25))
+        for row, trace_id in enumerate(["t0", "t1"]):
+            self.assertEqual({store.get_metadata(i)["trace_id"] for i in ids[row]}, {trace_id})
+        self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+        # All traces excluded: nothing eligible, no error
+        ids, _ = store.query_batch(_queries(centres[:2]), k=3, exclude_trace_ids=[f"t{i}" for i in range(40)])
+        self.assertEqual(ids.shape, (2, 0))
+
+    def test_index_is_synchronised_after_restore_and_late_enable(self):
+        exact, _, queries = self._stores()
+        expected, _ = exact.query_batch(queries, k=5)
+        with tempfile.TemporaryDirectory() as tmp:
+            exact.snapshot(tmp)
+            restored = VectorMemoryStore.restore(tmp, trace_candidates=3)
+            self.assertEqual(len(restored.trace_index), 0)
+            np.testing.assert_array_equal(restored.query_batch(queries, k=5)[0], expected)
+            self.assertEqual(len(restored.trace_index), len(restored))
+        exact.trace_candidates = 2
+        np.testing.assert_array_equal(exact.query_batch(queries, k=5)[0], expected)
+        results = exact.query(queries[0], k=3)
+        self.assertEqual(len(results), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from t_rag.json_stream import iter_otlp_spans
+from t_rag.trace_loader import RESOURCE_ATTRIBUTES_KEY, TraceLoader
+
+
+def _otlp_span(index: int) -> dict:
+    return {
+        "traceId": f"trace-{index // 10}",
+        "spanId": f"span-{index}",
+        "name": f"GET /items/{index}",
+        "startTimeUnixNano": 1700000000000000000 + index,
+        "endTimeUnixNano": 1700000000000500000 + index,
+        "attributes": [
+            {"key": "service.name", "value": {"stringValue": "checkout"}},
+            {"key": "http.method", "value": {"stringValue": "GET"}},
+        ],
+        "status": {"code": "STATUS_CODE_ERROR" if index % 7 == 0 else "STATUS_CODE_OK"},
+    }
+
+
+def _otlp_document(count: int) -> dict:
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "host.name", "value": {"stringValue": "node-1"}}]},
+                "scopeSpans": [
+                    {"scope": {"name": "tests"}, "spans": [_otlp_span(i) for i in range(count)]},
+                    {"spans": []},
+                ],
+            },
+            {"scopeSpans": [{"spans": [_otlp_span(count)]}]},
+        ],
+        "extra": {"ignored": [1, 2.5, None, True]},
+    }
+
+
+class StreamingLoaderTests(unittest.TestCase):
+    def test_stream_matches_json_load_across_buffer_edges(self):
+        document = _otlp_document(25)
+        text = json.dumps(document, indent=1)
+        eager = TraceLoader(".")._extract_spans_from_otlp(json.loads(text))
+        self.assertEqual(eager[0][RESOURCE_ATTRIBUTES_KEY], {"host.name": "node-1"})
+        self.assertEqual(eager[-1][RESOURCE_ATTRIBUTES_KEY], {})
+        expected = [
+            (res.get("resource") or {}, span)
+            for res in json.loads(text)["resourceSpans"]
+            for scope in res["scopeSpans"]
+            for span in scope["spans"]
+        ]
+        for chunk_size in (1, 7, 64, 1 << 16):
+            pairs = list(iter_otlp_spans(io.StringIO(text), chunk_size=chunk_size))
+            self.assertEqual(pairs, expected)
+            self.assertIs(pairs[0][0], pairs[-2][0])
+
+    def test_stream_top_level_list(self):
+        spans = [_otlp_span(i) for i in range(5)]
+        pairs = list(iter_otlp_spans(io.StringIO(json.dumps(spans)), chunk_size=3))
+        self.assertEqual(pairs, [(None, span) for span in spans])
+        self.assertEqual(list(iter_otlp_spans(io.StringIO("[]"))), [])
+
+    def test_truncated_document_raises(self):
+        text = json.dumps([_otlp_span(0), _otlp_span(1)])[:-40]
+        with self.assertRaises(ValueError):
+            list(iter_otlp_spans(io.StringIO(text), chunk_size=16))
+
+    def test_streaming_loader_matches_eager_loader(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "trace.json"
+            path.write_text(json.dumps(_otlp_document(40)), encoding="utf-8")
+            eager = TraceLoader(path).load_spans()
+            streamed = TraceLoader(path, streaming=True).load_spans()
+            chunks = list(TraceLoader(path, streaming=True).iter_chunks(16))
+        self.assertEqual(len(eager), 41)
+        self.assertEqual(streamed, eager)
+        self.assertEqual([len(chunk) for chunk in chunks], [16, 16, 9])
+        self.assertEqual([rec for chunk in chunks for rec in chunk], eager)
+
+
+class ResourceAttributeTests(unittest.TestCase):
+    def _document(self):
+        spans = [_otlp_span(i) for i in range(4)]
+        for span in spans[1:]:
+            span["attributes"] = span["attributes"][1:]
+        return {
+            "resourceSpans": [
+                {
+                    # Resource block after the spans, as some exporters write it
+                    "scopeSpans": [{"spans": spans}],
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": {"stringValue": "payments"}},
+                            {"key": "k8s.pod.name", "value": {"stringValue": "payments-7d9"}},
+                        ]
+                    },
+                }
+            ]
+        }
+
+    def test_resource_attributes_are_resolved_once_and_shared(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "trace.json"
+            path.write_text(json.dumps(self._document()), encoding="utf-8")
+            for streaming in (False, True):
+                records = TraceLoader(path, streaming=streaming).load_spans()
+                # Span-level attributes still take precedence
+                self.assertEqual([rec.service_name for rec in records], ["checkout"] + ["payments"] * 3)
+                self.assertEqual(records[1].resource_attributes["k8s.pod.name"], "payments-7d9")
+                self.assertTrue(all(rec.resource_attributes is records[0].resource_attributes for rec in records))
+                self.assertNotIn("service.name", records[1].attributes)
+
+    def test_inline_resource_on_flat_span_list(self):
+        span = _otlp_span(0)
+        span["attributes"] = []
+        span["resource"] = {"attributes": [{"key": "service.name", "value": {"stringValue": "search"}}]}
+        record = TraceLoader(".")._span_to_record(span)
+        self.assertEqual(record.service_name, "search")
+        self.assertEqual(record.resource_attributes, {"service.name": "search"})
+
+
+class ParallelLoaderTests(unittest.TestCase):
+    def test_parallel_directory_load_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for index in range(6):
+                path = Path(tmp) / f"pod-{index}.json"
+                spans = [_otlp_span(index * 100 + i) for i in range(index + 1)]
+                path.write_text(json.dumps(spans), encoding="utf-8")
+            serial = TraceLoader(tmp).load_spans()
+            parallel = TraceLoader(tmp, workers=3, files_per_task=2).load_spans()
+            parallel_streaming = TraceLoader(tmp, streaming=True, workers=2).load_spans()
+        self.assertEqual(len(serial), 21)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel_streaming, serial)
+        self.assertEqual(serial[0].span_id, "span-0")
+        self.assertEqual(serial[-1].span_id, "span-505")
+
+    def test_load_raw_override_is_honoured_with_workers(self):
+        class BackendLoader(TraceLoader):
+            def load_raw(self):
+                return [_otlp_span(i) for i in range(3)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "pod.json").write_text(json.dumps([_otlp_span(9)]), encoding="utf-8")
+            records = BackendLoader(tmp, workers=2).load_spans()
+        self.assertEqual([record.span_id for record in records], ["span-0", "span-1", "span-2"])
+
+    def test_unpicklable_subclass_is_loaded_serially(self):
+        class TaggedLoader(TraceLoader):
+            def _get_status(self, span):
+                return "TAGGED"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for index in range(3):
+                path = Path(tmp) / f"pod-{index}.json"
+                path.write_text(json.dumps([_otlp_span(index)]), encoding="utf-8")
+            records = TaggedLoader(tmp, workers=2).load_spans()
+        self.assertEqual([record.span_id for record in records], ["span-0", "span-1", "span-2"])
+        self.assertEqual({record.status for record in records}, {"TAGGED"})
+
+    def test_parallel_load_streams_chunks_and_can_stop_early(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for index in range(3):
+                path = Path(tmp) / f"pod-{index}.json"
+                spans = [_otlp_span(index * 10000 + i) for i in range(2500)]
+                path.write_text(json.dumps(spans), encoding="utf-8")
+            loader = TraceLoader(tmp, workers=2, files_per_task=1)
+            spans = loader.iter_spans()
+            first = [next(spans) for _ in range(5)]
+            spans.close()
+            records = loader.load_spans()
+        self.assertEqual([record.span_id for record in first], [f"span-{i}" for i in range(5)])
+        self.assertEqual(len(records), 7500)
+        self.assertEqual(records[2500].span_id, "span-10000")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from conftest import unit_vectors
+from t_rag.vector_memory import VectorMemoryStore
+
+
+class VectorMemoryStoreTests(unittest.TestCase):
+    def test_append_grows_capacity_geometrically(self):
+        store = VectorMemoryStore(dimension=8, initial_capacity=4)
+        vectors = unit_vectors(37, 8)
+        for start in range(0, 37, 5):
+            batch = vectors[start : start + 5]
+            store.add(batch, [{"id": start + i} for i in range(len(batch))])
+        self.assertEqual(len(store), 37)
+        self.assertEqual(store.capacity, 64)
+        np.testing.assert_array_equal(store.embeddings, vectors)
+
+    def test_index_rebuilt_lazily_after_writes(self):
+        store = VectorMemoryStore(dimension=8, n_neighbors=3)
+        vectors = unit_vectors(10, 8)
+        store.add(vectors[:5], [{"id": i} for i in range(5)])
+        self.assertEqual(store.query(vectors[2], k=1)[0][0], {"id": 2})
+        store.add(list(vectors[5:]), [{"id": i} for i in range(5, 10)])
+        meta, dist = store.query(vectors[8], k=1)[0]
+        self.assertEqual(meta, {"id": 8})
+        self.assertAlmostEqual(dist, 0.0, places=5)
+        self.assertEqual(len(store.query(vectors[0], k=50)), 10)
+
+    def test_rejects_mismatched_batches(self):
+        store = VectorMemoryStore(dimension=8)
+        with self.assertRaises(ValueError):
+            store.add(unit_vectors(2, 8), [{"id": 0}])
+        with self.assertRaises(ValueError):
+            store.add(unit_vectors(2, 4), [{"id": 0}, {"id": 1}])
+        self.assertEqual(store.query(unit_vectors(1, 8)[0]), [])
+
+    def test_query_batch_matches_single_queries(self):
+        store = VectorMemoryStore(dimension=16, n_neighbors=4)
+        vectors = unit_vectors(200, 16)
+        store.add(vectors, [{"id": i} for i in range(200)])
+        store.query_block_size = 7
+        queries = unit_vectors(20, 16, seed=1)
+        ids, distances = store.query_batch(queries, k=5)
+        self.assertEqual(ids.shape, (20, 5))
+        self.assertEqual(distances.shape, (20, 5))
+        self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+        for row, query in enumerate(queries):
+            expected = store.query(query, k=5)
+            self.assertEqual([store.get_metadata(i) for i in ids[row]], [meta for meta, _ in expected])
+            np.testing.assert_allclose(distances[row], [dist for _, dist in expected], atol=1e-5)
+        all_ids, _ = store.query_batch(queries[:2], k=500)
+        self.assertEqual(all_ids.shape, (2, 200))
+
+    def test_query_batch_excludes_traces_inside_kernel(self):
+        store = VectorMemoryStore(dimension=8)
+        vectors = unit_vectors(12, 8)
+        store.add(vectors, [{"trace_id": f"t{i % 3}", "span_id": str(i)} for i in range(12)])
+        ids, distances = store.query_batch(vectors[:4], k=5, exclude_trace_ids={"t0", "t1"})
+        self.assertEqual(ids.shape, (4, 4))
+        self.assertTrue(all(store.get_metadata(i)["trace_id"] == "t2" for i in ids.ravel()))
+        self.assertTrue(np.all(np.isfinite(distances)))
+        ids, _ = store.query_batch(vectors[:1], k=3, exclude_trace_ids=[])
+        self.assertEqual(ids[0, 0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()